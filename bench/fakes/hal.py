@@ -0,0 +1,27 @@
+# Stand-in for LinuxCNC's hal module, enough for the screen handler and widgets.
+
+HAL_BIT = 1
+HAL_FLOAT = 2
+HAL_S32 = 3
+HAL_U32 = 4
+HAL_IN = 16
+HAL_OUT = 32
+HAL_IO = HAL_IN | HAL_OUT
+
+class component():
+    def __init__(self, name):
+        self.name = name
+        self.pins = {}
+
+    def newpin(self, name, ptype, direction):
+        self.pins[name] = 0
+        return name
+
+    def ready(self):
+        pass
+
+    def __getitem__(self, name):
+        return self.pins[name]
+
+    def __setitem__(self, name, value):
+        self.pins[name] = value
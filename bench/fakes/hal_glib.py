@@ -0,0 +1,2 @@
+# Stand-in for LinuxCNC's hal_glib module. The handler imports it but the pins
+# it uses come from the fake component in bench/harness.py.
@@ -0,0 +1,22 @@
+# Stand-in for LinuxCNC's python module, constants only.
+
+MODE_MANUAL = 1
+MODE_AUTO = 2
+MODE_MDI = 3
+
+STATE_ESTOP = 1
+STATE_ESTOP_RESET = 2
+STATE_OFF = 3
+STATE_ON = 4
+
+INTERP_IDLE = 1
+INTERP_READING = 2
+INTERP_PAUSED = 3
+INTERP_WAITING = 4
+
+NML_ERROR = 1
+NML_TEXT = 2
+NML_DISPLAY = 3
+OPERATOR_ERROR = 11
+OPERATOR_TEXT = 12
+OPERATOR_DISPLAY = 13
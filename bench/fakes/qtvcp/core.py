@@ -0,0 +1,119 @@
+# Stand-ins for qtvcp.core
+#
+# Status is a scriptable signal emitter: screens connect to it as usual and the
+# harness calls emit() to drive the callbacks. Its query methods answer from the
+# 'state' dict. Action records every call instead of talking to LinuxCNC.
+# Info answers from a real INI file and Path points at a scratch config dir.
+
+import os
+import configparser
+from types import SimpleNamespace
+
+class _Singleton():
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls.__dict__.get('_instance') is None:
+            cls._instance = super(_Singleton, cls).__new__(cls)
+            cls._instance._setup()
+        return cls._instance
+
+    def _setup(self):
+        pass
+
+class Status(_Singleton):
+    def _setup(self):
+        self.callbacks = {}
+        self.state = {'on': True, 'idle': True, 'mode': 'manual', 'running': False, 'paused': False,
+                      'all_homed': True, 'metric': True, 'tool': 1, 'jog_increment': 0,
+                      'jog_increment_angular': 0, 'jograte': 1000.0, 'jograte_angular': 360.0,
+                      'interp_idle': True}
+        self.stat = SimpleNamespace(feedrate=1.0, rapidrate=1.0, current_vel=0.0,
+                                    spindle=({'override': 1.0},), g5x_offset=(0.0,) * 9,
+                                    g92_offset=(0.0,) * 9, tool_offset=(0.0,) * 9,
+                                    rotation_xy=0.0, file='', line=0)
+
+    def connect(self, signal, callback, *args):
+        self.callbacks.setdefault(signal, []).append(callback)
+        return len(self.callbacks[signal])
+
+    def emit(self, signal, *args):
+        for callback in list(self.callbacks.get(signal, [])):
+            callback(self, *args)
+
+    def set_state(self, **kwargs):
+        self.state.update(kwargs)
+
+    # queries
+    def machine_is_on(self): return self.state['on']
+    def is_on_and_idle(self): return self.state['on'] and self.state['idle']
+    def is_man_mode(self): return self.state['mode'] == 'manual'
+    def is_mdi_mode(self): return self.state['mode'] == 'mdi'
+    def is_auto_mode(self): return self.state['mode'] == 'auto'
+    def is_auto_running(self): return self.state['running']
+    def is_auto_paused(self): return self.state['paused']
+    def is_all_homed(self): return self.state['all_homed']
+    def is_interp_idle(self): return self.state['interp_idle']
+    def is_metric_mode(self): return self.state['metric']
+    def get_current_tool(self): return self.state['tool']
+    def get_jog_increment(self): return self.state['jog_increment']
+    def get_jog_increment_angular(self): return self.state['jog_increment_angular']
+    def get_jograte(self): return self.state['jograte']
+    def get_jograte_angular(self): return self.state['jograte_angular']
+
+class Action(_Singleton):
+    def _setup(self):
+        self.calls = []
+
+    def clear(self):
+        self.calls = []
+
+    def names(self):
+        return [call[0] for call in self.calls]
+
+    def OPEN_PROGRAM(self, filename):
+        self.calls.append(('OPEN_PROGRAM', (filename,)))
+        Status().stat.file = filename
+        Status().emit('file-loaded', filename)
+
+    def CALL_MDI_WAIT(self, command, time=5, *args):
+        self.calls.append(('CALL_MDI_WAIT', (command, time)))
+        return 1
+
+    def __getattr__(self, name):
+        # every other action just gets recorded
+        if name.startswith('_'):
+            raise AttributeError(name)
+        def record(*args, **kwargs):
+            self.calls.append((name, args))
+        return record
+
+class Info(_Singleton):
+    INI_FILE = None
+
+    def _setup(self):
+        self.ini = configparser.ConfigParser(strict=False, interpolation=None, inline_comment_prefixes=('#',))
+        self.ini.optionxform = str
+        if self.INI_FILE is not None:
+            self.ini.read(self.INI_FILE)
+        self.MIN_SPINDLE_SPEED = float(self.get_error_safe_setting('DISPLAY', 'MIN_SPINDLE_0_SPEED', '0'))
+        self.MAX_SPINDLE_SPEED = float(self.get_error_safe_setting('DISPLAY', 'MAX_SPINDLE_0_SPEED', '24000'))
+        self.MAX_TRAJ_VELOCITY = float(self.get_error_safe_setting('TRAJ', 'MAX_LINEAR_VELOCITY', '60')) * 60
+        self.DEFAULT_ANGULAR_JOG_VEL = float(self.get_error_safe_setting('DISPLAY', 'DEFAULT_ANGULAR_VELOCITY', '30'))
+        self.MACHINE_IS_METRIC = self.get_error_safe_setting('TRAJ', 'LINEAR_UNITS', 'mm') in ('mm', 'metric')
+        coordinates = self.get_error_safe_setting('TRAJ', 'COORDINATES', 'X Y Z').replace(' ', '')
+        self.AVAILABLE_AXES = list(coordinates)
+        self.AVAILABLE_JOINTS = list(range(len(coordinates)))
+        self.GET_NAME_FROM_JOINT = dict(enumerate(coordinates))
+
+    def get_error_safe_setting(self, section, option, default=None):
+        try:
+            return self.ini.get(section, option)
+        except (configparser.Error, KeyError):
+            return default
+
+class Path(_Singleton):
+    CONFIGPATH = None
+
+    def _setup(self):
+        self.CONFIGPATH = Path.CONFIGPATH or os.getcwd()
@@ -0,0 +1,5 @@
+# Stand-in for qtvcp.lib.gcode_utility.facing
+from PyQt5.QtWidgets import QWidget
+
+class Facing(QWidget):
+    pass
@@ -0,0 +1,5 @@
+# Stand-in for qtvcp.lib.gcode_utility.hole_circle
+from PyQt5.QtWidgets import QWidget
+
+class Hole_Circle(QWidget):
+    pass
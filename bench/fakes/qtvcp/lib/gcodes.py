@@ -0,0 +1,8 @@
+# Stand-in for qtvcp.lib.gcodes
+
+class GCodes():
+    def __init__(self, widgets=None):
+        self.w = widgets
+
+    def setup_list(self):
+        pass
@@ -0,0 +1,32 @@
+# Stand-in for qtvcp.lib.keybindings with qtvcp's default key bindings
+
+from PyQt5.QtCore import Qt
+
+KEY_NAMES = {getattr(Qt, name): name for name in dir(Qt) if name.startswith('Key_')}
+
+class Keylookup():
+    def __init__(self):
+        self.keys = {'Key_F1': 'on_keycall_ESTOP',
+                     'Key_F2': 'on_keycall_POWER',
+                     'Key_Escape': 'on_keycall_ABORT',
+                     'Key_Home': 'on_keycall_HOME',
+                     'Key_Right': 'on_keycall_XPOS',
+                     'Key_Left': 'on_keycall_XNEG',
+                     'Key_Up': 'on_keycall_YPOS',
+                     'Key_Down': 'on_keycall_YNEG',
+                     'Key_PageUp': 'on_keycall_ZPOS',
+                     'Key_PageDown': 'on_keycall_ZNEG',
+                     'Key_BracketRight': 'on_keycall_APOS',
+                     'Key_BracketLeft': 'on_keycall_ANEG'}
+
+    def add_call(self, key, function):
+        self.keys[key] = function
+
+    def convert(self, event):
+        return KEY_NAMES.get(event.key(), 'Key_Unknown')
+
+    def call(self, handler, event, is_pressed, shift, cntrl):
+        function = self.keys.get(self.convert(event))
+        if function is None:
+            raise NameError('No key binding for {}'.format(self.convert(event)))
+        handler[function](event, is_pressed, shift, cntrl)
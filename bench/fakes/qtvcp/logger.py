@@ -0,0 +1,5 @@
+# Stand-in for qtvcp.logger
+import logging
+
+def getLogger(name):
+    return logging.getLogger(name)
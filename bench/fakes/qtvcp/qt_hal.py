@@ -0,0 +1,59 @@
+# Stand-in for qtvcp.qt_hal
+#
+# QComponent hands out QPin objects that behave like the real ones: they keep a
+# value, emit value_changed when it changes and can be driven from a benchmark
+# with set(). Nothing is connected to a real HAL.
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+import hal
+
+class QPin(QObject):
+    value_changed = pyqtSignal('PyQt_PyObject')
+
+    def __init__(self, name, ptype, direction):
+        super(QPin, self).__init__()
+        self.name = name
+        self.ptype = ptype
+        self.direction = direction
+        self.value = 0.0 if ptype == hal.HAL_FLOAT else 0
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        if value == self.value: return
+        self.value = value
+        self.value_changed.emit(value)
+
+    def get_name(self):
+        return self.name
+
+class QComponent():
+    def __init__(self, name='qtdragon'):
+        self.name = name
+        self.pins = {}
+        self.is_ready = False
+
+    def newpin(self, name, ptype, direction):
+        if self.is_ready:
+            raise RuntimeError("can't create pin {} after the component is ready".format(name))
+        pin = QPin(name, ptype, direction)
+        self.pins[name] = pin
+        return pin
+
+    def getpin(self, name):
+        return self.pins[name]
+
+    def ready(self):
+        self.is_ready = True
+
+    def drive(self, name, value):
+        # set an input pin as if HAL had changed it
+        self.pins[name].set(value)
+
+    def __getitem__(self, name):
+        return self.pins[name].get()
+
+    def __setitem__(self, name, value):
+        self.pins[name].set(value)
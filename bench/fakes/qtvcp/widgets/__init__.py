@@ -0,0 +1,279 @@
+# Stand-ins for the qtvcp widgets used by qtdragon.ui and the handler
+#
+# Every fake derives from the Qt class the real widget is based on, so the real
+# .ui file loads, and implements just the calls the handler makes. The
+# submodules (qtvcp.widgets.file_manager etc) are registered from here so the
+# .ui loader and the handler can import them by their real names.
+
+import os
+import sys
+import types
+import importlib
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+from PyQt5.QtCore import pyqtSignal
+
+class _HalWidgetBase():
+    def hal_init(self, HAL_GCOMP=None, HAL_NAME=None, *args, **kwargs):
+        self.HAL_GCOMP_ = HAL_GCOMP
+        self.HAL_NAME_ = HAL_NAME or self.objectName()
+        self._hal_init()
+
+    def _hal_init(self):
+        pass
+
+class ActionButton(QtWidgets.QPushButton):
+    pass
+
+class RoundButton(ActionButton):
+    pass
+
+class PushButton(QtWidgets.QPushButton):
+    pass
+
+class AxisToolButton(QtWidgets.QToolButton):
+    def set_dialog_code(self, code):
+        self.dialog_code = code
+
+class SystemToolButton(QtWidgets.QToolButton):
+    pass
+
+class LED(QtWidgets.QWidget):
+    def setColor(self, color):
+        self.color = color
+
+    def setDiameter(self, diameter):
+        self.diameter = diameter
+
+class DROLabel(QtWidgets.QLabel):
+    pass
+
+class StatusLabel(QtWidgets.QLabel):
+    pass
+
+class JogIncrements(QtWidgets.QComboBox):
+    pass
+
+class CamView(QtWidgets.QWidget):
+    def __init__(self, parent=None):
+        super(CamView, self).__init__(parent)
+        self.scale = 1.0
+        self.diameter = 20
+        self.rotation = 0.0
+
+class GCodeGraphics(QtWidgets.QWidget):
+    percentLoaded = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super(GCodeGraphics, self).__init__(parent)
+        self.show_extents_option = True
+        self.alpha_mode = False
+        self.inhibit_selection = True
+        self.highlighted = None
+        self.live_plot_cleared = 0
+
+    def set_alpha_mode(self, state):
+        self.alpha_mode = state
+
+    def set_inhibit_selection(self, state):
+        self.inhibit_selection = state
+
+    def highlight_graphics(self, line):
+        self.highlighted = line
+
+    def clear_live_plotter(self):
+        self.live_plot_cleared += 1
+
+    def load_program(self, g, fname):
+        self.loaded = fname
+
+class FileManager(QtWidgets.QWidget):
+    # the same model, list and table as the real widget, and the calls the handler makes
+    def __init__(self, parent=None):
+        super(FileManager, self).__init__(parent)
+        self.model = QtWidgets.QFileSystemModel()
+        self.model.setFilter(QtCore.QDir.AllDirs | QtCore.QDir.NoDot | QtCore.QDir.Files)
+        self.model.setNameFilters(['*.ngc', '*.py'])
+        self.model.setNameFilterDisables(False)
+        self.model.rootPathChanged.connect(self.folderChanged)
+        self.textLine = QtWidgets.QLineEdit(self)
+        self.list = QtWidgets.QListView(self)
+        self.list.setModel(self.model)
+        self.list.hide()
+        self.table = QtWidgets.QTableView(self)
+        self.table.setModel(self.model)
+        self.table.clicked.connect(self.listClicked)
+        self.user_path = os.path.expanduser('~')
+        self.media_path = '/media'
+        self.current = None
+
+    def updateDirectoryView(self, path):
+        if not os.path.exists(path): return
+        self.list.setRootIndex(self.model.setRootPath(path))
+        self.table.setRootIndex(self.model.setRootPath(path))
+
+    def folderChanged(self, data):
+        self.textLine.setText(os.path.normpath(data))
+
+    def listClicked(self, index):
+        path = os.path.normpath(self.model.filePath(index))
+        if self.model.fileInfo(index).isFile(): return
+        self.updateDirectoryView(path)
+
+    def onUserClicked(self):
+        self.updateDirectoryView(self.user_path)
+
+    def onMediaClicked(self):
+        self.updateDirectoryView(self.media_path)
+
+    def getCurrentSelected(self):
+        if self.current is not None:
+            return self.current
+        index = self.table.selectionModel().currentIndex()
+        path = os.path.normpath(self.model.filePath(index))
+        return (path, self.model.fileInfo(index).isFile())
+
+    def load(self, fname=None):
+        pass
+
+class MachineLog(QtWidgets.QTextEdit):
+    pass
+
+class MDIHistory(QtWidgets.QWidget):
+    def __init__(self, parent=None):
+        super(MDIHistory, self).__init__(parent)
+        self.MDILine = QtWidgets.QLineEdit(self)
+        self.model = QtGui.QStandardItemModel(self)
+        self.soft_keyboard = False
+
+    def set_soft_keyboard(self, state):
+        self.soft_keyboard = state
+
+class GcodeDisplay(QtWidgets.QPlainTextEdit):
+    percentDone = pyqtSignal(int)
+
+    def load_program(self, w, filename=None):
+        pass
+
+class GcodeEditor(QtWidgets.QWidget):
+    percentDone = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super(GcodeEditor, self).__init__(parent)
+        self.editor = GcodeDisplay(self)
+        self.editor.percentDone.connect(self.percentDone)
+        self.edit_mode = False
+
+    def editMode(self):
+        self.edit_mode = True
+
+    def readOnlyMode(self):
+        self.edit_mode = False
+
+class OriginOffsetView(QtWidgets.QTableView):
+    pass
+
+class ToolOffsetView(QtWidgets.QTableView):
+    def get_checked_list(self):
+        return []
+
+class StatusAdjustmentBar(QtWidgets.QWidget):
+    valueChanged = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super(StatusAdjustmentBar, self).__init__(parent)
+        self.value = 100
+        self.hi_value = 200
+        self.low_value = 0
+        self._maximum = 200
+        self.step = 10
+
+    def setValue(self, value):
+        self.value = value
+        self.valueChanged.emit(value)
+
+    def maximum(self):
+        return self._maximum
+
+    def setMaximum(self, value):
+        self._maximum = value
+
+    def setStep(self, step):
+        self.step = step
+
+class ScreenOptions(QtWidgets.QWidget):
+    pass
+
+class Gauge(QtWidgets.QWidget):
+    def __init__(self, parent=None):
+        super(Gauge, self).__init__(parent)
+        self._value_font_size = 10
+        self._label_font_size = 10
+        self.value = 0
+        self.threshold = 0
+
+    def update_value(self, value):
+        self.value = value
+
+    def set_threshold(self, value):
+        self.threshold = value
+
+class StyleSheetEditor():
+    def __init__(self, widgets=None, paths=None):
+        self.styleSheetCombo = QtWidgets.QComboBox()
+        self.styleSheetCombo.addItem("As Loaded")
+
+    def on_applyButton_clicked(self):
+        pass
+
+    def load_dialog(self):
+        pass
+
+class BasicProbe(QtWidgets.QWidget, _HalWidgetBase):
+    def closing_cleanup__(self):
+        pass
+
+class VersaProbe(BasicProbe):
+    pass
+
+# real module name -> classes it provides
+MODULES = {'action_button': ('ActionButton',),
+           'action_button_round': ('RoundButton',),
+           'camview_widget': ('CamView',),
+           'gcode_graphics': ('GCodeGraphics',),
+           'jog_increments': ('JogIncrements',),
+           'led_widget': ('LED',),
+           'simple_widgets': ('PushButton',),
+           'axis_tool_button': ('AxisToolButton',),
+           'file_manager': ('FileManager',),
+           'machine_log': ('MachineLog',),
+           'dro_widget': ('DROLabel',),
+           'mdi_history': ('MDIHistory',),
+           'gcode_editor': ('GcodeEditor', 'GcodeDisplay'),
+           'origin_offsetview': ('OriginOffsetView',),
+           'tool_offsetview': ('ToolOffsetView',),
+           'status_label': ('StatusLabel',),
+           'adjustment_bar': ('StatusAdjustmentBar',),
+           'screen_options': ('ScreenOptions',),
+           'system_tool_button': ('SystemToolButton',),
+           'round_gauge': ('Gauge',),
+           'stylesheeteditor': ('StyleSheetEditor',),
+           'basic_probe': ('BasicProbe',),
+           'versa_probe': ('VersaProbe',),
+           'widget_baseclass': ('_HalWidgetBase',)}
+
+for _name, _classes in MODULES.items():
+    _module = types.ModuleType(__name__ + '.' + _name)
+    for _cls in _classes:
+        setattr(_module, _cls, globals()[_cls])
+    sys.modules[_module.__name__] = _module
+    globals()[_name] = _module
+
+# the screen ships its own JoyPad, benchmark that rather than a fake. The .ui
+# was saved with a newer qtvcp JoyPad that has a highlightPosition enum.
+class JoyPad(importlib.import_module('joypad').JoyPad):
+    NONE, LEFT, RIGHT, CENTER, TOP, BOTTOM, LEFTRIGHT, TOPBOTTOM = range(8)
+
+joypad = types.ModuleType(__name__ + '.joypad')
+joypad.JoyPad = JoyPad
+sys.modules[joypad.__name__] = joypad
@@ -0,0 +1,22 @@
+# Stand-in for PyQt5.QtWebEngineWidgets, only installed when the real one is missing
+
+from PyQt5.QtCore import QObject
+from PyQt5.QtWidgets import QWidget
+
+class QWebEnginePage(QObject):
+    NavigationTypeLinkClicked = 0
+
+    def acceptNavigationRequest(self, url, navtype, mainframe):
+        return True
+
+class QWebEngineView(QWidget):
+    def __init__(self, parent=None):
+        super(QWebEngineView, self).__init__(parent)
+        self.page = None
+        self.url = None
+
+    def setPage(self, page):
+        self.page = page
+
+    def load(self, url):
+        self.url = url
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# Headless harness for the QtDragon handler
+#
+# Loads HandlerClass against the real qtdragon.ui without LinuxCNC. The modules
+# in fakes/ stand in for hal, linuxcnc and the parts of qtvcp the screen uses:
+# STATUS is a signal emitter the harness can drive, ACTION records every call
+# and HAL pins are plain objects that emit value_changed. Qt runs on the
+# offscreen platform so no display is needed.
+#
+# qtvcp's STATUS/ACTION/INFO are process wide singletons, so only one Harness
+# can exist per process. Run this file directly to print the startup time.
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import configparser
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+FAKES_DIR = os.path.join(BENCH_DIR, 'fakes')
+SCREEN_DIR = os.path.join(REPO_DIR, 'qtdragon')
+
+sys.path[:0] = [FAKES_DIR, SCREEN_DIR, REPO_DIR]
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5 import QtCore, QtGui, QtWidgets, uic
+try:
+    import PyQt5.QtWebEngineWidgets
+except ImportError:
+    import webengine
+    sys.modules['PyQt5.QtWebEngineWidgets'] = webengine
+
+from qtvcp import core
+from qtvcp.qt_hal import QComponent
+
+class Preferences(configparser.ConfigParser):
+    # same interface as qtvcp's preference file access
+    def __init__(self, filename):
+        super(Preferences, self).__init__(interpolation=None)
+        self.optionxform = str
+        self.fn = filename
+        self.read(filename)
+
+    def getpref(self, option, default=False, type=bool, section="DEFAULT"):
+        if section != "DEFAULT" and not self.has_section(section):
+            self.add_section(section)
+        if not self.has_option(section, option):
+            self.set(section, option, str(default))
+            self.write_file()
+            return default
+        value = self.get(section, option)
+        if type == bool:
+            return value.lower() in ('true', '1', 'yes')
+        if type in (int, float):
+            try:
+                return type(value)
+            except ValueError:
+                return default
+        return value
+
+    def putpref(self, option, value, type=bool, section="DEFAULT"):
+        if section != "DEFAULT" and not self.has_section(section):
+            self.add_section(section)
+        self.set(section, option, str(value))
+        self.write_file()
+
+    def write_file(self):
+        with open(self.fn, 'w') as f:
+            self.write(f)
+
+class Window(QtWidgets.QMainWindow):
+    # like qtvcp's main window, widgets and handler methods are reachable as items
+    def __init__(self, prefs_file):
+        super(Window, self).__init__()
+        self.PREFS_ = Preferences(prefs_file)
+
+    def __getitem__(self, item):
+        return getattr(self, item)
+
+    def __setitem__(self, item, value):
+        setattr(self, item, value)
+
+class Harness():
+    def __init__(self, ini='qtdragon_xyz.ini'):
+        start = time.perf_counter()
+        self.config_dir = tempfile.mkdtemp(prefix='qtdragon-bench-')
+        # the handler finds its subprogram and setup page relative to the config dir
+        os.symlink(SCREEN_DIR, os.path.join(self.config_dir, 'qtdragon'))
+        shutil.copy(os.path.join(REPO_DIR, 'default_setup.html'), self.config_dir)
+        core.Info.INI_FILE = os.path.join(REPO_DIR, ini)
+        core.Path.CONFIGPATH = self.config_dir
+        # the touch-off service is a child process and needs the fakes too
+        os.environ['PYTHONPATH'] = os.pathsep.join([FAKES_DIR, os.environ.get('PYTHONPATH', '')])
+        self.app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([sys.argv[0]])
+        import resources
+        resources.qInitResources()
+        import qtdragon_handler
+        self.module = qtdragon_handler
+        self.status = core.Status()
+        self.action = core.Action()
+        self.halcomp = QComponent('qtdragon')
+        self.window = Window(os.path.join(self.config_dir, 'qtdragon.pref'))
+        self.handler = qtdragon_handler.HandlerClass(self.halcomp, self.window, None)
+        # qtvcp exposes the handler's methods on the window before the .ui connects its slots
+        for name in dir(self.handler):
+            if name.startswith('_') or hasattr(self.window, name): continue
+            attr = getattr(self.handler, name)
+            if callable(attr):
+                setattr(self.window, name, attr)
+        uic.loadUi(os.path.join(SCREEN_DIR, 'qtdragon.ui'), self.window)
+        self.handler.class_patch__()
+        self.handler.initialized__()
+        self.halcomp.ready()
+        self.window.resize(1600, 1000)
+        self.window.show()
+        self.process_events()
+        self.startup_time = (time.perf_counter() - start) * 1000
+
+    def process_events(self):
+        self.app.processEvents()
+
+    def emit(self, signal, *args):
+        self.status.emit(signal, *args)
+
+    def drive(self, pin, value):
+        self.halcomp.drive(pin, value)
+
+    def key(self, receiver, code, pressed=True, shift=False, text=''):
+        # what qtvcp's key event filter hands to the screen
+        etype = QtCore.QEvent.KeyPress if pressed else QtCore.QEvent.KeyRelease
+        modifiers = QtCore.Qt.ShiftModifier if shift else QtCore.Qt.NoModifier
+        event = QtGui.QKeyEvent(etype, code, modifiers, text)
+        return self.handler.processed_key_event__(receiver, event, pressed, text, code, shift, False)
+
+    def close(self):
+        self.handler.closing_cleanup__()
+        self.window.close()
+        self.process_events()
+        shutil.rmtree(self.config_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    harness = Harness(sys.argv[1] if len(sys.argv) > 1 else 'qtdragon_xyz.ini')
+    result = {'startup': harness.startup_time}
+    result.update({name: t for name, t in harness.handler.startup_times})
+    harness.close()
+    print(json.dumps(result))
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# Benchmarks for the QtDragon handler
+#
+# Runs the screen headless (see harness.py) and times the paths that matter for
+# responsiveness: startup, key dispatch, JoyPad painting, file loading and the
+# STATUS / HAL callbacks. Each result is the best per-call time over several
+# repeats. Save a baseline with --json and check a later run against it with
+# --compare, which exits non zero when anything got slower than the tolerance.
+#
+#   python3 bench/run_bench.py --json baseline.json
+#   python3 bench/run_bench.py --compare baseline.json
+
+import os
+import sys
+import json
+import timeit
+import argparse
+import subprocess
+
+from harness import Harness, BENCH_DIR
+from toolpath_overview import ToolpathLod
+from PyQt5 import QtCore
+
+BENCHMARKS = []
+
+def benchmark(number):
+    def register(func):
+        BENCHMARKS.append((func.__name__, number, func))
+        return func
+    return register
+
+@benchmark(200)
+def key_jog(h):
+    # keyboard jog, goes through the key bindings to the handler
+    h.status.set_state(mode='manual')
+    h.window.chk_use_keyboard.setChecked(True)
+    def run():
+        h.key(h.window, QtCore.Qt.Key_Right, True)
+        h.key(h.window, QtCore.Qt.Key_Right, False)
+    return run
+
+@benchmark(200)
+def key_mdi(h):
+    # typing in the MDI line is routed to the widget instead
+    line = h.window.mdihistory.MDILine
+    def run():
+        h.key(line, QtCore.Qt.Key_G, True, text='g')
+        h.key(line, QtCore.Qt.Key_G, False, text='g')
+        line.clear()
+    return run
+
+@benchmark(100)
+def joypad_paint(h):
+    pad = h.window.jog_xy
+    return lambda: pad.grab()
+
+@benchmark(100)
+def joypad_highlight(h):
+    pad = h.window.jog_xy
+    state = [False]
+    def run():
+        state[0] = not state[0]
+        pad.set_highlight('X', state[0])
+        pad.grab()
+    return run
+
+@benchmark(20)
+def file_load(h):
+    fname = os.path.join(h.config_dir, 'bench.ngc')
+    with open(fname, 'w') as f:
+        for i in range(1000):
+            f.write("G1 X{:.3f} Y{:.3f} F1000\n".format(i * 0.1, (i % 50) * 0.2))
+        f.write("M2\n")
+    return lambda: h.handler.load_code(fname)
+
+@benchmark(1000)
+def status_periodic(h):
+    # periodic update while a program runs
+    h.status.set_state(mode='auto', running=False)
+    h.window.main_tab_widget.setCurrentIndex(0)
+    h.handler.btn_run_clicked()
+    h.status.set_state(running=True)
+    return lambda: h.emit('periodic')
+
+@benchmark(1000)
+def status_feed_rate(h):
+    return lambda: h.emit('current-feed-rate', 1234.0)
+
+@benchmark(1000)
+def hal_spindle_power(h):
+    h.drive('spindle_volts', 230.0)
+    value = [1.0]
+    def run():
+        value[0] = 3.0 - value[0]
+        h.drive('spindle_amps', value[0])
+    return run
+
+def fill_live_plot(h, points):
+    # a zig-zag so decimation keeps every corner
+    for i in range(points):
+        h.emit('current-position', (i * 0.5, (i % 2) * 10.0, 0.0), None, None, None)
+
+@benchmark(1000)
+def live_position(h):
+    # position update once the history is full, e.g. hours into a job
+    plot = h.handler.live_plot
+    fill_live_plot(h, plot.capacity * 3)
+    count = [plot.capacity * 3]
+    def run():
+        count[0] += 1
+        i = count[0]
+        h.emit('current-position', (i * 0.5, (i % 2) * 10.0, 0.0), None, None, None)
+    return run
+
+@benchmark(20)
+def live_plot_paint(h):
+    # overview repaint with a full live plot, the same after any job length
+    view = h.handler.overview_view
+    fill_live_plot(h, h.handler.live_plot.capacity * 3)
+    view.resize(800, 600)
+    view.set_lod(ToolpathLod(1000.0))
+    view.lod.add(0, 0, False)
+    view.lod.add(1000, 10, True)
+    view.fit()
+    def run():
+        view.live_changed()
+        view.grab()
+    return run
+
+def time_startup(repeat):
+    # startup can only be measured once per process
+    times = []
+    for i in range(repeat):
+        out = subprocess.run([sys.executable, os.path.join(BENCH_DIR, 'harness.py')],
+                             capture_output=True, text=True, check=True).stdout
+        times.append(json.loads(out.strip().splitlines()[-1])['startup'] * 1000)
+    return min(times)
+
+def run_benchmarks(names, repeat):
+    results = {}
+    if not names or 'startup' in names:
+        results['startup'] = time_startup(repeat)
+    harness = Harness()
+    try:
+        for name, number, setup in BENCHMARKS:
+            if names and name not in names: continue
+            func = setup(harness)
+            func()
+            times = timeit.repeat(func, number=number, repeat=repeat)
+            harness.action.clear()
+            harness.process_events()
+            # microseconds per call
+            results[name] = min(times) / number * 1e6
+    finally:
+        harness.status.set_state(mode='manual', running=False)
+        harness.close()
+    return results
+
+def compare(results, baseline, tolerance):
+    slower = []
+    for name, value in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            print("{:20} {:12.1f} us  (no baseline)".format(name, value))
+            continue
+        change = (value - base) / base * 100
+        flag = ''
+        if value > base * (1 + tolerance):
+            flag = '  SLOWER'
+            slower.append(name)
+        print("{:20} {:12.1f} us  {:+7.1f}%{}".format(name, value, change, flag))
+    return slower
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="QtDragon handler benchmarks")
+    parser.add_argument('names', nargs='*', help="benchmarks to run, default all")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--compare', help="baseline results to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown, default 0.25")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.names, args.repeat)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        slower = compare(results, baseline, args.tolerance)
+        if slower:
+            print("Slower than baseline: {}".format(", ".join(slower)))
+            sys.exit(1)
+    else:
+        for name, value in sorted(results.items()):
+            print("{:20} {:12.1f} us".format(name, value))
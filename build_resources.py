@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# Build the binary resource bundle (resources.rcc) used by resources.py
+#
+# With Qt's rcc tool installed the bundle is compiled straight from the images
+# in qtdragon/images. Without it, the bundle is converted from the compiled in
+# resource module (resources_data.py) so no Qt tools are required.
+#
+#   python3 build_resources.py            build resources.rcc
+#   python3 build_resources.py --module   always convert from resources_data.py
+#   python3 build_resources.py --compare  time loading both forms
+
+import os
+import sys
+import ast
+import time
+import struct
+import shutil
+import tempfile
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RCC_FILE = os.path.join(HERE, 'resources.rcc')
+LEGACY_FILE = os.path.join(HERE, 'resources_data.py')
+IMAGE_DIR = os.path.join(HERE, 'qtdragon', 'images')
+RCC_TOOLS = ('rcc', '/usr/lib/qt5/bin/rcc', '/usr/lib/x86_64-linux-gnu/qt5/bin/rcc')
+# resource prefix -> images, matching the layout of resources_data.py
+RESOURCES = {'/images': ('brushed_metal.png', 'tool_probe.png', 'atc_spindle_tool.png'),
+             '/buttons': ('checked.png', 'unchecked.png', 'Estop.png', 'Estop_reset.png',
+                          'Left_arrow.png', 'Right_arrow.png',
+                          'x_minus_jog_button.png', 'x_plus_jog_button.png',
+                          'y_minus_jog_button.png', 'y_plus_jog_button.png',
+                          'z_minus_jog_button.png', 'z_plus_jog_button.png',
+                          'a_minus_jog_button.png', 'a_plus_jog_button.png',
+                          'spindle_fwd.png', 'spindle_rev.png', 'spindle_stop.png', 'spindle_pause.png')}
+
+def find_rcc():
+    for tool in RCC_TOOLS:
+        path = shutil.which(tool)
+        if path is not None:
+            return path
+    return None
+
+def build_with_rcc(rcc, target):
+    with tempfile.NamedTemporaryFile('w', suffix='.qrc', dir=os.path.dirname(IMAGE_DIR), delete=False) as f:
+        f.write('<RCC>\n')
+        for prefix, images in RESOURCES.items():
+            f.write('  <qresource prefix="{}">\n'.format(prefix))
+            for name in images:
+                f.write('    <file>images/{}</file>\n'.format(name))
+            f.write('  </qresource>\n')
+        f.write('</RCC>\n')
+        qrc = f.name
+    try:
+        subprocess.check_call([rcc, '-binary', qrc, '-o', target])
+    finally:
+        os.remove(qrc)
+
+def read_legacy_blobs():
+    # parse rather than import so the conversion doesn't need PyQt5
+    with open(LEGACY_FILE, 'rb') as f:
+        tree = ast.parse(f.read(), LEGACY_FILE)
+    blobs = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant):
+            if isinstance(node.value.value, bytes):
+                blobs[node.targets[0].id] = node.value.value
+    return blobs
+
+def build_from_module(target):
+    blobs = read_legacy_blobs()
+    tree = blobs['qt_resource_struct_v2']
+    data = blobs['qt_resource_data']
+    names = blobs['qt_resource_name']
+    # header: magic, format version, then offsets of the tree, data and name blocks
+    header_size = 20
+    tree_offset = header_size
+    data_offset = tree_offset + len(tree)
+    names_offset = data_offset + len(data)
+    with open(target, 'wb') as f:
+        f.write(b'qres')
+        f.write(struct.pack('>IIII', 2, tree_offset, data_offset, names_offset))
+        f.write(tree)
+        f.write(data)
+        f.write(names)
+
+def compare():
+    from PyQt5 import QtCore
+    # legacy: the module source has to be compiled (first run) or unmarshalled
+    # from the byte code cache (later runs) and its bytes kept alive in memory
+    start = time.perf_counter()
+    with open(LEGACY_FILE, 'rb') as f:
+        code = compile(f.read(), LEGACY_FILE, 'exec')
+    compile_time = time.perf_counter() - start
+    start = time.perf_counter()
+    namespace = {'__name__': 'resources_data'}
+    exec(code, namespace)
+    exec_time = time.perf_counter() - start
+    namespace['qCleanupResources']()
+    start = time.perf_counter()
+    ok = QtCore.QResource.registerResource(RCC_FILE)
+    rcc_time = time.perf_counter() - start
+    exists = QtCore.QFile.exists(':/buttons/images/Estop.png')
+    QtCore.QResource.unregisterResource(RCC_FILE)
+    print('resources_data.py  compile {:8.1f} ms  exec {:6.1f} ms'.format(compile_time * 1000, exec_time * 1000))
+    print('resources.rcc      register {:7.1f} ms  ({})'.format(rcc_time * 1000,
+                                    'ok' if ok and exists else 'FAILED'))
+
+if __name__ == "__main__":
+    if '--compare' in sys.argv:
+        compare()
+        sys.exit(0)
+    rcc = None if '--module' in sys.argv else find_rcc()
+    if rcc is not None:
+        build_with_rcc(rcc, RCC_FILE)
+    else:
+        build_from_module(RCC_FILE)
+    print('Wrote {} ({} bytes)'.format(RCC_FILE, os.path.getsize(RCC_FILE)))
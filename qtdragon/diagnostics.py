@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# Event loop and callback timing
+#
+# Opt-in instrumentation to find out what makes the screen stutter. LagMonitor
+# measures how late a repeating timer fires, which is how long the event loop
+# was blocked. Profiler wraps callbacks and keeps their last run times in ring
+# buffers so rolling percentiles can be shown per callback.
+
+import time
+import json
+import inspect
+from collections import deque
+
+from PyQt5.QtCore import QObject, QTimer
+
+LAG_NAME = 'event loop lag'
+
+def percentile(values, pc):
+    # nearest rank on an already sorted list
+    if not values: return 0.0
+    index = min(len(values) - 1, max(0, int(round(pc / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+def positional_count(func):
+    # number of positional arguments func takes, None if it takes any number
+    try:
+        params = inspect.signature(func).parameters.values()
+    except (TypeError, ValueError):
+        return None
+    count = 0
+    for param in params:
+        if param.kind == param.VAR_POSITIONAL:
+            return None
+        if param.kind in (param.POSITIONAL_ONLY, param.POSITIONAL_OR_KEYWORD):
+            count += 1
+    return count
+
+class Profiler():
+    def __init__(self, size=500):
+        self.size = size
+        # name -> run times in seconds, newest last
+        self.samples = {}
+        self.calls = {}
+
+    def buffer(self, name):
+        if name not in self.samples:
+            self.samples[name] = deque(maxlen=self.size)
+            self.calls[name] = 0
+        return self.samples[name]
+
+    def add(self, name, seconds):
+        self.buffer(name).append(seconds)
+        self.calls[name] += 1
+
+    def wrap(self, name, func):
+        # Qt drops signal arguments a slot doesn't take, the wrapper has to do the same
+        nargs = positional_count(func)
+        self.buffer(name)
+        def timed(*args, **kwargs):
+            if nargs is not None:
+                args = args[:nargs]
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(name, time.perf_counter() - start)
+        return timed
+
+    def clear(self):
+        for name in self.samples:
+            self.samples[name].clear()
+            self.calls[name] = 0
+
+    def report(self):
+        # (name, calls, p50, p95, p99, max) in ms, slowest p95 first
+        rows = []
+        for name, samples in self.samples.items():
+            if not samples: continue
+            values = sorted(samples)
+            rows.append((name, self.calls[name], percentile(values, 50) * 1000, percentile(values, 95) * 1000,
+                         percentile(values, 99) * 1000, values[-1] * 1000))
+        rows.sort(key=lambda row: row[3], reverse=True)
+        return rows
+
+    def dump(self, filename):
+        keys = ('name', 'calls', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms')
+        data = {'time': time.strftime("%Y-%m-%d %H:%M:%S"),
+                'stats': [dict(zip(keys, row)) for row in self.report()]}
+        with open(filename, 'w') as f:
+            json.dump(data, f, indent=2)
+
+class ProfiledProxy():
+    # stands in for an object so every method looked up through it is timed
+    def __init__(self, target, profiler, prefix=''):
+        self._target = target
+        self._profiler = profiler
+        self._prefix = prefix
+        self._wrapped = {}
+
+    def __getattr__(self, name):
+        if name in self._wrapped:
+            return self._wrapped[name]
+        attr = getattr(self._target, name)
+        if not callable(attr) or name.startswith('_'):
+            return attr
+        timed = self._profiler.wrap(self._prefix + name, attr)
+        self._wrapped[name] = timed
+        return timed
+
+class LagMonitor(QObject):
+    def __init__(self, profiler, interval=50):
+        super(LagMonitor, self).__init__()
+        self.profiler = profiler
+        self.interval = interval
+        self.last = None
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.tick)
+
+    def start(self):
+        self.last = time.perf_counter()
+        self.timer.start(self.interval)
+
+    def stop(self):
+        self.timer.stop()
+
+    def tick(self):
+        now = time.perf_counter()
+        lag = now - self.last - self.interval / 1000
+        self.last = now
+        self.profiler.add(LAG_NAME, max(0.0, lag))
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# Directory listing for the file managers
+#
+# Stands in for the QFileSystemModel inside qtvcp's FileManager, with the same
+# columns and the calls FileManager makes. A worker thread lists the directory
+# with os.scandir and sends the rows back in batches, so a USB stick or a
+# network share with thousands of files never blocks the GUI. Rows of
+# directories seen before are shown straight away and updated when the scan
+# finishes. The first comments of each program are read for its tooltip and
+# kept in a StatCache keyed by inode, mtime and size, so only new or changed
+# files are read again. The directory shown is watched and rescanned when its
+# entries change.
+
+import os
+import re
+import time
+import queue
+import fnmatch
+import threading
+from collections import OrderedDict
+
+from PyQt5 import QtCore, QtWidgets
+from PyQt5.QtCore import pyqtSignal
+
+COLUMNS = ["Name", "Size", "Type", "Date Modified"]
+PROGRAM_TYPES = ('.ngc', '.nc', '.tap', '.gcode')
+COMMENT = re.compile(r'\(([^)]*)\)|;(.*)')
+# rows are sent to the GUI this often while a directory is scanned
+BATCH_ROWS = 256
+BATCH_SECONDS = 0.1
+# rescan this long after the last change, e.g. while a CAM post writes a batch of files
+RESCAN_DELAY = 300
+
+# row fields
+NAME, IS_DIR, SIZE, MTIME, SUMMARY = range(5)
+
+def program_summary(path, lines=20):
+    # the first comments of a program, CAM posts put the job and tool details there
+    comments = []
+    with open(path, 'rb') as f:
+        head = f.read(4096).decode('utf-8', 'replace').splitlines()
+    for line in head[:lines]:
+        match = COMMENT.search(line)
+        if match:
+            comments.append((match.group(1) if match.group(1) is not None else match.group(2)).strip())
+        elif comments and line.strip() not in ('', '%'):
+            break
+    return "\n".join(comment for comment in comments if comment)[:500]
+
+def format_size(size):
+    for unit in ("bytes", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return "{} {}".format(size, unit) if unit == "bytes" else "{:.1f} {}".format(size, unit)
+        size /= 1024
+
+class StatCache():
+    # path -> (inode, mtime, size, summary), shared by the scanners
+    def __init__(self, max_entries=20000):
+        self.entries = OrderedDict()
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+
+    def summary(self, path, stat):
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry[0] == key:
+                self.entries.move_to_end(path)
+                return entry[1]
+        try:
+            summary = program_summary(path)
+        except OSError:
+            summary = ''
+        with self.lock:
+            self.entries[path] = (key, summary)
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return summary
+
+class DirectoryModel(QtCore.QAbstractTableModel):
+    # QFileSystemModel signals FileManager may connect to
+    rootPathChanged = pyqtSignal(str)
+    directoryLoaded = pyqtSignal(str)
+    failed = pyqtSignal(str, str)
+    # from the worker thread: generation, rows, finished
+    batch = pyqtSignal(int, object, bool)
+
+    def __init__(self, stat_cache=None, cached_dirs=16, parent=None):
+        super(DirectoryModel, self).__init__(parent)
+        self.stat_cache = stat_cache or StatCache()
+        self.root = ''
+        # every entry of the root, by name, and the sorted rows that pass the name filters
+        self.entries = {}
+        self.rows = []
+        self.name_filters = []
+        self.sort_column = 0
+        self.sort_order = QtCore.Qt.AscendingOrder
+        # entries of recently shown directories
+        self.listings = OrderedDict()
+        self.cached_dirs = cached_dirs
+        provider = QtWidgets.QFileIconProvider()
+        self.icons = {True: provider.icon(QtWidgets.QFileIconProvider.Folder),
+                      False: provider.icon(QtWidgets.QFileIconProvider.File)}
+        # a rescan of a directory already shown replaces its rows when it finishes
+        self.revalidating = False
+        self.scanned = {}
+        self.generation = 0
+        self.jobs = queue.Queue()
+        self.batch.connect(self.batch_ready)
+        self.watcher = QtCore.QFileSystemWatcher()
+        self.watcher.directoryChanged.connect(lambda path: self.rescan_timer.start())
+        self.rescan_timer = QtCore.QTimer()
+        self.rescan_timer.setSingleShot(True)
+        self.rescan_timer.setInterval(RESCAN_DELAY)
+        self.rescan_timer.timeout.connect(self.rescan)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def shutdown(self):
+        self.generation += 1
+        self.jobs.put(None)
+        self.thread.join(2)
+
+    # QFileSystemModel calls used by FileManager
+    def setRootPath(self, path):
+        path = os.path.normpath(path)
+        if path != self.root:
+            if self.root:
+                self.watcher.removePath(self.root)
+            self.root = path
+            self.watcher.addPath(path)
+            self.rootPathChanged.emit(path)
+            listing = self.listings.get(path)
+            self.entries = dict(listing) if listing is not None else {}
+            self.beginResetModel()
+            self.rows = self.visible(self.entries)
+            self.endResetModel()
+            self.scan(listing is not None)
+        return QtCore.QModelIndex()
+
+    def rootPath(self):
+        return self.root
+
+    def filePath(self, index):
+        if not index.isValid() or index.row() >= len(self.rows): return ''
+        return os.path.join(self.root, self.rows[index.row()][NAME])
+
+    def fileName(self, index):
+        return self.rows[index.row()][NAME] if index.isValid() and index.row() < len(self.rows) else ''
+
+    def fileInfo(self, index):
+        return QtCore.QFileInfo(self.filePath(index))
+
+    def isDir(self, index):
+        return index.isValid() and index.row() < len(self.rows) and self.rows[index.row()][IS_DIR]
+
+    def setNameFilters(self, filters):
+        self.name_filters = list(filters)
+        self.apply(self.visible(self.entries))
+
+    def nameFilters(self):
+        return self.name_filters
+
+    def setNameFilterDisables(self, state):
+        # filtered files are always hidden
+        pass
+
+    def setFilter(self, filters):
+        # always shows files and directories including '..'
+        pass
+
+    def setReadOnly(self, state):
+        pass
+
+    # scanning
+    def scan(self, revalidate):
+        self.generation += 1
+        self.revalidating = revalidate
+        self.scanned = {}
+        self.jobs.put((self.root, self.generation))
+
+    def rescan(self):
+        if self.root:
+            self.scan(True)
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None: break
+            path, generation = job
+            if generation != self.generation: continue
+            try:
+                self.list_directory(path, generation)
+            except OSError as e:
+                self.batch.emit(generation, e, True)
+
+    def list_directory(self, path, generation):
+        rows = []
+        if os.path.dirname(path) != path:
+            rows.append(('..', True, 0, 0.0, ''))
+        sent = time.monotonic()
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'): continue
+                try:
+                    is_dir = entry.is_dir()
+                    stat = entry.stat()
+                except OSError:
+                    # vanished or a broken link
+                    continue
+                summary = ''
+                if not is_dir and entry.name.lower().endswith(PROGRAM_TYPES):
+                    summary = self.stat_cache.summary(entry.path, stat)
+                rows.append((entry.name, is_dir, 0 if is_dir else stat.st_size, stat.st_mtime, summary))
+                if len(rows) >= BATCH_ROWS or time.monotonic() - sent > BATCH_SECONDS:
+                    if generation != self.generation: return
+                    self.batch.emit(generation, rows, False)
+                    rows = []
+                    sent = time.monotonic()
+        self.batch.emit(generation, rows, True)
+
+    def batch_ready(self, generation, rows, finished):
+        if generation != self.generation: return
+        if isinstance(rows, OSError):
+            self.failed.emit(self.root, str(rows))
+            return
+        for row in rows:
+            self.scanned[row[NAME]] = row
+        if not self.revalidating:
+            # the first scan of a directory shows rows as they come
+            self.entries.update(self.scanned)
+            self.scanned = {}
+        if not finished:
+            if not self.revalidating:
+                self.apply(self.visible(self.entries))
+            return
+        if self.revalidating:
+            self.entries = self.scanned
+        self.scanned = {}
+        self.listings[self.root] = dict(self.entries)
+        self.listings.move_to_end(self.root)
+        if len(self.listings) > self.cached_dirs:
+            self.listings.popitem(last=False)
+        self.apply(self.visible(self.entries))
+        self.directoryLoaded.emit(self.root)
+
+    # rows
+    def sort_key(self, row):
+        # directories first, '..' before anything else, like QFileSystemModel
+        reverse = self.sort_order == QtCore.Qt.DescendingOrder
+        if self.sort_column == 1:
+            value = row[SIZE]
+        elif self.sort_column == 2:
+            value = self.type_name(row).lower()
+        elif self.sort_column == 3:
+            value = row[MTIME]
+        else:
+            value = row[NAME].lower()
+        if reverse and not isinstance(value, str):
+            value = -value
+        return (row[NAME] != '..', not row[IS_DIR], value, row[NAME])
+
+    def visible(self, entries):
+        rows = [row for row in entries.values() if row[IS_DIR] or not self.name_filters
+                or any(fnmatch.fnmatch(row[NAME].lower(), pattern.lower()) for pattern in self.name_filters)]
+        rows.sort(key=self.sort_key)
+        if self.sort_order == QtCore.Qt.DescendingOrder and self.sort_column in (0, 2):
+            # string keys can't be negated, reverse within the '..', folders and files groups
+            groups = OrderedDict()
+            for row in rows:
+                groups.setdefault(self.sort_key(row)[:2], []).append(row)
+            rows = [row for group in groups.values() for row in reversed(group)]
+        return rows
+
+    def apply(self, rows):
+        # change the model to the new rows without a reset, so selections and scrolling stay put
+        new = {row[NAME]: row for row in rows}
+        old = {row[NAME]: row for row in self.rows}
+        for i in range(len(self.rows) - 1, -1, -1):
+            name = self.rows[i][NAME]
+            if name not in new or new[name] != old[name]:
+                self.beginRemoveRows(QtCore.QModelIndex(), i, i)
+                del self.rows[i]
+                self.endRemoveRows()
+        # what's left is in the same order as the new rows, insert the rest in runs
+        i = 0
+        while i < len(rows):
+            if i < len(self.rows) and self.rows[i][NAME] == rows[i][NAME]:
+                i += 1
+                continue
+            end = i
+            kept = self.rows[i][NAME] if i < len(self.rows) else None
+            while end < len(rows) and rows[end][NAME] != kept:
+                end += 1
+            self.beginInsertRows(QtCore.QModelIndex(), i, end - 1)
+            self.rows[i:i] = rows[i:end]
+            self.endInsertRows()
+            i = end
+
+    def sort(self, column, order=QtCore.Qt.AscendingOrder):
+        self.sort_column = column
+        self.sort_order = order
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        names = [self.rows[index.row()][NAME] if index.row() < len(self.rows) else None for index in persistent]
+        self.rows = self.visible(self.entries)
+        rows = {row[NAME]: i for i, row in enumerate(self.rows)}
+        self.changePersistentIndexList(persistent, [self.index(rows[name], index.column()) if name in rows
+                                                    else QtCore.QModelIndex() for name, index in zip(names, persistent)])
+        self.layoutChanged.emit()
+
+    def type_name(self, row):
+        if row[IS_DIR]: return "Folder"
+        suffix = os.path.splitext(row[NAME])[1][1:]
+        return "{} File".format(suffix) if suffix else "File"
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid(): return 0
+        return len(self.rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid(): return 0
+        return len(COLUMNS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return COLUMNS[section]
+        return None
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.rows): return None
+        row = self.rows[index.row()]
+        column = index.column()
+        if role == QtCore.Qt.DisplayRole:
+            if column == 0: return row[NAME]
+            if column == 1: return '' if row[IS_DIR] else format_size(row[SIZE])
+            if column == 2: return self.type_name(row)
+            if column == 3 and row[NAME] != '..':
+                return QtCore.QDateTime.fromMSecsSinceEpoch(int(row[MTIME] * 1000)).toString("yyyy-MM-dd hh:mm")
+        elif role == QtCore.Qt.DecorationRole and column == 0:
+            return self.icons[row[IS_DIR]]
+        elif role == QtCore.Qt.ToolTipRole and row[SUMMARY]:
+            return row[SUMMARY]
+        elif role == QtCore.Qt.TextAlignmentRole and column == 1:
+            return int(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+        return None
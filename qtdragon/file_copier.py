@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# Background file copy
+#
+# Copies are queued and done by a worker thread in chunks, so copying a large
+# file from a slow USB stick doesn't freeze the GUI. Each file is written to a
+# temporary name, synced, read back and compared by checksum before it is
+# renamed into place.
+
+import os
+import queue
+import hashlib
+import threading
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+CHUNK_SIZE = 1 << 20
+
+class CopyCancelled(Exception):
+    pass
+
+class FileCopier(QObject):
+    # source, destination, percent
+    progress = pyqtSignal(str, str, int)
+    finished = pyqtSignal(str, str)
+    failed = pyqtSignal(str, str, str)
+    cancelled = pyqtSignal(str, str)
+    # number of copies waiting or in progress
+    pending = pyqtSignal(int)
+
+    def __init__(self):
+        super(FileCopier, self).__init__()
+        self.jobs = queue.Queue()
+        # cancelling bumps the generation, jobs queued under an older one are dropped
+        self.generation = 0
+        self.count = 0
+        self.count_lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def add(self, source, destination):
+        self.update_count(1)
+        self.jobs.put((source, destination, self.generation))
+
+    def cancel(self):
+        # cancels the copy in progress and everything queued behind it
+        self.generation += 1
+
+    def shutdown(self):
+        self.cancel()
+        self.jobs.put(None)
+        self.thread.join(2)
+
+    def update_count(self, delta):
+        with self.count_lock:
+            self.count += delta
+            count = self.count
+        self.pending.emit(count)
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None: break
+            source, destination, generation = job
+            try:
+                self.copy(source, destination, generation)
+                self.finished.emit(source, destination)
+            except CopyCancelled:
+                self.cancelled.emit(source, destination)
+            except Exception as e:
+                self.failed.emit(source, destination, str(e))
+            self.update_count(-1)
+
+    def check_cancel(self, generation):
+        if generation != self.generation:
+            raise CopyCancelled()
+
+    def copy(self, source, destination, generation):
+        self.check_cancel(generation)
+        if os.path.abspath(source) == os.path.abspath(destination):
+            raise OSError("Source and destination are the same file")
+        size = os.path.getsize(source)
+        temp = destination + '.part'
+        src_hash = hashlib.sha256()
+        done = 0
+        percent = -1
+        try:
+            with open(source, 'rb') as fsrc, open(temp, 'wb') as fdst:
+                while True:
+                    self.check_cancel(generation)
+                    chunk = fsrc.read(CHUNK_SIZE)
+                    if not chunk: break
+                    fdst.write(chunk)
+                    src_hash.update(chunk)
+                    done += len(chunk)
+                    new_percent = int(done * 100 / size) if size else 100
+                    if new_percent != percent:
+                        percent = new_percent
+                        self.progress.emit(source, destination, percent)
+                fdst.flush()
+                os.fsync(fdst.fileno())
+                # drop the cached pages so the checksum reads back what is on the device
+                if hasattr(os, 'posix_fadvise'):
+                    os.posix_fadvise(fdst.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+            if self.checksum(temp, generation) != src_hash.hexdigest():
+                raise OSError("Checksum mismatch after copy")
+            os.replace(temp, destination)
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+
+    def checksum(self, filename, generation):
+        sha = hashlib.sha256()
+        with open(filename, 'rb') as f:
+            while True:
+                self.check_cancel(generation)
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk: break
+                sha.update(chunk)
+        return sha.hexdigest()
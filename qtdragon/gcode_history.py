@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# Recently loaded G-code files
+#
+# Most recently used list with a dict index, so loading a file that is already
+# in the history just moves it to the front instead of adding a duplicate.
+
+import os
+import json
+import time
+from collections import OrderedDict
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QStyledItemDelegate
+
+# item data role holding the entry's metadata text
+META_ROLE = Qt.UserRole + 1
+
+class GcodeHistory():
+    def __init__(self, capacity=20):
+        self.capacity = max(1, capacity)
+        # filename -> metadata, oldest first
+        self.entries = OrderedDict()
+
+    def __contains__(self, filename):
+        return filename in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, filename):
+        try:
+            size = os.path.getsize(filename)
+        except OSError:
+            size = None
+        self.entries.pop(filename, None)
+        self.entries[filename] = {'loaded': time.time(), 'size': size}
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def remove(self, filename):
+        self.entries.pop(filename, None)
+
+    def newest_first(self):
+        return reversed(self.entries.items())
+
+    def to_text(self):
+        return json.dumps([[name, meta] for name, meta in self.entries.items()])
+
+    def from_text(self, text):
+        self.entries.clear()
+        try:
+            items = json.loads(text) if text else []
+        except ValueError:
+            items = []
+        for item in items[-self.capacity:]:
+            try:
+                name, meta = item
+            except (TypeError, ValueError):
+                continue
+            if isinstance(name, str) and isinstance(meta, dict):
+                self.entries[name] = meta
+
+    @staticmethod
+    def describe(meta):
+        size = meta.get('size')
+        if size is None:
+            size_text = "missing"
+        elif size < 1 << 20:
+            size_text = "{:.1f} kB".format(size / 1024)
+        else:
+            size_text = "{:.1f} MB".format(size / (1 << 20))
+        loaded = time.strftime("%Y-%m-%d %H:%M", time.localtime(meta.get('loaded', 0)))
+        return "{}, loaded {}".format(size_text, loaded)
+
+class HistoryDelegate(QStyledItemDelegate):
+    # shows the metadata after the filename in the dropdown list only
+    def initStyleOption(self, option, index):
+        super(HistoryDelegate, self).initStyleOption(option, index)
+        meta = index.data(META_ROLE)
+        if meta:
+            option.text = "{}   ({})".format(option.text, meta)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# Paged G-code viewer for very large programs
+#
+# The program file is memory mapped and indexed in a worker thread. Only the
+# start of every STRIDE-th line is kept, so a program with millions of lines
+# needs a few megabytes of index. The view asks for lines as it scrolls. Each
+# request decodes one block of STRIDE lines and keeps the most recent blocks,
+# so memory stays bounded however big the file is.
+
+import os
+import mmap
+import threading
+from array import array
+from itertools import accumulate
+from collections import OrderedDict
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+from PyQt5.QtCore import pyqtSignal
+
+STRIDE = 64
+CHUNK = 4 << 20
+
+class LineIndex():
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = open(filename, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+        # byte offset of lines 0, STRIDE, 2 * STRIDE ...
+        self.offsets = array('Q', [0])
+        self.count = 0
+
+    def build(self, cancelled=lambda: False):
+        newlines = 0
+        position = 0
+        while position < self.size:
+            chunk = self.map[position:position + CHUNK]
+            parts = chunk.split(b'\n')
+            # offsets just past each newline, where the following lines start
+            ends = list(accumulate((len(part) + 1 for part in parts[:-1]), initial=position))[1:]
+            # the line starting at ends[k] is line newlines + k + 1
+            first = (STRIDE - (newlines + 1) % STRIDE) % STRIDE
+            self.offsets.extend(ends[first::STRIDE])
+            newlines += len(ends)
+            # carry on from the start of the unfinished last line
+            if ends and position + len(chunk) < self.size:
+                position = ends[-1]
+            else:
+                position += len(chunk)
+            if cancelled(): return False
+        self.count = newlines
+        if self.size and self.map[self.size - 1:self.size] != b'\n':
+            self.count += 1
+        elif len(self.offsets) > 1 and self.offsets[-1] >= self.size:
+            # nothing after the last newline
+            self.offsets.pop()
+        return True
+
+    def block(self, number):
+        start = self.offsets[number]
+        end = self.offsets[number + 1] if number + 1 < len(self.offsets) else self.size
+        text = self.map[start:end].decode('utf-8', 'replace')
+        return [line.rstrip('\r') for line in text.split('\n')[:STRIDE]]
+
+    def close(self):
+        if self.size:
+            self.map.close()
+        self.file.close()
+
+class PagedDocument(QtCore.QAbstractListModel):
+    # filename, number of lines
+    indexed = pyqtSignal(str, int)
+    failed = pyqtSignal(str, str)
+    # from the worker thread: generation, index or error text
+    ready = pyqtSignal(int, object)
+
+    def __init__(self, cache_blocks=64, parent=None):
+        super(PagedDocument, self).__init__(parent)
+        self.line_index = None
+        self.filename = None
+        self.cache = OrderedDict()
+        self.cache_blocks = cache_blocks
+        self.generation = 0
+        self.ready.connect(self.index_ready)
+
+    def open(self, filename):
+        self.close()
+        self.filename = filename
+        generation = self.generation
+        thread = threading.Thread(target=self.build, args=(filename, generation), daemon=True)
+        thread.start()
+
+    def build(self, filename, generation):
+        try:
+            index = LineIndex(filename)
+            if not index.build(lambda: generation != self.generation):
+                index.close()
+                return
+        except (OSError, ValueError) as e:
+            self.ready.emit(generation, str(e))
+            return
+        self.ready.emit(generation, index)
+
+    def index_ready(self, generation, index):
+        if generation != self.generation or self.filename is None:
+            if isinstance(index, LineIndex):
+                index.close()
+            return
+        if not isinstance(index, LineIndex):
+            self.failed.emit(self.filename, index)
+            return
+        self.beginResetModel()
+        self.line_index = index
+        self.cache.clear()
+        self.endResetModel()
+        self.indexed.emit(self.filename, index.count)
+
+    def close(self):
+        # also cancels indexing in progress
+        self.generation += 1
+        self.filename = None
+        if self.line_index is None: return
+        self.beginResetModel()
+        self.line_index.close()
+        self.line_index = None
+        self.cache.clear()
+        self.endResetModel()
+
+    def line_count(self):
+        return self.line_index.count if self.line_index is not None else 0
+
+    def line(self, row):
+        number, offset = divmod(row, STRIDE)
+        block = self.cache.get(number)
+        if block is None:
+            block = self.line_index.block(number)
+            self.cache[number] = block
+            if len(self.cache) > self.cache_blocks:
+                self.cache.popitem(last=False)
+        else:
+            self.cache.move_to_end(number)
+        return block[offset] if offset < len(block) else ''
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid(): return 0
+        return self.line_count()
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if role != QtCore.Qt.DisplayRole or not index.isValid() or self.line_index is None: return None
+        return "{:>8}  {}".format(index.row() + 1, self.line(index.row()))
+
+class PagedView(QtWidgets.QListView):
+    # 1 based line number
+    line_selected = pyqtSignal(int)
+
+    def __init__(self, document, parent=None):
+        super(PagedView, self).__init__(parent)
+        # every row the same height, so the view never measures rows it doesn't show
+        self.setUniformItemSizes(True)
+        self.setModel(document)
+        self.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
+        self.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
+        self.clicked.connect(lambda index: self.line_selected.emit(index.row() + 1))
+
+    def show_line(self, line):
+        row = line - 1
+        if not 0 <= row < self.model().line_count(): return
+        index = self.model().index(row)
+        self.setCurrentIndex(index)
+        self.scrollTo(index, QtWidgets.QAbstractItemView.PositionAtCenter)
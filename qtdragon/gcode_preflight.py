@@ -0,0 +1,598 @@
+#!/usr/bin/env python3
+# G-code pre-flight check
+#
+# Reads a program once in a worker thread and works out what it will do before
+# it runs: the extents of every move, the tools it calls, the range of feeds
+# and spindle speeds. The moves are also handed to a RunEstimate for the run
+# time. The parser only follows the common
+# modal codes. Lines it can't evaluate (parameters, expressions, O-word
+# subroutines) are skipped and the result is marked approximate.
+#
+# Results are cached in the config directory by file hash, with the file's
+# mtime and size as a shortcut so an unchanged file isn't even read again.
+# A result only counts if it was made with the same machine limits. Only the
+# most recently loaded files are kept, and the cache is read and written by
+# the worker thread.
+#
+# Every few hundred lines the parser state is saved together with the byte
+# offset of the next line, so run from line can pick up from the nearest one
+# instead of reading the whole program again. These checkpoints are kept in a
+# file per result next to the index, which stays small.
+
+import os
+import re
+import math
+import json
+import queue
+import hashlib
+import threading
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from run_estimate import RunEstimate
+
+AXES = 'XYZA'
+WORD = re.compile(r'([A-Z])([-+]?(?:\d+\.?\d*|\.\d+))')
+COMMENT = re.compile(r'\([^)]*\)|;.*$')
+# bump when the result format changes so old cache entries are ignored
+CACHE_VERSION = 5
+# order of the modal state in a checkpoint
+STATE_KEYS = ('motion', 'plane', 'metric', 'absolute', 'arc_absolute', 'feed_mode', 'feed',
+              'speed', 'tool', 'next_tool', 'coord', 'spindle', 'coolant', 'length_offset',
+              'length_tool', 'cutter_comp')
+# queued to have the worker write the cache index
+SAVE = 'save'
+
+class GcodeParser():
+    # follows position and modal state line by line, everything in machine units
+    def __init__(self, machine_metric=True, estimate=None, path=None):
+        self.machine_metric = machine_metric
+        self.estimate = estimate
+        # called with each point the tool passes and whether it got there at feed
+        self.path = path
+        self.position = dict.fromkeys(AXES, 0.0)
+        self.known = dict.fromkeys(AXES, False)
+        self.state = {'motion': 0, 'plane': 17, 'metric': machine_metric, 'absolute': True,
+                      'arc_absolute': False, 'feed_mode': 94, 'feed': 0.0, 'speed': 0.0,
+                      'tool': 0, 'next_tool': 0, 'coord': 'G54', 'spindle': 5, 'coolant': 9,
+                      # G43, G43.1 or G49 and the tool its offset came from, 0 until the program sets it
+                      'length_offset': 0, 'length_tool': 0, 'cutter_comp': 40}
+        self.lines = 0
+        self.extents = {}
+        self.tools = []
+        self.feeds = [None, None]
+        self.speeds = [None, None]
+        self.feed_length = 0.0
+        self.rapid_length = 0.0
+        self.approximate = False
+        self.ended = False
+
+    def snapshot(self):
+        # enough to carry on parsing from here, kept small for the cache
+        return [[self.state[key] for key in STATE_KEYS], [self.position[axis] for axis in AXES],
+                [self.known[axis] for axis in AXES], self.ended]
+
+    def restore(self, snapshot, lines):
+        state, position, known, self.ended = snapshot
+        self.state = dict(zip(STATE_KEYS, state))
+        self.position = dict(zip(AXES, position))
+        self.known = dict(zip(AXES, known))
+        self.lines = lines
+
+    def factor(self):
+        # program units to machine units
+        if self.state['metric'] == self.machine_metric: return 1.0
+        return 1 / 25.4 if self.state['metric'] else 25.4
+
+    def parse_line(self, line):
+        self.lines += 1
+        if self.ended: return
+        line = COMMENT.sub('', line).strip().upper()
+        if not line or line.startswith('%'): return
+        line = line.lstrip('/')
+        if '#' in line or '[' in line or line.startswith('O'):
+            self.approximate = True
+            return
+        words = {}
+        gcodes = []
+        mcodes = []
+        for letter, value in WORD.findall(line.replace(' ', '')):
+            value = float(value)
+            if letter == 'G':
+                gcodes.append(value)
+            elif letter == 'M':
+                mcodes.append(int(value))
+            else:
+                words[letter] = value
+        self.execute(gcodes, mcodes, words)
+
+    def execute(self, gcodes, mcodes, words):
+        state = self.state
+        machine_coords = False
+        non_modal = None
+        length_tool = False
+        for g in gcodes:
+            code = round(g, 1)
+            if code in (0, 1, 2, 3, 38.2, 38.3, 38.4, 38.5) or 73 <= code <= 89:
+                state['motion'] = code
+            elif code in (17, 18, 19):
+                state['plane'] = int(code)
+            elif code == 20:
+                state['metric'] = False
+            elif code == 21:
+                state['metric'] = True
+            elif code == 90:
+                state['absolute'] = True
+            elif code == 91:
+                state['absolute'] = False
+            elif code == 90.1:
+                state['arc_absolute'] = True
+            elif code == 91.1:
+                state['arc_absolute'] = False
+            elif code in (93, 94, 95):
+                state['feed_mode'] = int(code)
+            elif code == 53:
+                machine_coords = True
+            elif code in (4, 10, 28, 30, 92):
+                non_modal = code
+            elif 54 <= code <= 59.3:
+                state['coord'] = "G{:g}".format(code)
+            elif code in (43, 43.1, 49):
+                state['length_offset'] = code
+                if code == 43:
+                    length_tool = True
+            elif code in (40, 41, 41.1, 42, 42.1):
+                state['cutter_comp'] = code
+        scale = self.factor()
+        if 'F' in words:
+            state['feed'] = words['F'] * (scale if state['feed_mode'] != 93 else 1.0)
+            if state['feed'] > 0:
+                self.update_range(self.feeds, state['feed'])
+        if 'S' in words:
+            state['speed'] = words['S']
+            if state['speed'] > 0:
+                self.update_range(self.speeds, state['speed'])
+        if 'T' in words:
+            state['next_tool'] = int(words['T'])
+            if state['next_tool'] not in self.tools:
+                self.tools.append(state['next_tool'])
+        for m in mcodes:
+            if m in (0, 1, 6, 60):
+                self.stop_motion()
+            if m == 6:
+                state['tool'] = state['next_tool']
+            elif m in (3, 4, 5):
+                state['spindle'] = m
+            elif m in (7, 8, 9):
+                state['coolant'] = m
+            elif m in (2, 30):
+                self.ended = True
+        if length_tool:
+            # after any M6 on the line, without H it's the offset of the tool in the spindle
+            state['length_tool'] = int(words.get('H', state['tool']))
+        if non_modal == 4:
+            if self.estimate is not None:
+                self.estimate.dwell(self.lines, words.get('P', 0.0))
+            return
+        if non_modal in (10, 28, 30, 92):
+            # setting offsets or going home, the positions depend on the machine
+            if non_modal in (28, 30, 92) and any(axis in words for axis in AXES):
+                self.approximate = True
+            if non_modal in (28, 30):
+                self.known = dict.fromkeys(AXES, False)
+                self.stop_motion()
+            return
+        if not any(axis in words for axis in AXES): return
+        target = dict(self.position)
+        unknown = set()
+        for axis in AXES:
+            if axis not in words: continue
+            value = words[axis] * (scale if axis != 'A' else 1.0)
+            if state['absolute'] or machine_coords:
+                target[axis] = value
+            elif self.known[axis]:
+                target[axis] += value
+            else:
+                # incremental from an unknown start, so the end is unknown too
+                unknown.add(axis)
+                self.approximate = True
+        if machine_coords:
+            # G53 moves are in machine coordinates, not part of the program extents
+            self.approximate = True
+            self.stop_motion()
+            if self.path is not None:
+                self.path(target, False)
+            self.position = target
+            return
+        motion = state['motion']
+        start_known = all(self.known[axis] for axis in 'XYZ')
+        if motion in (2, 3):
+            self.arc(target, words, motion == 2, scale, start_known)
+        else:
+            self.line(target, motion, start_known)
+            if motion >= 73:
+                # canned cycles also go down to Z and back to R
+                self.approximate = True
+                if 'R' in words:
+                    self.add_point('Z', words['R'] * scale)
+        if self.path is not None:
+            self.path(target, motion != 0 and start_known)
+        for axis in AXES:
+            if axis in words and axis not in unknown:
+                self.known[axis] = True
+                self.add_point(axis, target[axis])
+        self.position = target
+
+    def update_range(self, limits, value):
+        if limits[0] is None or value < limits[0]: limits[0] = value
+        if limits[1] is None or value > limits[1]: limits[1] = value
+
+    def add_point(self, axis, value):
+        if axis not in self.extents:
+            self.extents[axis] = [value, value]
+        else:
+            self.update_range(self.extents[axis], value)
+
+    def distance(self, start, end):
+        return math.sqrt(sum((end[axis] - start[axis]) ** 2 for axis in 'XYZ'))
+
+    def travel(self, target, length):
+        # length and unit direction for timing, moves of only the A axis go by degrees
+        if length > 1e-9:
+            return length, {axis: (target[axis] - self.position[axis]) / length for axis in 'XYZ'}
+        turn = target['A'] - self.position['A']
+        return abs(turn), {'A': 1.0 if turn >= 0 else -1.0}
+
+    def stop_motion(self):
+        if self.estimate is not None:
+            self.estimate.stop()
+
+    def feed_move(self, length, start_dir, end_dir, radius=None):
+        feed = self.state['feed']
+        feed_mode = self.state['feed_mode']
+        if feed_mode == 93:
+            # inverse time, the move takes 1/F minutes
+            rate = length * feed
+        elif feed_mode == 95:
+            rate = feed * self.state['speed']
+        else:
+            rate = feed
+        if rate <= 0:
+            self.approximate = True
+            self.stop_motion()
+            return
+        if self.estimate is not None:
+            self.estimate.move(self.lines, length, start_dir, end_dir, rate, radius)
+
+    def line(self, target, motion, start_known):
+        if not start_known:
+            self.stop_motion()
+            return
+        length = self.distance(self.position, target)
+        travel, direction = self.travel(target, length)
+        if motion == 0:
+            self.rapid_length += length
+            if self.estimate is not None:
+                self.estimate.move(self.lines, travel, direction, direction)
+        else:
+            self.feed_length += length
+            self.feed_move(travel, direction, direction)
+
+    def arc(self, target, words, clockwise, scale, start_known):
+        a, b, c, i, j = {17: ('X', 'Y', 'Z', 'I', 'J'),
+                         18: ('Z', 'X', 'Y', 'K', 'I'),
+                         19: ('Y', 'Z', 'X', 'J', 'K')}[self.state['plane']]
+        if not start_known:
+            # no idea where the arc starts, only the end point counts
+            self.approximate = True
+            self.stop_motion()
+            return
+        sa, sb = self.position[a], self.position[b]
+        ea, eb = target[a], target[b]
+        if 'R' in words:
+            center = self.center_from_radius(sa, sb, ea, eb, words['R'] * scale, clockwise)
+            if center is None:
+                self.line(target, 1, start_known)
+                self.approximate = True
+                return
+            ca, cb = center
+        else:
+            ca = words.get(i, 0.0) * scale
+            cb = words.get(j, 0.0) * scale
+            if not self.state['arc_absolute']:
+                ca += sa
+                cb += sb
+        radius = math.hypot(sa - ca, sb - cb)
+        start_angle = math.atan2(sb - cb, sa - ca)
+        end_angle = math.atan2(eb - cb, ea - ca)
+        if clockwise:
+            sweep = (start_angle - end_angle) % (2 * math.pi)
+        else:
+            sweep = (end_angle - start_angle) % (2 * math.pi)
+        if sweep < 1e-9:
+            sweep = 2 * math.pi
+        turns = int(words.get('P', 1))
+        sweep += 2 * math.pi * (turns - 1)
+        # the extreme points of the circle that the arc passes through
+        for quadrant in range(4):
+            angle = quadrant * math.pi / 2
+            offset = ((start_angle - angle) if clockwise else (angle - start_angle)) % (2 * math.pi)
+            if offset <= sweep:
+                self.add_point(a, ca + radius * math.cos(angle))
+                self.add_point(b, cb + radius * math.sin(angle))
+        self.add_point(a, sa)
+        self.add_point(b, sb)
+        helix = target[c] - self.position[c]
+        if self.path is not None:
+            # points every 10 degrees or so, the end point is sent with the other moves
+            steps = max(2, int(sweep / (math.pi / 18)))
+            direction = -1 if clockwise else 1
+            for step in range(1, steps):
+                angle = start_angle + direction * sweep * step / steps
+                point = dict(target)
+                point[a] = ca + radius * math.cos(angle)
+                point[b] = cb + radius * math.sin(angle)
+                point[c] = self.position[c] + helix * step / steps
+                self.path(point, True)
+        length = math.hypot(radius * sweep, helix)
+        self.feed_length += length
+        if length < 1e-9: return
+        # tangents at both ends for the speed through the corners
+        turn = (sweep if not clockwise else -sweep) / length
+        start_dir = {a: -(sb - cb) * turn, b: (sa - ca) * turn, c: helix / length}
+        end_dir = {a: -(eb - cb) * turn, b: (ea - ca) * turn, c: helix / length}
+        self.feed_move(length, start_dir, end_dir, radius)
+
+    def center_from_radius(self, sa, sb, ea, eb, radius, clockwise):
+        chord = math.hypot(ea - sa, eb - sb)
+        if chord == 0 or abs(radius) < chord / 2 - 1e-6: return None
+        height = math.sqrt(max(0.0, radius * radius - chord * chord / 4))
+        # a negative radius asks for the long way round
+        if clockwise == (radius > 0):
+            height = -height
+        ma, mb = (sa + ea) / 2, (sb + eb) / 2
+        return ma - height * (eb - sb) / chord, mb + height * (ea - sa) / chord
+
+    def result(self):
+        estimate = self.estimate.result() if self.estimate is not None else None
+        return {'lines': self.lines,
+                'extents': self.extents,
+                'tools': self.tools,
+                'feed': self.feeds,
+                'speed': self.speeds,
+                'feed_length': self.feed_length,
+                'rapid_length': self.rapid_length,
+                'time': sum(estimate['totals']) if estimate else 0.0,
+                'estimate': estimate,
+                'metric': self.machine_metric,
+                'approximate': self.approximate}
+
+def check_limits(result, limits, offsets):
+    # limits and offsets map axis -> (min, max) and offset in machine units
+    problems = []
+    for axis, (low, high) in sorted(result['extents'].items()):
+        if axis not in limits: continue
+        offset = offsets.get(axis, 0.0)
+        min_limit, max_limit = limits[axis]
+        if low + offset < min_limit:
+            problems.append("{} goes to {:.3f}, below the limit of {:.3f}".format(axis, low + offset, min_limit))
+        if high + offset > max_limit:
+            problems.append("{} goes to {:.3f}, above the limit of {:.3f}".format(axis, high + offset, max_limit))
+    return problems
+
+def summary(result):
+    lines = []
+    for axis, (low, high) in sorted(result['extents'].items()):
+        lines.append("{} {:.3f} to {:.3f}".format(axis, low, high))
+    tools = ", ".join("T{}".format(tool) for tool in result['tools']) or "none"
+    lines.append("Tools: {}".format(tools))
+    if result['feed'][0] is not None:
+        lines.append("Feed {:g} to {:g}".format(*result['feed']))
+    if result['speed'][0] is not None:
+        lines.append("Speed {:g} to {:g}".format(*result['speed']))
+    seconds = int(result['time'])
+    estimate = "{:02d}:{:02d}:{:02d}".format(seconds // 3600, (seconds // 60) % 60, seconds % 60)
+    lines.append("Estimated time {}{}".format(estimate, " (approximate)" if result['approximate'] else ""))
+    return lines
+
+def file_hash(filename):
+    sha = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def hash_lines(filename):
+    # file hash and number of lines in one pass
+    sha = hashlib.sha1()
+    lines = 0
+    last = b'\n'
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+            lines += chunk.count(b'\n')
+            last = chunk[-1:]
+    if last != b'\n':
+        lines += 1
+    return sha.hexdigest(), lines
+
+class Preflight(QObject):
+    # filename, result
+    finished = pyqtSignal(str, dict)
+    failed = pyqtSignal(str, str)
+
+    def __init__(self, cache_dir, machine_metric=True, limits=None, checkpoint_lines=1000, cache_files=100):
+        super(Preflight, self).__init__()
+        self.cache_dir = cache_dir
+        self.cache_file = os.path.join(cache_dir, 'index.json')
+        self.cache_files = max(1, cache_files)
+        self.machine_metric = machine_metric
+        self.limits = limits
+        self.checkpoint_lines = max(1, checkpoint_lines)
+        # compared with the copy in each cached result, so it goes through json too
+        self.config = json.loads(json.dumps([CACHE_VERSION, machine_metric, self.checkpoint_lines,
+                                             limits.signature() if limits is not None else None]))
+        self.cache_lock = threading.Lock()
+        # filled in by the worker, files are kept least recently used first
+        self.cache = {'files': {}, 'results': {}}
+        self.jobs = queue.Queue()
+        # a new request makes any analysis in progress pointless
+        self.generation = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def load_cache(self):
+        try:
+            with open(self.cache_file) as f:
+                cache = json.load(f)
+            if isinstance(cache.get('files'), dict) and isinstance(cache.get('results'), dict):
+                return cache
+        except (OSError, ValueError):
+            pass
+        return {'files': {}, 'results': {}}
+
+    def save_cache(self):
+        temp = self.cache_file + '.tmp'
+        try:
+            with self.cache_lock:
+                data = json.dumps(self.cache)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temp, 'w') as f:
+                f.write(data)
+            os.replace(temp, self.cache_file)
+        except OSError:
+            pass
+
+    def checkpoint_file(self, fhash):
+        return os.path.join(self.cache_dir, fhash + '.checkpoints')
+
+    def load_checkpoints(self, fhash):
+        # without them run from line reads the program from the start
+        try:
+            with open(self.checkpoint_file(fhash)) as f:
+                checkpoints = json.load(f)
+            return checkpoints if isinstance(checkpoints, list) else []
+        except (OSError, ValueError):
+            return []
+
+    def save_checkpoints(self, fhash, checkpoints):
+        name = self.checkpoint_file(fhash)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(name + '.tmp', 'w') as f:
+                json.dump(checkpoints, f)
+            os.replace(name + '.tmp', name)
+        except OSError:
+            pass
+
+    def prune(self, used):
+        # checkpoints of results that were dropped from the index
+        try:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.checkpoints') and name[:-len('.checkpoints')] not in used:
+                    os.remove(os.path.join(self.cache_dir, name))
+        except OSError:
+            pass
+
+    def analyze(self, filename):
+        self.generation += 1
+        self.jobs.put((filename, self.generation))
+
+    def shutdown(self):
+        self.generation += 1
+        self.jobs.put(None)
+        self.thread.join(2)
+
+    def cached(self, filename, stat):
+        with self.cache_lock:
+            entry = self.cache['files'].get(filename)
+            if entry is None or entry[:2] != [stat.st_mtime, stat.st_size]: return None
+            return self.cache['results'].get(entry[2])
+
+    def entry(self, filename):
+        # [mtime, size, hash] when the file was last checked, None if it wasn't
+        with self.cache_lock:
+            entry = self.cache['files'].get(filename)
+        return list(entry) if entry is not None else None
+
+    def touch(self, filename, stat):
+        # the file was saved again without changing, remember the new mtime
+        with self.cache_lock:
+            entry = self.cache['files'].get(filename)
+            if entry is None: return
+            entry[0] = stat.st_mtime
+        # written by the worker, not the GUI thread
+        self.jobs.put(SAVE)
+
+    def store(self, filename, stat, fhash, result):
+        stored = {key: value for key, value in result.items() if key != 'checkpoints'}
+        with self.cache_lock:
+            files = self.cache['files']
+            # moved to the end, the most recently used
+            files.pop(filename, None)
+            files[filename] = [stat.st_mtime, stat.st_size, fhash]
+            while len(files) > self.cache_files:
+                del files[next(iter(files))]
+            self.cache['results'][fhash] = stored
+            # forget results no file points at any more
+            used = {entry[2] for entry in files.values()}
+            for key in list(self.cache['results']):
+                if key not in used:
+                    del self.cache['results'][key]
+        self.save_cache()
+        self.prune(used)
+
+    def run(self):
+        cache = self.load_cache()
+        with self.cache_lock:
+            self.cache = cache
+        while True:
+            job = self.jobs.get()
+            if job is None: break
+            if job is SAVE:
+                self.save_cache()
+                continue
+            filename, generation = job
+            if generation != self.generation: continue
+            try:
+                result = self.process(filename, generation)
+            except Exception as e:
+                self.failed.emit(filename, str(e))
+                continue
+            if result is not None:
+                self.finished.emit(filename, result)
+
+    def process(self, filename, generation):
+        stat = os.stat(filename)
+        entry = self.entry(filename)
+        if entry is not None and entry[:2] == [stat.st_mtime, stat.st_size]:
+            fhash, lines = entry[2], None
+        else:
+            # hashing is much cheaper than parsing, a copy or a touched file is found by its contents
+            fhash, lines = hash_lines(filename)
+        with self.cache_lock:
+            result = self.cache['results'].get(fhash)
+        if result is not None and result.get('config') == self.config:
+            result = dict(result, checkpoints=self.load_checkpoints(fhash))
+        else:
+            if lines is None:
+                fhash, lines = hash_lines(filename)
+            estimate = RunEstimate(self.limits, lines) if self.limits is not None else None
+            parser = GcodeParser(self.machine_metric, estimate)
+            checkpoints = []
+            offset = 0
+            with open(filename, 'rb') as f:
+                for line in f:
+                    parser.parse_line(line.decode('utf-8', 'replace'))
+                    offset += len(line)
+                    if parser.lines % self.checkpoint_lines == 0:
+                        checkpoints.append([parser.lines, offset, parser.snapshot()])
+                    if parser.lines % 10000 == 0 and generation != self.generation:
+                        return None
+            result = parser.result()
+            result['checkpoints'] = checkpoints
+            result['checkpoint_lines'] = self.checkpoint_lines
+            result['config'] = self.config
+            self.save_checkpoints(fhash, checkpoints)
+        self.store(filename, stat, fhash, result)
+        return result
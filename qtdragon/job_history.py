@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# Job history database
+#
+# Every program run is recorded in an SQLite database in the config directory
+# so cycle times can be looked up per program. Hashing the file and writing the
+# row happen in a worker thread, the GUI only gets the 'updated' signal.
+
+import time
+import sqlite3
+import hashlib
+import threading
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    program TEXT NOT NULL,
+    file_hash TEXT,
+    started REAL NOT NULL,
+    start_line INTEGER,
+    run_time REAL,
+    paused_time REAL,
+    feedhold_time REAL,
+    pauses INTEGER,
+    aborted INTEGER,
+    tool INTEGER,
+    feed_override REAL,
+    spindle_override REAL,
+    rapid_override REAL
+);
+CREATE INDEX IF NOT EXISTS runs_program ON runs (program, aborted);
+CREATE INDEX IF NOT EXISTS runs_hash ON runs (file_hash);
+CREATE INDEX IF NOT EXISTS runs_started ON runs (started);
+"""
+
+def file_hash(filename):
+    sha = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+class JobRecord():
+    # collects what we know about a run while it is in progress
+    def __init__(self, program, start_line, tool):
+        self.program = program
+        self.start_line = start_line
+        self.tool = tool
+        self.started = time.time()
+        self.aborted = False
+        self.samples = 0
+        self.overrides = [0.0, 0.0, 0.0]
+
+    def sample(self, feed, spindle, rapid):
+        self.samples += 1
+        self.overrides[0] += feed
+        self.overrides[1] += spindle
+        self.overrides[2] += rapid
+
+    def averages(self):
+        if not self.samples: return (None, None, None)
+        return tuple(value / self.samples for value in self.overrides)
+
+class JobHistory(QObject):
+    updated = pyqtSignal()
+
+    def __init__(self, filename):
+        super(JobHistory, self).__init__()
+        self.filename = filename
+        self.lock = threading.Lock()
+        db = self.connect()
+        try:
+            db.executescript(SCHEMA)
+        finally:
+            db.close()
+
+    def connect(self):
+        # sqlite connections can't be shared between threads, so each user opens its own
+        return sqlite3.connect(self.filename, timeout=10)
+
+    def record(self, job, totals):
+        thread = threading.Thread(target=self.write_record, args=(job, totals), daemon=True)
+        thread.start()
+
+    def write_record(self, job, totals):
+        try:
+            fhash = file_hash(job.program)
+        except OSError:
+            fhash = None
+        feed, spindle, rapid = job.averages()
+        row = (job.program, fhash, job.started, job.start_line, totals['running'], totals['paused'],
+               totals['feedhold'], totals['pauses'], int(job.aborted), job.tool, feed, spindle, rapid)
+        with self.lock:
+            db = self.connect()
+            try:
+                with db:
+                    db.execute("INSERT INTO runs (program, file_hash, started, start_line, run_time, "
+                               "paused_time, feedhold_time, pauses, aborted, tool, feed_override, "
+                               "spindle_override, rapid_override) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)", row)
+            finally:
+                db.close()
+        self.updated.emit()
+
+    def program_stats(self):
+        # (program, runs, min, mean, max run time, last run) over complete runs from the first line
+        db = self.connect()
+        try:
+            return db.execute("SELECT program, COUNT(*), MIN(run_time), AVG(run_time), MAX(run_time), "
+                              "MAX(started) FROM runs WHERE aborted = 0 AND start_line <= 1 GROUP BY program "
+                              "ORDER BY MAX(started) DESC").fetchall()
+        finally:
+            db.close()
+
+    def runs(self, program, limit=50):
+        db = self.connect()
+        try:
+            return db.execute("SELECT started, start_line, run_time, paused_time, pauses, aborted, tool "
+                              "FROM runs WHERE program = ? ORDER BY started DESC LIMIT ?",
+                              (program, limit)).fetchall()
+        finally:
+            db.close()
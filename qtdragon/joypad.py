@@ -14,6 +14,7 @@
 # GNU General Public License for more details.
 ###############################################################################
 import sys
+import time
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtCore import Qt, QPoint, QPointF, QLineF, QRect, QRectF, QSize, QSizeF, QEvent
 from PyQt5.QtGui import QPainter, QPainterPath, QPen, QBrush, QColor, QFont, QPixmap, QRadialGradient
@@ -59,6 +60,12 @@ class JoyPad(QtWidgets.QWidget):
         self.highlight_bottom = False
         self.highlight_center = False
         self.last_active_btn = None
+        self.hover_btn = None
+        # cached drawing layers, rebuilt on resize or when an icon changes
+        self.background = None
+        self.highlight_layers = {}
+        self.reset_paint_stats()
+        self.create_paths()
         self.setMouseTracking(True)
         self.setToolTipDuration(2000)
         self.installEventFilter(self)
@@ -88,8 +95,10 @@ class JoyPad(QtWidgets.QWidget):
             elif event.type() == QEvent.MouseMove:
                 pos = event.pos()
                 active_btn = self.get_active_btn(pos)
-                if active_btn is not None:
-                    self.setToolTip(self.tooltips[active_btn])
+                if active_btn != self.hover_btn:
+                    self.hover_btn = active_btn
+                    if active_btn is not None:
+                        self.setToolTip(self.tooltips[active_btn])
         return super(JoyPad, self).eventFilter(obj, event)
 
     def _pressedOutput(self, btncode):
@@ -101,32 +110,76 @@ class JoyPad(QtWidgets.QWidget):
         self['joy_{}_released'.format(btncode.lower())].emit(False)
 
     def get_active_btn(self, pos):
-        if self.center_path.contains(pos): return 'C'
-        elif self.left_path.contains(pos): return 'L'
-        elif self.right_path.contains(pos): return 'R'
-        elif self.bottom_path.contains(pos): return 'B'
-        elif self.top_path.contains(pos): return 'T'
-        return None
+        # classify by distance from the center, then by which diagonal quadrant we're in
+        dx = pos.x() - self.hit_x
+        dy = self.hit_y - pos.y()
+        dist = dx * dx + dy * dy
+        if dist <= self.hit_cap: return 'C'
+        if dist < self.hit_inner or dist > self.hit_outer: return None
+        if abs(dx) >= abs(dy):
+            return 'R' if dx > 0 else 'L'
+        return 'T' if dy > 0 else 'B'
+
+    def resizeEvent(self, event):
+        self.create_paths()
+        super(JoyPad, self).resizeEvent(event)
 
     def paintEvent(self, event):
+        start = time.perf_counter()
+        if self.background is None:
+            self.background = self.render_layer(self.draw_background)
+        key = (self.highlight_color.rgba(), self.highlight_left, self.highlight_right,
+               self.highlight_top, self.highlight_bottom, self.highlight_center)
+        layer = self.highlight_layers.get(key)
+        if layer is None:
+            layer = self.render_layer(self.draw_highlight)
+            self.highlight_layers[key] = layer
         painter = QPainter(self)
-        painter.setRenderHint(painter.Antialiasing)
-        w = min(event.rect().width(), event.rect().height())
-        self.rect1.setSize(QSizeF(w * 0.4, w * 0.4))
-        self.rect2.setSize(QSizeF(w * 0.9, w * 0.9))
-        self.create_paths(painter, event)
-        self.draw_painter_paths(painter, event)
-        self.draw_icons(painter, event)
-        self.draw_highlight(painter, event)
+        painter.drawPixmap(0, 0, self.background)
+        painter.drawPixmap(0, 0, layer)
         painter.end()
+        self.paint_time = time.perf_counter() - start
+        self.paint_total += self.paint_time
+        self.paint_count += 1
+
+    def render_layer(self, draw):
+        # layers are drawn once per size and composited on every paint
+        ratio = self.devicePixelRatioF()
+        pix = QPixmap(self.size() * ratio)
+        pix.setDevicePixelRatio(ratio)
+        pix.fill(Qt.transparent)
+        qp = QPainter(pix)
+        qp.setRenderHint(QPainter.Antialiasing)
+        draw(qp)
+        qp.end()
+        return pix
+
+    def invalidate(self, background=True):
+        if background:
+            self.background = None
+        self.highlight_layers = {}
+        self.update()
+
+    def get_paint_stats(self):
+        # number of paints, average and last paint time in ms
+        avg = (self.paint_total / self.paint_count) * 1000 if self.paint_count else 0.0
+        return self.paint_count, avg, self.paint_time * 1000
+
+    def reset_paint_stats(self):
+        self.paint_count = 0
+        self.paint_total = 0.0
+        self.paint_time = 0.0
 
-    def create_paths(self, qp, event):
+    def create_paths(self):
         self.left_path = QPainterPath()
         self.right_path = QPainterPath()
         self.bottom_path = QPainterPath()
         self.top_path = QPainterPath()
         self.center_path = QPainterPath()
-        center = event.rect().center()
+        w = min(self.width(), self.height())
+        self.rect1.setSize(QSizeF(w * 0.4, w * 0.4))
+        self.rect2.setSize(QSizeF(w * 0.9, w * 0.9))
+        center = self.rect().center()
         self.rect1.moveCenter(center)
         self.rect2.moveCenter(center)
         left_start = QPointF(self.rect1.topLeft())
@@ -146,10 +199,21 @@ class JoyPad(QtWidgets.QWidget):
         cap.setSize(QSizeF(self.rect1.width()*0.8, self.rect1.height()*0.8))
         cap.moveCenter(center)
         self.center_path.addEllipse(cap)
-
-    def draw_painter_paths(self, qp, event):
-        w = min(event.rect().width(), event.rect().height())
-        center = event.rect().center()
+        # squared radii used for hit testing
+        self.hit_x = center.x()
+        self.hit_y = center.y()
+        self.hit_cap = (cap.width() / 2) ** 2
+        self.hit_inner = (self.rect1.width() / 2) ** 2
+        self.hit_outer = (self.rect2.width() / 2) ** 2
+        self.invalidate()
+
+    def draw_background(self, qp):
+        self.draw_painter_paths(qp)
+        self.draw_icons(qp)
+
+    def draw_painter_paths(self, qp):
+        w = min(self.width(), self.height())
+        center = self.rect().center()
         fp = QPoint(int(center.x() - w/4), int(center.y() - w/4))
         bg = QRadialGradient(center, w/2, fp)
         bg.setColorAt(0, QColor(180, 180, 180))
@@ -162,10 +226,10 @@ class JoyPad(QtWidgets.QWidget):
         qp.drawPath(self.bottom_path)
         qp.drawPath(self.center_path)
 
-    def draw_icons(self, qp, event):
+    def draw_icons(self, qp):
         rect = QRect()
         rect.setSize(QSize(int(self.rect1.width() * 0.4), int(self.rect1.height() * 0.4)))
-        center = event.rect().center()
+        center = self.rect().center()
         qp.setPen(QPen(Qt.white, 2))
         qp.setFont(QFont('Lato Heavy', 20))
         # left button
@@ -204,11 +268,11 @@ class JoyPad(QtWidgets.QWidget):
         elif isinstance(self.center_image, str):
             qp.drawText(rect, Qt.AlignCenter, self.center_image)
 
-    def draw_highlight(self, qp, event):
+    def draw_highlight(self, qp):
         rect = QRectF()
         rect.setSize(self.rect1.size() * 0.9)
-        center = event.rect().center()
-        rect.moveCenter(center)
+        center = self.rect().center()
+        rect.moveCenter(QPointF(center))
         pen_width = self.rect1.width() * 0.08
         qp.setPen(QPen(self.highlight_color, pen_width, cap = Qt.FlatCap))
         if self.highlight_center is True:
@@ -226,13 +290,14 @@ class JoyPad(QtWidgets.QWidget):
     def set_highlight(self, btn, state):
         if btn not in self.axis_list and btn not in self.btn_names.keys(): return
         if btn == 'X' or btn == 'A':
-            self.highlight_left = state
-            self.highlight_right = state
+            names = ('left', 'right')
         elif btn == 'Y' or btn == 'Z':
-            self.highlight_top = state
-            self.highlight_bottom = state
+            names = ('top', 'bottom')
         else:
-            name = self.btn_names[btn]
+            names = (self.btn_names[btn],)
+        # MPG axis pins toggle often, only repaint on an actual change
+        if all(self['highlight_' + name] == state for name in names): return
+        for name in names:
             self['highlight_' + name] = state
         self.update()
 
@@ -247,17 +312,18 @@ class JoyPad(QtWidgets.QWidget):
         elif kind == 'text':
             self[name + "_image"] = data
         else: return
-        self.update()
+        self.invalidate()
 
     def set_tooltip(self, btn, tip):
         if btn in self.btn_names.keys():
             self.tooltips[btn] = tip
+            if btn == self.hover_btn:
+                self.setToolTip(tip)
 
     def setLight(self, data):
-        if data:
-            self.highlight_color = self._true_color
-        else:
-            self.highlight_color = self._false_color
+        color = self._true_color if data else self._false_color
+        if color == self.highlight_color: return
+        self.highlight_color = color
         self.update()
 
 
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# Key event routing cache
+#
+# processed_key_event__ needs to know whether the widget that received a key
+# event sits inside a widget that wants the raw key events (dialogs, line edits,
+# gcode editor etc). Checking every ancestor against every class on each
+# auto-repeated jog key is wasteful, so the result is cached per receiver along
+# with the ancestors it was found through. A cached route is used only while
+# those ancestors are unchanged, so reparenting anywhere in the chain is seen.
+
+class KeyRouter():
+    def __init__(self, classes):
+        # widget classes that take key events, in order of priority
+        self.classes = tuple(classes)
+        self.cache = {}
+
+    def route(self, receiver):
+        # returns the widget that should get the key event, or None for keybindings
+        entry = self.cache.get(receiver)
+        if entry is not None and self.unchanged(receiver, entry[0], entry[1] is None):
+            return entry[1]
+        chain, target = self.find_target(receiver)
+        if entry is None:
+            receiver.destroyed.connect(lambda obj=None, key=receiver: self.cache.pop(key, None))
+        self.cache[receiver] = (chain, target)
+        return target
+
+    def unchanged(self, receiver, chain, to_top):
+        widget = receiver
+        for ancestor in chain:
+            widget = widget.parent()
+            if widget is not ancestor: return False
+        # without a target the whole chain up to the window counts
+        return not to_top or widget.parent() is None
+
+    def find_target(self, receiver):
+        # the ancestors walked through and the widget found, if any
+        chain = []
+        widget = receiver
+        while widget is not None:
+            for cls in self.classes:
+                if isinstance(widget, cls):
+                    return tuple(chain), widget
+            widget = widget.parent()
+            if widget is not None:
+                chain.append(widget)
+        return tuple(chain), None
+
+    def clear(self):
+        # forget every cached route
+        self.cache.clear()
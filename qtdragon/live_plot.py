@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# Live tool path
+#
+# Keeps the most recent positions of the tool in preallocated arrays used as
+# a ring buffer, so the trail of a job that runs for hours takes the same
+# memory and paint time as one that runs for minutes. Positions closer than
+# min_distance to the last kept point are dropped. A point that carries on in
+# the same direction (within min_angle degrees) moves the last kept point
+# instead of adding another, so straight moves cost one point however many
+# updates they take.
+
+import math
+from array import array
+
+class LivePlot():
+    def __init__(self, capacity=20000, min_distance=0.05, min_angle=2.0):
+        self.capacity = max(3, capacity)
+        self.x = array('d', bytes(8 * self.capacity))
+        self.y = array('d', bytes(8 * self.capacity))
+        self.z = array('d', bytes(8 * self.capacity))
+        self.min_distance = min_distance
+        self.min_turn = math.cos(math.radians(min_angle))
+        # next slot to write
+        self.head = 0
+        self.count = 0
+        # positions taken since reset_added(), kept or stretched, a measure of other plots' history
+        self.added = 0
+
+    def __len__(self):
+        return self.count
+
+    def last(self, back=1):
+        i = (self.head - back) % self.capacity
+        return self.x[i], self.y[i], self.z[i]
+
+    def add(self, x, y, z):
+        # True if the point was kept
+        if self.count:
+            lx, ly, lz = self.last()
+            dx, dy, dz = x - lx, y - ly, z - lz
+            length = math.sqrt(dx * dx + dy * dy + dz * dz)
+            if length < self.min_distance: return False
+            if self.count >= 2:
+                px, py, pz = self.last(2)
+                ex, ey, ez = lx - px, ly - py, lz - pz
+                previous = math.sqrt(ex * ex + ey * ey + ez * ez)
+                if previous > 0 and (dx * ex + dy * ey + dz * ez) / (length * previous) >= self.min_turn:
+                    # still going the same way, stretch the last segment
+                    i = (self.head - 1) % self.capacity
+                    self.x[i], self.y[i], self.z[i] = x, y, z
+                    self.added += 1
+                    return True
+        i = self.head
+        self.x[i], self.y[i], self.z[i] = x, y, z
+        self.head = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self.added += 1
+        return True
+
+    def series(self, name):
+        # oldest first
+        data = getattr(self, name)
+        start = (self.head - self.count) % self.capacity
+        if start + self.count <= self.capacity:
+            return data[start:start + self.count]
+        return data[start:] + data[:self.head]
+
+    def reset_added(self):
+        self.added = 0
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
+        self.added = 0
+
+    def memory(self):
+        # bytes held by the buffers, fixed by the capacity
+        return sum(data.itemsize * len(data) for data in (self.x, self.y, self.z))
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# Preference values with write-behind
+#
+# Works on the configparser that qtvcp's PREFS_ already loaded, so the file is
+# parsed once and the screen's values stay in step with anything qtvcp writes.
+# All values are read in one pass and converted to the types in the schema.
+# Changes are saved a short while after the last one, and the file is
+# replaced atomically with the previous good version kept as a backup. A file
+# that can't be parsed is moved aside and the backup is used.
+
+import os
+import shutil
+import configparser
+
+from PyQt5.QtCore import QObject, QTimer
+
+from qtvcp import logger
+
+LOG = logger.getLogger(__name__)
+
+def convert(text, ptype):
+    if ptype == bool:
+        if text.lower() in ('true', '1', 'yes', 'on'): return True
+        if text.lower() in ('false', '0', 'no', 'off'): return False
+        raise ValueError("not a boolean: {}".format(text))
+    return ptype(text)
+
+class PrefStore(QObject):
+    def __init__(self, config, delay=2000):
+        super(PrefStore, self).__init__()
+        # qtvcp's preference object is a configparser with the file name in .fn
+        self.config = config
+        self.filename = config.fn
+        self.backup = self.filename + '.bak'
+        self.schema = {}
+        self.values = {}
+        self.dirty = set()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self.flush)
+
+    def load(self, schema):
+        # schema maps (section, option) to (type, default)
+        self.schema = dict(schema)
+        self.recover()
+        for (section, option), (ptype, default) in self.schema.items():
+            try:
+                value = convert(self.config.get(section, option), ptype)
+            except (configparser.Error, ValueError):
+                # missing or garbled, the default gets written back
+                value = default
+                self.dirty.add((section, option))
+            self.values[(section, option)] = value
+        if self.dirty:
+            self.timer.start()
+
+    def recover(self):
+        # qtvcp loads whatever it can from a damaged file, check it parses properly
+        if not os.path.exists(self.filename): return
+        try:
+            parser = configparser.RawConfigParser()
+            parser.optionxform = str
+            parser.read(self.filename)
+            return
+        except (configparser.Error, UnicodeDecodeError) as e:
+            LOG.warning("Preference file {} is damaged - {}".format(self.filename, e))
+        shutil.move(self.filename, self.filename + '.corrupt')
+        for section in self.config.sections():
+            self.config.remove_section(section)
+        try:
+            self.config.read(self.backup)
+            LOG.info("Restored preferences from {}".format(self.backup))
+        except (configparser.Error, UnicodeDecodeError) as e:
+            LOG.warning("Preference backup is unusable, using defaults - {}".format(e))
+            for section in self.config.sections():
+                self.config.remove_section(section)
+
+    def get(self, option, section='CUSTOM_FORM_ENTRIES'):
+        return self.values[(section, option)]
+
+    def set(self, option, value, section='CUSTOM_FORM_ENTRIES'):
+        key = (section, option)
+        ptype = self.schema[key][0]
+        try:
+            value = convert(str(value), ptype)
+        except ValueError:
+            # half typed entries keep the last good value
+            return
+        if self.values.get(key) == value: return
+        self.values[key] = value
+        self.dirty.add(key)
+        self.timer.start()
+
+    def flush(self):
+        self.timer.stop()
+        if not self.dirty: return
+        for section, option in self.dirty:
+            if not self.config.has_section(section):
+                self.config.add_section(section)
+            self.config.set(section, option, str(self.values[(section, option)]))
+        temp = self.filename + '.tmp'
+        try:
+            with open(temp, 'w') as f:
+                self.config.write(f)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(self.filename):
+                shutil.copyfile(self.filename, self.backup)
+            os.replace(temp, self.filename)
+        except OSError as e:
+            LOG.error("Unable to save preferences - {}".format(e))
+            return
+        self.dirty.clear()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# Program previews for the file manager
+#
+# A worker thread draws a small XY picture of a program's feed moves and
+# works out its extents, tools and estimated time. The file selected in the
+# file manager goes first, the other programs in the listed directory are done
+# in the background after it. A new selection interrupts whatever is running,
+# background work waits while a program runs. Selected programs too large to
+# parse quickly only get the pre-flight summary when there is one.
+# Previews are kept in the config directory by file hash, as a PNG and a JSON
+# summary, and the least recently used ones are removed once the cache is
+# bigger than its size limit.
+
+import os
+import json
+import threading
+from array import array
+from collections import deque, OrderedDict
+
+from PyQt5 import QtGui
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from gcode_preflight import GcodeParser, hash_lines, summary
+from run_estimate import RunEstimate
+
+CACHE_VERSION = 1
+# beyond this many points the sketch is thinned out
+MAX_POINTS = 100000
+# programs bigger than this are only previewed when they are selected
+PREFETCH_SIZE = 2 << 20
+
+class ToolpathSketch():
+    # XY points of a program, each flagged with whether the tool fed to it
+    def __init__(self):
+        self.points = array('f')
+        self.feeds = array('b')
+        # smallest feed move kept, doubled whenever there are too many points
+        self.step = 1e-3
+
+    def add(self, x, y, feed):
+        if feed and self.feeds:
+            dx = x - self.points[-2]
+            dy = y - self.points[-1]
+            if dx * dx + dy * dy < self.step * self.step: return
+        self.points.extend((x, y))
+        self.feeds.append(feed)
+        if len(self.feeds) > MAX_POINTS:
+            self.thin()
+
+    def thin(self):
+        points, feeds = self.points, self.feeds
+        self.points = array('f')
+        self.feeds = array('b')
+        self.step *= 2
+        for i, feed in enumerate(feeds):
+            self.add(points[2 * i], points[2 * i + 1], feed)
+
+    def extents(self):
+        # of the feed moves, rapids to and from the work don't count
+        xs, ys = [], []
+        for i, feed in enumerate(self.feeds):
+            if feed or (i + 1 < len(self.feeds) and self.feeds[i + 1]):
+                xs.append(self.points[2 * i])
+                ys.append(self.points[2 * i + 1])
+        if not xs: return None
+        return min(xs), min(ys), max(xs), max(ys)
+
+    def render(self, width, height, color, background):
+        image = QtGui.QImage(width, height, QtGui.QImage.Format_ARGB32)
+        image.fill(background)
+        extents = self.extents()
+        if extents is None: return image
+        x1, y1, x2, y2 = extents
+        margin = 4
+        scale = min((width - 2 * margin) / max(x2 - x1, 1e-3), (height - 2 * margin) / max(y2 - y1, 1e-3))
+        path = QtGui.QPainterPath()
+        for i, feed in enumerate(self.feeds):
+            if feed and i:
+                path.lineTo(self.points[2 * i], self.points[2 * i + 1])
+            else:
+                path.moveTo(self.points[2 * i], self.points[2 * i + 1])
+        painter = QtGui.QPainter(image)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        painter.translate(width / 2, height / 2)
+        painter.scale(scale, -scale)
+        painter.translate(-(x1 + x2) / 2, -(y1 + y2) / 2)
+        pen = QtGui.QPen(color, 0)
+        pen.setCosmetic(True)
+        painter.setPen(pen)
+        painter.drawPath(path)
+        painter.end()
+        return image
+
+class ProgramPreview(QObject):
+    # filename, {'image': QImage, 'summary': list of lines}
+    ready = pyqtSignal(str, object)
+    failed = pyqtSignal(str, str)
+
+    def __init__(self, cache_dir, machine_metric=True, limits=None, cache_bytes=20 << 20, size=(240, 180),
+                 parse_size=20 << 20, lookup=None):
+        super(ProgramPreview, self).__init__()
+        self.cache_dir = cache_dir
+        self.machine_metric = machine_metric
+        self.limits = limits
+        self.cache_bytes = cache_bytes
+        self.size = size
+        # selected programs bigger than this aren't parsed, lookup(filename, stat) may have a result for them
+        self.parse_size = parse_size
+        self.lookup = lookup
+        self.color = QtGui.QColor(255, 255, 255)
+        self.background = QtGui.QColor(0, 0, 0)
+        # the estimate depends on the machine, a preview made for other limits is redone
+        self.config = json.loads(json.dumps([CACHE_VERSION, machine_metric, list(size),
+                                             limits.signature() if limits is not None else None]))
+        # filename -> ((mtime, size), (hash, lines)), so unchanged files aren't hashed again
+        self.hashes = OrderedDict()
+        self.lock = threading.Condition()
+        self.selected = None
+        self.pending = deque()
+        self.running = True
+        self.paused = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def request(self, filename):
+        # the file the operator selected, ahead of everything else
+        with self.lock:
+            self.selected = filename
+            self.lock.notify()
+
+    def prefetch(self, filenames):
+        # replaces the files still waiting from the last directory
+        with self.lock:
+            self.pending = deque(filenames)
+            self.lock.notify()
+
+    def pause(self, paused):
+        # holds back the background previews, a selection is still done
+        with self.lock:
+            self.paused = paused
+            self.lock.notify()
+
+    def shutdown(self):
+        with self.lock:
+            self.running = False
+            self.selected = None
+            self.pending.clear()
+            self.lock.notify()
+        self.thread.join(2)
+
+    def interrupted(self, selected):
+        return self.selected is not None or not self.running or (self.paused and not selected)
+
+    def run(self):
+        while True:
+            with self.lock:
+                while self.running and self.selected is None and (self.paused or not self.pending):
+                    self.lock.wait()
+                if not self.running: break
+                if self.selected is not None:
+                    filename, selected = self.selected, True
+                    self.selected = None
+                else:
+                    filename, selected = self.pending.popleft(), False
+            try:
+                preview = self.process(filename, selected)
+            except Exception as e:
+                if selected:
+                    self.failed.emit(filename, str(e))
+                continue
+            if preview:
+                self.ready.emit(filename, preview)
+            elif preview is None and not selected and self.running:
+                # interrupted by a selection or a program starting, try again after it
+                with self.lock:
+                    self.pending.appendleft(filename)
+
+    def file_key(self, filename, stat):
+        key = (stat.st_mtime, stat.st_size)
+        known = self.hashes.get(filename)
+        if known is not None and known[0] == key:
+            self.hashes.move_to_end(filename)
+            return known[1]
+        value = hash_lines(filename)
+        self.hashes[filename] = (key, value)
+        if len(self.hashes) > 10000:
+            self.hashes.popitem(last=False)
+        return value
+
+    def process(self, filename, selected):
+        stat = os.stat(filename)
+        if not selected and stat.st_size > PREFETCH_SIZE:
+            # skipped, not interrupted
+            return {}
+        if stat.st_size > self.parse_size:
+            return self.unparsed(filename, stat)
+        fhash, lines = self.file_key(filename, stat)
+        base = os.path.join(self.cache_dir, fhash)
+        preview = self.load(base)
+        if preview is not None:
+            return preview
+        sketch = ToolpathSketch()
+        estimate = RunEstimate(self.limits, lines) if self.limits is not None else None
+        parser = GcodeParser(self.machine_metric, estimate, lambda point, feed: sketch.add(point['X'], point['Y'], feed))
+        with open(filename, 'rb') as f:
+            for line in f:
+                parser.parse_line(line.decode('utf-8', 'replace'))
+                if parser.lines % 5000 == 0 and self.interrupted(selected):
+                    return None
+        preview = {'image': sketch.render(self.size[0], self.size[1], self.color, self.background),
+                   'summary': summary(parser.result())}
+        self.save(base, preview)
+        return preview
+
+    def unparsed(self, filename, stat):
+        # not cached, the pre-flight result can change without the file changing
+        note = "Too large to preview ({:.0f} MB)".format(stat.st_size / float(1 << 20))
+        result = self.lookup(filename, stat) if self.lookup is not None else None
+        if result is None:
+            return {'image': None, 'summary': [note, "Load it for the toolpath overview"]}
+        return {'image': None, 'summary': [note] + summary(result)}
+
+    def load(self, base):
+        try:
+            with open(base + '.json') as f:
+                data = json.load(f)
+            if data.get('config') != self.config: return None
+            image = QtGui.QImage(base + '.png')
+            if image.isNull(): return None
+            # touch them so the cache keeps recently used previews
+            os.utime(base + '.json')
+            os.utime(base + '.png')
+            return {'image': image, 'summary': data['summary']}
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, base, preview):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # the image goes first, a summary without its image isn't used
+            if not preview['image'].save(base + '.tmp.png', 'PNG'): return
+            os.replace(base + '.tmp.png', base + '.png')
+            with open(base + '.tmp', 'w') as f:
+                json.dump({'config': self.config, 'summary': preview['summary']}, f)
+            os.replace(base + '.tmp', base + '.json')
+            self.prune()
+        except OSError:
+            pass
+
+    def prune(self):
+        # newest first, drop whatever doesn't fit in the size limit
+        files = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith(('.png', '.json')) and '.tmp' not in name:
+                stat = os.stat(path)
+                files.append((stat.st_mtime, stat.st_size, path))
+        files.sort(reverse=True)
+        total = 0
+        for mtime, size, path in files:
+            total += size
+            if total > self.cache_bytes:
+                os.remove(path)
@@ -1,13 +1,35 @@
 import os
+import time
+from collections import deque
 import hal, hal_glib
 import linuxcnc
 from connections import Connections
+from key_router import KeyRouter
+from run_timer import RunTimer, RunTimeStore
+from job_history import JobHistory, JobRecord
+from file_copier import FileCopier
+from gcode_history import GcodeHistory, HistoryDelegate, META_ROLE
+from spindle_power import SpindlePower
+from spindle_load import LoadHistory, LoadPlot, OverloadRule
+from pref_store import PrefStore
+from status_log import StatusLog
+from gcode_preflight import Preflight, check_limits, summary, file_hash
+from run_estimate import MotionLimits, remaining
+from run_from_line import state_at, preamble, unsupported
+from gcode_pager import PagedDocument, PagedView
+from toolpath_overview import ToolpathOverview, OverviewWidget
+from live_plot import LivePlot
+from dir_model import DirectoryModel, StatCache, PROGRAM_TYPES
+from program_preview import ProgramPreview
+from diagnostics import Profiler, ProfiledProxy, LagMonitor, LAG_NAME
 from PyQt5 import QtCore, QtWidgets, QtGui, uic
 from PyQt5.QtWebEngineWidgets import QWebEngineView
 from PyQt5.QtWebEngineWidgets import QWebEnginePage
 from qtvcp.lib.gcode_utility.facing import Facing
 from qtvcp.lib.gcode_utility.hole_circle import Hole_Circle
 from qtvcp.widgets.gcode_editor import GcodeEditor as GCODE
+from qtvcp.widgets.gcode_editor import GcodeDisplay as GCODE_DISPLAY
+from qtvcp.widgets.gcode_graphics import GCodeGraphics as GRAPHICS
 from qtvcp.widgets.mdi_history import MDIHistory as MDI_WIDGET
 from qtvcp.widgets.tool_offsetview import ToolOffsetView as TOOL_TABLE
 from qtvcp.widgets.origin_offsetview import OriginOffsetView as OFFSET_VIEW
@@ -17,7 +39,6 @@ from qtvcp.lib.keybindings import Keylookup
 from qtvcp.lib.gcodes import GCodes
 from qtvcp.core import Status, Action, Info, Path
 from qtvcp import logger
-from shutil import copyfile
 
 LOG = logger.getLogger(__name__)
 KEYBIND = Keylookup()
@@ -55,11 +76,21 @@ class HandlerClass:
         self.valid = QtGui.QDoubleValidator(-999.999, 999.999, 3)
         self.styleeditor = SSE(widgets, paths)
         KEYBIND.add_call('Key_F4', 'on_keycall_F4')
+        KEYBIND.add_call('Key_F10','on_keycall_F10')
         KEYBIND.add_call('Key_F12','on_keycall_F12')
         KEYBIND.add_call('Key_Pause', 'on_keycall_PAUSE')
         KEYBIND.add_call('Key_Any', 'on_keycall_PAUSE')
+        self.key_router = KeyRouter((QtWidgets.QDialog, QtWidgets.QLineEdit, MDI_WIDGET, GCODE, TOOL_TABLE, OFFSET_VIEW))
         # some global variables
         self.proc = None
+        self.touchoff_buffer = b''
+        self.touchoff_busy = False
+        self.touchoff_shutdown = False
+        self.touchoff_ping_pending = False
+        self.touchoff_restarts = 0
+        self.touchoff_max_restarts = 5
+        self.touchoff_health = QtCore.QTimer()
+        self.touchoff_health.timeout.connect(self.check_touchoff)
         self.probe = None
         self.progress = None
         self.pause_dialog = None
@@ -69,24 +100,127 @@ class HandlerClass:
         self.pause_color = QtGui.QColor('yellow')
         self.default_setup = os.path.join(PATH.CONFIGPATH, "default_setup.html")
         self.start_line = 0
-        self.run_time = 0
-        self.time_tenths = 0
-        self.timer_on = False
+        self.runtimer = RunTimer()
+        self.runtime_store = RunTimeStore(os.path.join(PATH.CONFIGPATH, 'run_times.json'))
+        self.runtime_shown = -1
+        self.job = None
+        self.job_history = JobHistory(os.path.join(PATH.CONFIGPATH, 'job_history.db'))
+        self.job_history.updated.connect(self.update_job_history)
+        self.log_lines = int(INFO.get_error_safe_setting('DISPLAY', 'STATUS_LOG_LINES', "2000"))
+        self.status_log = StatusLog(os.path.join(PATH.CONFIGPATH, 'logs'))
+        self.status_log.repeated.connect(self.show_status)
+        self.status_log.saved.connect(lambda fname: self.add_status("Log saved to {}".format(fname)))
+        self.status_log.failed.connect(lambda fname, error: self.add_status("Unable to save log to {} - {}".format(fname, error)))
+        self.file_copier = FileCopier()
+        self.file_copier.progress.connect(self.copy_progress)
+        self.file_copier.finished.connect(self.copy_finished)
+        self.file_copier.failed.connect(self.copy_failed)
+        self.file_copier.cancelled.connect(lambda src, dst: self.add_status("Cancelled copy of {}".format(src)))
+        self.file_copier.pending.connect(self.copy_pending)
+        # directory listings for both file managers, scanned in the background
+        self.stat_cache = StatCache()
+        self.dir_models = []
+        self.preflight = Preflight(os.path.join(PATH.CONFIGPATH, 'preflight_cache'),
+                                   INFO.MACHINE_IS_METRIC, self.motion_limits(),
+                                   int(INFO.get_error_safe_setting('DISPLAY', 'CHECKPOINT_LINES', "1000")))
+        self.preflight.finished.connect(self.preflight_finished)
+        self.preflight.failed.connect(self.preflight_failed)
+        self.preflight_pending = False
+        # programs bigger than this many MB get the toolpath overview instead of the full preview
+        self.overview_size = float(INFO.get_error_safe_setting('DISPLAY', 'GRAPHICS_OVERVIEW_SIZE', "20")) * (1 << 20)
+        # thumbnails and summaries of the programs in the file manager, programs the overview is for aren't parsed
+        self.program_preview = ProgramPreview(os.path.join(PATH.CONFIGPATH, 'preview_cache'),
+                                              INFO.MACHINE_IS_METRIC, self.motion_limits(),
+                                              float(INFO.get_error_safe_setting('DISPLAY', 'PREVIEW_CACHE_SIZE', "20")) * (1 << 20),
+                                              parse_size=self.overview_size, lookup=self.preflight.cached)
+        self.program_preview.ready.connect(self.preview_ready)
+        self.program_preview.failed.connect(self.preview_failed)
+        self.preview_file = None
+        self.preflight_result = None
+        self.preflight_confirmed = False
+        # work offsets the preview was drawn with
+        self.loaded_offsets = None
+        self.run_preamble = []
+        self.preamble_confirmed = False
+        # set up commands still to send, one each time the interpreter goes idle
+        self.preamble_queue = []
+        self.preamble_running = False
+        self.preamble_polls = 0
+        self.estimate = None
+        self.estimate_feed = 0.0
+        # percent done and running time when it was reached
+        self.estimate_mark = (0, 0.0)
+        self.remaining_shown = -1
         self.home_all = False
         self.min_spindle_rpm = INFO.MIN_SPINDLE_SPEED
         self.max_spindle_rpm = INFO.MAX_SPINDLE_SPEED
-        self.max_spindle_power = INFO.get_error_safe_setting('DISPLAY', 'MAX_SPINDLE_POWER',"0")
+        self.max_spindle_power = float(INFO.get_error_safe_setting('DISPLAY', 'MAX_SPINDLE_POWER',"0"))
         self.max_linear_velocity = INFO.MAX_TRAJ_VELOCITY
         self.axis_list = INFO.AVAILABLE_AXES
+        self.axis_limits = {}
+        for axis in self.axis_list:
+            try:
+                self.axis_limits[axis] = (float(INFO.get_error_safe_setting('AXIS_' + axis, 'MIN_LIMIT', None)),
+                                          float(INFO.get_error_safe_setting('AXIS_' + axis, 'MAX_LIMIT', None)))
+            except (TypeError, ValueError):
+                pass
+        # the overview's grid is sized to the XY travel
+        span = max([high - low for axis, (low, high) in self.axis_limits.items() if axis in 'XY'] or [1000.0])
+        self.overview = ToolpathOverview(os.path.join(PATH.CONFIGPATH, 'overview_cache'), span, INFO.MACHINE_IS_METRIC)
+        self.overview.started.connect(self.overview_started)
+        self.overview.progress.connect(self.overview_progress)
+        self.overview.finished.connect(self.overview_finished)
+        self.overview.failed.connect(lambda fname, error: self.add_status("Toolpath overview of {} failed - {}".format(fname, error)))
         self.system_list = ["G54","G55","G56","G57","G58","G59","G59.1","G59.2","G59.3"]
         self.slow_jog_factor = 10
         self.reload_tool = 0
         self.last_loaded_program = ""
+        self.gcode_history = GcodeHistory(int(INFO.get_error_safe_setting('DISPLAY', 'GCODE_HISTORY_SIZE', "20")))
         self.current_loaded_program = None
+        # programs bigger than this many MB are paged in the viewer and only loaded to edit them
+        self.pager_size = float(INFO.get_error_safe_setting('DISPLAY', 'GCODE_PAGER_SIZE', "20")) * (1 << 20)
+        self.gcode_pager = PagedDocument()
+        self.gcode_pager.failed.connect(lambda fname, error: self.add_status("Unable to index {} - {}".format(fname, error)))
+        self.paged_program = None
+        self.deferred_edit = None
+        self.overview_program = None
+        # recent tool positions, the live plot keeps this many points however long a job runs
+        self.live_plot = LivePlot(int(INFO.get_error_safe_setting('DISPLAY', 'LIVE_PLOT_POINTS', "20000")),
+                                  0.05 if INFO.MACHINE_IS_METRIC else 0.002)
         self.first_turnon = True
+        self.startup_times = []
+        self.key_event_time = None
+        self.key_latency = deque(maxlen=200)
+        # heavy pages that are only built the first time they are shown
+        self.lazy_tabs = {TAB_SETUP: self.init_setup_page,
+                          TAB_UTILS: self.init_utils}
+        self.prewarm_tabs = INFO.get_error_safe_setting('DISPLAY', 'PREWARM_TABS', 'true').lower() in ('true', '1', 'yes')
         self.icon_btns = {'action_exit': 'SP_BrowserStop',
                           'btn_load_file': 'SP_DialogOpenButton'}
 
+        # preferences shown in form widgets - option, widget, type, default
+        self.form_prefs = [('Laser X', 'lineEdit_laser_x', float, 100.0),
+                           ('Laser Y', 'lineEdit_laser_y', float, -20.0),
+                           ('Camera X', 'lineEdit_camera_x', float, 10.0),
+                           ('Camera Y', 'lineEdit_camera_y', float, 10.0),
+                           ('Work Height', 'lineEdit_work_height', float, 20.0),
+                           ('Touch Height', 'lineEdit_touch_height', float, 40.0),
+                           ('Sensor Height', 'lineEdit_sensor_height', float, 40.0),
+                           ('Search Velocity', 'lineEdit_search_vel', float, 40.0),
+                           ('Probe Velocity', 'lineEdit_probe_vel', float, 10.0),
+                           ('Max Probe', 'lineEdit_max_probe', float, 10.0),
+                           ('Eoffset count', 'lineEdit_eoffset_count', int, 0),
+                           ('Reload program', 'chk_reload_program', bool, False),
+                           ('Reload tool', 'chk_reload_tool', bool, False),
+                           ('Use keyboard', 'chk_use_keyboard', bool, False),
+                           ('Use tool sensor', 'chk_use_tool_sensor', bool, False),
+                           ('Use tool touchplate', 'chk_use_touchplate', bool, False),
+                           ('Run from line', 'chk_run_from_line', bool, False),
+                           ('Use camera', 'chk_use_camera', bool, False),
+                           ('Use MPG jog', 'chk_use_mpg', bool, False),
+                           ('Use MDI Keyboard', 'chk_use_mdi_keyboard', bool, False)]
+        self.prefs = None
+
         self.unit_label_list = ["zoffset_units", "max_probe_units"]
         self.unit_speed_list = ["search_vel_units", "probe_vel_units"]
 
@@ -98,36 +232,56 @@ class HandlerClass:
         self.axis_a_list = ["widget_angular_jog", "widget_increments_angular",
                             "action_zero_a", "dro_axis_a", "axistoolbutton_a", "btn_goto_zero_a"]
 
-        STATUS.connect('general', self.dialog_return)
-        STATUS.connect('state-on', lambda w: self.enable_onoff(True))
-        STATUS.connect('state-off', lambda w: self.enable_onoff(False))
-        STATUS.connect('mode-manual', lambda w: self.enable_auto(False))
-        STATUS.connect('mode-mdi', lambda w: self.enable_auto(False))
-        STATUS.connect('mode-auto', lambda w: self.enable_auto(True))
-        STATUS.connect('gcode-line-selected', lambda w, line: self.set_start_line(line))
-        STATUS.connect('hard-limits-tripped', self.hard_limit_tripped)
-        STATUS.connect('user-system-changed', lambda w, data: self.user_system_changed(data))
-        STATUS.connect('metric-mode-changed', lambda w, mode: self.metric_mode_changed(mode))
-        STATUS.connect('current-feed-rate', lambda w, rate: self.w.gauge_feedrate.update_value(rate))
-        STATUS.connect('command-stopped', self.command_stopped)
-        STATUS.connect('file-loaded', lambda w, filename: self.file_loaded(filename))
-        STATUS.connect('homed', self.homed)
-        STATUS.connect('all-homed', self.all_homed)
-        STATUS.connect('not-all-homed', self.not_all_homed)
-        STATUS.connect('periodic', lambda w: self.update_status())
-        STATUS.connect('interp-idle', lambda w: self.stop_timer())
+        # opt-in timing of the event loop and handler callbacks, F10 shows the results
+        self.profiler = None
+        if INFO.get_error_safe_setting('DISPLAY', 'DIAGNOSTICS', 'false').lower() in ('true', '1', 'yes'):
+            self.profiler = Profiler()
+            self.lag_monitor = LagMonitor(self.profiler)
+
+        self.status_connect('general', self.dialog_return)
+        self.status_connect('state-on', lambda w: self.enable_onoff(True))
+        self.status_connect('state-off', lambda w: self.enable_onoff(False))
+        self.status_connect('mode-manual', lambda w: self.enable_auto(False))
+        self.status_connect('mode-mdi', lambda w: self.enable_auto(False))
+        self.status_connect('mode-auto', lambda w: self.enable_auto(True))
+        self.status_connect('gcode-line-selected', lambda w, line: self.set_start_line(line))
+        self.status_connect('hard-limits-tripped', self.hard_limit_tripped)
+        self.status_connect('user-system-changed', lambda w, data: self.user_system_changed(data))
+        self.status_connect('metric-mode-changed', lambda w, mode: self.metric_mode_changed(mode))
+        self.status_connect('current-feed-rate', lambda w, rate: self.w.gauge_feedrate.update_value(rate))
+        self.status_connect('command-stopped', self.command_stopped)
+        self.status_connect('file-loaded', lambda w, filename: self.file_loaded(filename))
+        self.status_connect('homed', self.homed)
+        self.status_connect('all-homed', self.all_homed)
+        self.status_connect('not-all-homed', self.not_all_homed)
+        self.status_connect('periodic', lambda w: self.update_status())
+        self.status_connect('interp-idle', lambda w: self.interp_idle())
+        self.status_connect('interp-run', lambda w: self.program_preview.pause(True))
+        self.status_connect('error', lambda w, kind, text: self.error_reported(kind))
+        self.status_connect('state-estop', lambda w: self.run_interrupted("E-stop"))
+        self.status_connect('state-off', lambda w: self.run_interrupted("machine off"))
+        self.status_connect('line-changed', lambda w, line: self.follow_paged_line(line))
+        self.status_connect('current-position', lambda w, position, relative, dtg, joint: self.live_position(position))
+        self.status_connect('tool-in-spindle-changed', lambda w, tool: self.save_preference('Tool to load', tool))
 
     def class_patch__(self):
         self.old_fman = FM.load
         FM.load = self.load_code
+        self.old_gcode_load = GCODE_DISPLAY.load_program
+        GCODE_DISPLAY.load_program = lambda display, w, filename=None: self.load_gcode_display(display, w, filename)
+        self.old_graphics_load = GRAPHICS.load_program
+        GRAPHICS.load_program = lambda graphics, g, fname: self.load_graphics(graphics, g, fname)
 
     def initialized__(self):
-        self.init_pins()
-        self.init_preferences()
-        self.init_widgets()
-        self.init_probe()
-        self.init_utils()
-        self.init_joypads()
+        self.timed_init('pins', self.init_pins)
+        self.timed_init('preferences', self.init_preferences)
+        self.timed_init('widgets', self.init_widgets)
+        self.timed_init('spindle load', self.init_spindle_load)
+        # the probe widgets create HAL pins so they can't wait until the page is shown
+        self.timed_init('probe', self.init_probe)
+        self.timed_init('joypads', self.init_joypads)
+        self.start_touchoff()
+        self.touchoff_health.start(5000)
         self.w.stackedWidget_gcode.setCurrentIndex(0)
         self.w.stackedWidget_log.setCurrentIndex(0)
         self.w.btn_dimensions.setChecked(True)
@@ -148,12 +302,6 @@ class HandlerClass:
         # set validators for lineEdit widgets
         for val in self.lineedit_list:
             self.w['lineEdit_' + val].setValidator(self.valid)
-        # check for default setup html file
-        try:
-            url = QtCore.QUrl("file:///" + self.default_setup)
-            self.web_view.load(url)
-        except Exception as e:
-            print("No default setup file found - {}".format(e))
         # set unit labels according to machine mode
         unit = "MM" if INFO.MACHINE_IS_METRIC else "IN"
         for i in self.unit_label_list:
@@ -162,7 +310,14 @@ class HandlerClass:
             self.w['lbl_' + i].setText(unit + "/MIN")
         self.w.setWindowFlags(QtCore.Qt.FramelessWindowHint)
         # connect all signals to corresponding slots
-        connect = Connections(self, self.w)
+        if self.profiler is None:
+            connect = Connections(self, self.w)
+        else:
+            connect = Connections(ProfiledProxy(self, self.profiler, 'slot: '), self.w)
+            self.timed_init('diagnostics', self.init_diagnostics)
+        LOG.info("Startup times: {}".format(", ".join("{} {:.0f} ms".format(name, t) for name, t in self.startup_times)))
+        if self.prewarm_tabs:
+            QtCore.QTimer.singleShot(3000, self.prewarm_next_tab)
 
     #############################
     # SPECIAL FUNCTIONS SECTION #
@@ -174,8 +329,11 @@ class HandlerClass:
         self.spindle_fault = self.h.newpin("spindle_fault", hal.HAL_U32, hal.HAL_IN)
         self.modbus_errors = self.h.newpin("modbus-errors", hal.HAL_U32, hal.HAL_IN)
         self.spindle_inhibit = self.h.newpin("spindle_inhibit", hal.HAL_BIT, hal.HAL_OUT)
-        self.spindle_amps.value_changed.connect(lambda val: self.spindle_pwr_changed(val))
-        self.spindle_volts.value_changed.connect(lambda val: self.spindle_pwr_changed(val))
+        self.spindle_monitor = SpindlePower(self.spindle_amps, self.spindle_volts, self.max_spindle_power,
+            float(INFO.get_error_safe_setting('DISPLAY', 'SPINDLE_POWER_FACTOR', "0.9")),
+            float(INFO.get_error_safe_setting('DISPLAY', 'SPINDLE_POWER_SMOOTHING', "0.3")),
+            float(INFO.get_error_safe_setting('DISPLAY', 'SPINDLE_POWER_RATE', "10")))
+        self.spindle_monitor.power_changed.connect(lambda watts, pc: self.w.spindle_power.setValue(pc))
         self.spindle_fault.value_changed.connect(lambda val: self.w.lbl_spindle_fault.setText(hex(val)))
         self.modbus_errors.value_changed.connect(lambda val: self.w.lbl_mb_errors.setText(str(val)))
         # external offset control pins
@@ -199,54 +357,43 @@ class HandlerClass:
         if not self.w.PREFS_:
             self.add_status("CRITICAL - no preference file found, enable preferences in screenoptions widget")
             return
-        self.last_loaded_program = self.w.PREFS_.getpref('last_loaded_file', None, str,'BOOK_KEEPING')
-        self.reload_tool = self.w.PREFS_.getpref('Tool to load', 0, int,'CUSTOM_FORM_ENTRIES')
-        self.w.lineEdit_laser_x.setText(str(self.w.PREFS_.getpref('Laser X', 100, float, 'CUSTOM_FORM_ENTRIES')))
-        self.w.lineEdit_laser_y.setText(str(self.w.PREFS_.getpref('Laser Y', -20, float, 'CUSTOM_FORM_ENTRIES')))
-        self.w.lineEdit_camera_x.setText(str(self.w.PREFS_.getpref('Camera X', 10, float, 'CUSTOM_FORM_ENTRIES')))
-        self.w.lineEdit_camera_y.setText(str(self.w.PREFS_.getpref('Camera Y', 10, float, 'CUSTOM_FORM_ENTRIES')))
-        self.w.lineEdit_work_height.setText(str(self.w.PREFS_.getpref('Work Height', 20, float, 'CUSTOM_FORM_ENTRIES')))
-        self.w.lineEdit_touch_height.setText(str(self.w.PREFS_.getpref('Touch Height', 40, float, 'CUSTOM_FORM_ENTRIES')))
-        self.w.lineEdit_sensor_height.setText(str(self.w.PREFS_.getpref('Sensor Height', 40, float, 'CUSTOM_FORM_ENTRIES')))
-        self.w.lineEdit_search_vel.setText(str(self.w.PREFS_.getpref('Search Velocity', 40, float, 'CUSTOM_FORM_ENTRIES')))
-        self.w.lineEdit_probe_vel.setText(str(self.w.PREFS_.getpref('Probe Velocity', 10, float, 'CUSTOM_FORM_ENTRIES')))
-        self.w.lineEdit_max_probe.setText(str(self.w.PREFS_.getpref('Max Probe', 10, float, 'CUSTOM_FORM_ENTRIES')))
-        self.w.lineEdit_eoffset_count.setText(str(self.w.PREFS_.getpref('Eoffset count', 0, int, 'CUSTOM_FORM_ENTRIES')))
-        self.w.chk_reload_program.setChecked(self.w.PREFS_.getpref('Reload program', False, bool,'CUSTOM_FORM_ENTRIES'))
-        self.w.chk_reload_tool.setChecked(self.w.PREFS_.getpref('Reload tool', False, bool,'CUSTOM_FORM_ENTRIES'))
-        self.w.chk_use_keyboard.setChecked(self.w.PREFS_.getpref('Use keyboard', False, bool, 'CUSTOM_FORM_ENTRIES'))
-        self.w.chk_use_tool_sensor.setChecked(self.w.PREFS_.getpref('Use tool sensor', False, bool, 'CUSTOM_FORM_ENTRIES'))
-        self.w.chk_use_touchplate.setChecked(self.w.PREFS_.getpref('Use tool touchplate', False, bool, 'CUSTOM_FORM_ENTRIES'))
-        self.w.chk_run_from_line.setChecked(self.w.PREFS_.getpref('Run from line', False, bool, 'CUSTOM_FORM_ENTRIES'))
-        self.w.chk_use_camera.setChecked(self.w.PREFS_.getpref('Use camera', False, bool, 'CUSTOM_FORM_ENTRIES'))
-        self.w.chk_use_mpg.setChecked(self.w.PREFS_.getpref('Use MPG jog', False, bool, 'CUSTOM_FORM_ENTRIES'))
-        self.w.chk_use_mdi_keyboard.setChecked(self.w.PREFS_.getpref('Use MDI Keyboard', False, bool, 'CUSTOM_FORM_ENTRIES'))
-        
+        self.prefs = PrefStore(self.w.PREFS_)
+        schema = {('CUSTOM_FORM_ENTRIES', option): (ptype, default) for option, widget, ptype, default in self.form_prefs}
+        schema[('CUSTOM_FORM_ENTRIES', 'Tool to load')] = (int, 0)
+        schema[('BOOK_KEEPING', 'last_loaded_file')] = (str, "")
+        schema[('BOOK_KEEPING', 'last_loaded_directory')] = (str, "")
+        schema[('BOOK_KEEPING', 'gcode_history')] = (str, "")
+        self.prefs.load(schema)
+        self.last_loaded_program = self.prefs.get('last_loaded_file', 'BOOK_KEEPING')
+        # older versions saved a missing file as None
+        if self.last_loaded_program == 'None':
+            self.last_loaded_program = ""
+        self.gcode_history.from_text(self.prefs.get('gcode_history', 'BOOK_KEEPING'))
+        self.reload_tool = self.prefs.get('Tool to load')
+        # changes are saved as they are made, not only on a clean exit
+        for option, widget, ptype, default in self.form_prefs:
+            if ptype == bool:
+                self.w[widget].setChecked(self.prefs.get(option))
+                self.w[widget].toggled.connect(lambda state, option=option: self.prefs.set(option, state))
+            else:
+                self.w[widget].setText(str(self.prefs.get(option)))
+                self.w[widget].textChanged.connect(lambda text, option=option: self.prefs.set(option, text))
+
     def closing_cleanup__(self):
-        if not self.w.PREFS_: return
-        self.w.PREFS_.putpref('last_loaded_directory', os.path.dirname(self.last_loaded_program), str, 'BOOK_KEEPING')
-        self.w.PREFS_.putpref('last_loaded_file', self.last_loaded_program, str, 'BOOK_KEEPING')
-        self.w.PREFS_.putpref('Tool to load', STATUS.get_current_tool(), int, 'CUSTOM_FORM_ENTRIES')
-        self.w.PREFS_.putpref('Laser X', self.w.lineEdit_laser_x.text(), float, 'CUSTOM_FORM_ENTRIES')
-        self.w.PREFS_.putpref('Laser Y', self.w.lineEdit_laser_y.text(), float, 'CUSTOM_FORM_ENTRIES')
-        self.w.PREFS_.putpref('Camera X', self.w.lineEdit_camera_x.text(), float, 'CUSTOM_FORM_ENTRIES')
-        self.w.PREFS_.putpref('Camera Y', self.w.lineEdit_camera_y.text(), float, 'CUSTOM_FORM_ENTRIES')
-        self.w.PREFS_.putpref('Work Height', self.w.lineEdit_work_height.text(), float, 'CUSTOM_FORM_ENTRIES')
-        self.w.PREFS_.putpref('Touch Height', self.w.lineEdit_touch_height.text(), float, 'CUSTOM_FORM_ENTRIES')
-        self.w.PREFS_.putpref('Sensor Height', self.w.lineEdit_sensor_height.text(), float, 'CUSTOM_FORM_ENTRIES')
-        self.w.PREFS_.putpref('Search Velocity', self.w.lineEdit_search_vel.text(), float, 'CUSTOM_FORM_ENTRIES')
-        self.w.PREFS_.putpref('Probe Velocity', self.w.lineEdit_probe_vel.text(), float, 'CUSTOM_FORM_ENTRIES')
-        self.w.PREFS_.putpref('Max Probe', self.w.lineEdit_max_probe.text(), float, 'CUSTOM_FORM_ENTRIES')
-        self.w.PREFS_.putpref('Eoffset count', self.w.lineEdit_eoffset_count.text(), int, 'CUSTOM_FORM_ENTRIES')
-        self.w.PREFS_.putpref('Reload program', self.w.chk_reload_program.isChecked(), bool, 'CUSTOM_FORM_ENTRIES')
-        self.w.PREFS_.putpref('Reload tool', self.w.chk_reload_tool.isChecked(), bool, 'CUSTOM_FORM_ENTRIES')
-        self.w.PREFS_.putpref('Use keyboard', self.w.chk_use_keyboard.isChecked(), bool, 'CUSTOM_FORM_ENTRIES')
-        self.w.PREFS_.putpref('Use tool sensor', self.w.chk_use_tool_sensor.isChecked(), bool, 'CUSTOM_FORM_ENTRIES')
-        self.w.PREFS_.putpref('Use tool touchplate', self.w.chk_use_touchplate.isChecked(), bool, 'CUSTOM_FORM_ENTRIES')
-        self.w.PREFS_.putpref('Run from line', self.w.chk_run_from_line.isChecked(), bool, 'CUSTOM_FORM_ENTRIES')
-        self.w.PREFS_.putpref('Use camera', self.w.chk_use_camera.isChecked(), bool, 'CUSTOM_FORM_ENTRIES')
-        self.w.PREFS_.putpref('Use MPG jog', self.w.chk_use_mpg.isChecked(), bool, 'CUSTOM_FORM_ENTRIES')
-        self.w.PREFS_.putpref('Use MDI Keyboard', self.w.chk_use_mdi_keyboard.isChecked(), bool, 'CUSTOM_FORM_ENTRIES')
+        self.stop_touchoff()
+        self.file_copier.shutdown()
+        self.status_log.shutdown()
+        self.preflight.shutdown()
+        self.gcode_pager.close()
+        self.overview.shutdown()
+        for model in self.dir_models:
+            model.shutdown()
+        self.program_preview.shutdown()
+        if self.profiler is not None:
+            self.lag_monitor.stop()
+        if self.prefs is not None:
+            self.save_preference('Tool to load', STATUS.get_current_tool())
+            self.prefs.flush()
         if self.probe:
             self.probe.closing_cleanup__()
 
@@ -259,9 +406,13 @@ class HandlerClass:
         self.w.chk_pause_spindle_changed(False)
         self.w.lbl_home_x.setText(INFO.get_error_safe_setting('JOINT_0', 'HOME',"50"))
         self.w.lbl_home_y.setText(INFO.get_error_safe_setting('JOINT_1', 'HOME',"50"))
+        # the logs keep only the most recent lines, the full history is in logs/status.jsonl
+        self.w.machinelog.document().setMaximumBlockCount(self.log_lines)
+        self.w.integrator_log.document().setMaximumBlockCount(self.log_lines)
         # gcode file history
-        self.w.cmb_gcode_history.addItem("No File Loaded")
+        self.w.cmb_gcode_history.setItemDelegate(HistoryDelegate(self.w.cmb_gcode_history))
         self.w.cmb_gcode_history.view().setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAsNeeded)
+        self.update_gcode_history(None)
         # mdi history
         self.w.mdihistory.MDILine.setFixedHeight(30)
         self.w.mdihistory.MDILine.setPlaceholderText('MDI:')
@@ -278,17 +429,71 @@ class HandlerClass:
         # turn off table grids
         self.w.filemanager.table.setShowGrid(False)
         self.w.filemanager_usb.table.setShowGrid(False)
+        # preview of the selected program next to the file list
+        self.preview_pane = QtWidgets.QWidget()
+        self.preview_pane.setObjectName('preview_pane')
+        self.preview_pane.setFixedWidth(self.program_preview.size[0] + 10)
+        vbox = QtWidgets.QVBoxLayout(self.preview_pane)
+        vbox.setContentsMargins(4, 4, 4, 4)
+        self.preview_image = QtWidgets.QLabel()
+        self.preview_image.setObjectName('preview_image')
+        self.preview_image.setFixedSize(*self.program_preview.size)
+        self.preview_image.setAlignment(QtCore.Qt.AlignCenter)
+        self.preview_text = QtWidgets.QLabel()
+        self.preview_text.setObjectName('preview_text')
+        self.preview_text.setWordWrap(True)
+        self.preview_text.setAlignment(QtCore.Qt.AlignTop | QtCore.Qt.AlignLeft)
+        vbox.addWidget(self.preview_image)
+        vbox.addWidget(self.preview_text, 1)
+        layout = self.w.filemanager.parentWidget().layout()
+        layout.insertWidget(layout.indexOf(self.w.filemanager) + 1, self.preview_pane)
+        for fm in (self.w.filemanager, self.w.filemanager_usb):
+            self.use_directory_model(fm)
         self.w.tooloffsetview.setShowGrid(False)
         self.w.offset_table.setShowGrid(False)
         # move clock and runtimer to statusbar
         self.w.statusbar.addPermanentWidget(self.w.lbl_clock)
+        # paged viewer for very large programs, shown in place of gcode_viewer
+        self.pager_view = PagedView(self.gcode_pager)
+        self.pager_view.setObjectName('pager_view')
+        self.pager_view.line_selected.connect(lambda line: STATUS.emit('gcode-line-selected', line))
+        self.pager_view.hide()
+        layout = self.w.gcode_viewer.parentWidget().layout()
+        layout.insertWidget(layout.indexOf(self.w.gcode_viewer) + 1, self.pager_view)
+        # toolpath overview for very large programs, shown in place of gcodegraphics
+        self.overview_view = OverviewWidget()
+        self.overview_view.setObjectName('overview_view')
+        self.overview_view.set_live_plot(self.live_plot)
+        self.overview_view.hide()
+        layout = self.w.gcodegraphics.parentWidget().layout()
+        layout.insertWidget(layout.indexOf(self.w.gcodegraphics) + 1, self.overview_view)
+        # remaining time next to the runtime
+        caption = QtWidgets.QLabel("REMAINING")
+        caption.setObjectName('lbl_remaining_caption')
+        caption.setAlignment(QtCore.Qt.AlignCenter)
+        caption.setFixedHeight(30)
+        self.lbl_remaining = QtWidgets.QLineEdit("--:--:--")
+        self.lbl_remaining.setObjectName('lbl_remaining')
+        self.lbl_remaining.setAlignment(QtCore.Qt.AlignCenter)
+        self.lbl_remaining.setReadOnly(True)
+        self.lbl_remaining.setFixedSize(90, 30)
+        self.lbl_remaining.setToolTip("Estimated time to finish the program at the current overrides")
+        layout = self.w.horizontalLayout_13
+        index = layout.indexOf(self.w.lbl_runtime) + 1
+        layout.insertWidget(index, caption)
+        layout.insertWidget(index + 1, self.lbl_remaining)
+        # job history page in status tab
+        self.init_job_history()
+        # cancel button for background file copies
+        self.btn_cancel_copy = QtWidgets.QPushButton("CANCEL\nCOPY")
+        self.btn_cancel_copy.setObjectName('btn_cancel_copy')
+        self.btn_cancel_copy.setEnabled(False)
+        self.btn_cancel_copy.setFixedSize(80, 60)
+        self.btn_cancel_copy.clicked.connect(self.btn_cancel_copy_clicked)
+        layout = self.w.verticalLayout_17
+        layout.insertWidget(layout.indexOf(self.w.btn_copy_left) + 1, self.btn_cancel_copy)
         #set up gcode list
         self.gcodes.setup_list()
-        # set up web page viewer
-        self.web_view = QWebEngineView()
-        self.web_page = WebPage()
-        self.web_view.setPage(self.web_page)
-        self.w.layout_setup.addWidget(self.web_view)
         # initialize gauges
         self.w.gauge_feedrate._value_font_size = 12
         self.w.gauge_feedrate._label_font_size = 8
@@ -305,6 +510,26 @@ class HandlerClass:
             item = self.styleeditor.styleSheetCombo.itemText(i)
             self.w.cmb_stylesheet.addItem(item)
 
+    def init_spindle_load(self):
+        # one sample per second
+        self.load_history = LoadHistory(int(INFO.get_error_safe_setting('DISPLAY', 'SPINDLE_LOAD_HISTORY', "600")))
+        self.overload = OverloadRule(float(INFO.get_error_safe_setting('DISPLAY', 'SPINDLE_OVERLOAD', "0")),
+                                     float(INFO.get_error_safe_setting('DISPLAY', 'SPINDLE_OVERLOAD_TIME', "5")))
+        self.overload_pause = INFO.get_error_safe_setting('DISPLAY', 'SPINDLE_OVERLOAD_ACTION', "warn").lower() == 'pause'
+        self.load_plot = LoadPlot(self.load_history, self.overload.threshold)
+        self.load_plot.setFixedHeight(80)
+        # put the plot under the log pages
+        layout = self.w.horizontalLayout_4
+        index = layout.indexOf(self.w.stackedWidget_log)
+        layout.removeWidget(self.w.stackedWidget_log)
+        box = QtWidgets.QVBoxLayout()
+        box.addWidget(self.w.stackedWidget_log)
+        box.addWidget(self.load_plot)
+        layout.insertLayout(index, box)
+        self.load_timer = QtCore.QTimer()
+        self.load_timer.timeout.connect(self.sample_spindle_load)
+        self.load_timer.start(1000)
+
     def init_probe(self):
         probe = INFO.get_error_safe_setting('PROBE', 'USE_PROBE', 'none').lower()
         if probe == 'versaprobe':
@@ -324,12 +549,95 @@ class HandlerClass:
         self.w.probe_layout.addWidget(self.probe)
         self.probe.hal_init()
 
+    def init_job_history(self):
+        self.job_table = QtWidgets.QTableWidget(0, 6)
+        self.job_table.setHorizontalHeaderLabels(["Program", "Runs", "Min", "Mean", "Max", "Last Run"])
+        self.job_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.job_table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.job_table.verticalHeader().hide()
+        self.job_table.setShowGrid(False)
+        self.job_table.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+        self.w.stackedWidget_log.addWidget(self.job_table)
+        self.btn_job_history = QtWidgets.QPushButton("JOB\nHISTORY")
+        self.btn_job_history.setObjectName('btn_job_history')
+        self.btn_job_history.setCheckable(True)
+        self.btn_job_history.setFixedSize(80, 50)
+        self.btn_job_history.toggled.connect(self.btn_job_history_toggled)
+        self.w.verticalLayout_9.insertWidget(1, self.btn_job_history)
+
+    def init_diagnostics(self):
+        self.diagnostics_page = QtWidgets.QWidget()
+        layout = QtWidgets.QVBoxLayout(self.diagnostics_page)
+        self.diagnostics_table = QtWidgets.QTableWidget(0, 6)
+        self.diagnostics_table.setHorizontalHeaderLabels(["Callback", "Calls", "p50 ms", "p95 ms", "p99 ms", "Max ms"])
+        self.diagnostics_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.diagnostics_table.verticalHeader().hide()
+        self.diagnostics_table.setShowGrid(False)
+        self.diagnostics_table.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+        layout.addWidget(self.diagnostics_table)
+        buttons = QtWidgets.QHBoxLayout()
+        for text, slot in (("CLEAR", self.profiler.clear), ("DUMP TO FILE", self.dump_diagnostics)):
+            btn = QtWidgets.QPushButton(text)
+            btn.setFixedSize(120, 40)
+            btn.clicked.connect(slot)
+            buttons.addWidget(btn)
+        buttons.addStretch()
+        layout.addLayout(buttons)
+        self.w.stackedWidget_log.addWidget(self.diagnostics_page)
+        # only refreshed while it is on screen
+        self.diagnostics_timer = QtCore.QTimer()
+        self.diagnostics_timer.timeout.connect(self.update_diagnostics)
+        self.lag_monitor.start()
+
+    def init_setup_page(self):
+        # set up web page viewer
+        self.web_view = QWebEngineView()
+        self.web_page = WebPage()
+        self.web_view.setPage(self.web_page)
+        self.w.layout_setup.addWidget(self.web_view)
+        # check for default setup html file
+        try:
+            url = QtCore.QUrl("file:///" + self.default_setup)
+            self.web_view.load(url)
+        except Exception as e:
+            print("No default setup file found - {}".format(e))
+
     def init_utils(self):
         self.facing = Facing()
         self.w.layout_facing.addWidget(self.facing)
         self.hole_circle = Hole_Circle()
         self.w.layout_hole_circle.addWidget(self.hole_circle)
 
+    def timed_init(self, name, func):
+        start = time.monotonic()
+        func()
+        self.startup_times.append((name, (time.monotonic() - start) * 1000))
+
+    def save_preference(self, option, value, section='CUSTOM_FORM_ENTRIES'):
+        if self.prefs is not None:
+            self.prefs.set(option, value, section)
+
+    def status_connect(self, signal, callback):
+        if self.profiler is not None:
+            callback = self.profiler.wrap('status: ' + signal, callback)
+        STATUS.connect(signal, callback)
+
+    def build_tab(self, index):
+        init = self.lazy_tabs.pop(index, None)
+        if init is None: return
+        start = time.monotonic()
+        init()
+        LOG.info("Built page {} in {:.0f} ms".format(index, (time.monotonic() - start) * 1000))
+
+    def prewarm_next_tab(self):
+        # build the remaining pages one per idle turn, but never while a program runs
+        if not self.lazy_tabs: return
+        if STATUS.is_auto_running():
+            QtCore.QTimer.singleShot(5000, self.prewarm_next_tab)
+            return
+        self.build_tab(next(iter(self.lazy_tabs)))
+        QtCore.QTimer.singleShot(0, self.prewarm_next_tab)
+
     def init_joypads(self):
         self.w.pgm_control.set_tooltip('T', "RUN")
         self.w.pgm_control.set_tooltip('L', "RELOAD")
@@ -339,6 +647,7 @@ class HandlerClass:
         self.w.pgm_control.set_true_color(self.stop_color)
 
     def processed_key_event__(self,receiver,event,is_pressed,key,code,shift,cntrl):
+        self.key_event_time = time.perf_counter()
         # when typing in MDI, we don't want keybinding to call functions
         # so we catch and process the events directly.
         # We do want ESC, F1 and F2 to call keybinding functions though
@@ -347,28 +656,8 @@ class HandlerClass:
 
             # search for the top widget of whatever widget received the event
             # then check if it's one we want the keypress events to go to
-            flag = False
-            receiver2 = receiver
-            while receiver2 is not None and not flag:
-                if isinstance(receiver2, QtWidgets.QDialog):
-                    flag = True
-                    break
-                if isinstance(receiver2, QtWidgets.QLineEdit):
-                    flag = True
-                    break
-                if isinstance(receiver2, MDI_WIDGET):
-                    flag = True
-                    break
-                if isinstance(receiver2, GCODE):
-                    flag = True
-                    break
-                if isinstance(receiver2, TOOL_TABLE):
-                    flag = True
-                    break
-                if isinstance(receiver2, OFFSET_VIEW):
-                    flag = True
-                    break
-                receiver2 = receiver2.parent()
+            receiver2 = self.key_router.route(receiver)
+            flag = receiver2 is not None
 
             if flag:
                 if isinstance(receiver2, GCODE):
@@ -407,24 +696,22 @@ class HandlerClass:
     # CALLBACKS FROM STATUS #
     #########################
 
-    def spindle_pwr_changed(self, data):
-        # this calculation assumes the voltage is line to neutral
-        # that the current reported by the VFD is total current for all 3 phases
-        # and that the synchronous motor spindle has a power factor of 0.9
-        power = float(self.spindle_volts.get() * self.spindle_amps.get() * 0.9) # V x I x PF
-        pc_power = (power / float(self.max_spindle_power)) * 100
-        if pc_power > 100:
-            pc_power = 100
-        self.w.spindle_power.setValue(int(pc_power))
-
     def dialog_return(self, w, message):
         rtn = message.get('RETURN')
         name = message.get('NAME')
         unhome_code = bool(message.get('ID') == '_unhome_')
         pause_code = bool(message.get('ID') == '_wait_resume_')
         clr_mdi_code = bool(message.get('ID') == '_clear_mdi_')
+        preflight_code = bool(message.get('ID') == '_preflight_')
+        run_line_code = bool(message.get('ID') == '_run_from_line_')
         if unhome_code and name == 'MESSAGE' and rtn is True:
             ACTION.SET_MACHINE_UNHOMED(-1)
+        elif preflight_code and name == 'MESSAGE' and rtn is True:
+            self.preflight_confirmed = True
+            self.btn_run_clicked()
+        elif run_line_code and name == 'MESSAGE' and rtn is True:
+            self.preamble_confirmed = True
+            self.btn_run_clicked()
         elif pause_code and name == 'MESSAGE':
             self.eoffset_clear.set(True)
             self.eoffset_count.set(0)
@@ -438,6 +725,7 @@ class HandlerClass:
                     pass
 
     def command_stopped(self, obj):
+        self.run_interrupted("stopped")
         if self.w.chk_pause_spindle.isChecked():
             self.eoffset_clear.set(True)
             self.eoffset_count.set(0)
@@ -474,7 +762,20 @@ class HandlerClass:
             self.add_status("Loaded file {}".format(filename))
             self.w.progressBar.reset()
             self.last_loaded_program = filename
+            self.gcode_history.add(filename)
+            self.update_gcode_history(filename)
+            self.save_preference('last_loaded_file', filename, 'BOOK_KEEPING')
+            self.save_preference('last_loaded_directory', os.path.dirname(filename), 'BOOK_KEEPING')
+            self.save_preference('gcode_history', self.gcode_history.to_text(), 'BOOK_KEEPING')
             self.current_loaded_program = filename
+            self.preflight_pending = True
+            self.preflight_result = None
+            self.preflight_confirmed = False
+            self.preflight.analyze(filename)
+            self.loaded_offsets = self.work_offsets()
+            self.preamble_confirmed = False
+            self.estimate = None
+            self.show_remaining()
             self.w.lbl_runtime.setText("00:00:00")
         else:
             self.add_status("Filename not valid")
@@ -490,6 +791,11 @@ class HandlerClass:
             self.w.progressBar.setFormat('LOADING: {}%'.format(pc))
 
     def percent_done_changed(self, pc):
+        # gcode_viewer doesn't hold a paged program, the pager reports progress instead
+        if self.paged_program is not None: return
+        self.show_percent_done(pc)
+
+    def show_percent_done(self, pc):
         if pc == self.progress: return
         self.progress = pc
         if pc < 0:
@@ -498,6 +804,9 @@ class HandlerClass:
         else:
             self.w.progressBar.setValue(pc)
             self.w.progressBar.setFormat('COMPLETE: {}%'.format(pc))
+            if self.runtimer.is_active():
+                self.estimate_mark = (pc, self.runtimer.elapsed())
+                self.show_remaining()
 
     def homed(self, obj, joint):
         i = int(joint)
@@ -523,8 +832,6 @@ class HandlerClass:
                 ACTION.CALL_MDI(command)
             if self.last_loaded_program is not None and self.w.chk_reload_program.isChecked():
                 if os.path.isfile(self.last_loaded_program):
-                    self.w.cmb_gcode_history.addItem(self.last_loaded_program)
-                    self.w.cmb_gcode_history.setCurrentIndex(self.w.cmb_gcode_history.count() - 1)
                     ACTION.OPEN_PROGRAM(self.last_loaded_program)
         ACTION.SET_MANUAL_MODE()
         self.w.manual_mode_button.setChecked(True)
@@ -547,15 +854,17 @@ class HandlerClass:
                     pass
 
     def update_status(self):
-        # runtimer
-        if self.timer_on is False or STATUS.is_auto_paused(): return
-        self.time_tenths += 1
-        if self.time_tenths == 10:
-            self.time_tenths = 0
-            self.run_time += 1
-            hours, remainder = divmod(self.run_time, 3600)
-            minutes, seconds = divmod(remainder, 60)
-            self.w.lbl_runtime.setText("{:02d}:{:02d}:{:02d}".format(hours, minutes, seconds))
+        self.preamble_poll(False)
+        # runtimer - a feed override of 0 holds motion without pausing the interpreter
+        if not self.runtimer.is_active(): return
+        self.runtimer.update(STATUS.is_auto_paused(), STATUS.stat.feedrate == 0)
+        if self.job is not None:
+            self.job.sample(STATUS.stat.feedrate, STATUS.stat.spindle[0]['override'], STATUS.stat.rapidrate)
+        seconds = int(self.runtimer.elapsed())
+        if seconds != self.runtime_shown:
+            self.runtime_shown = seconds
+            self.w.lbl_runtime.setText(RunTimer.format(seconds))
+            self.show_remaining()
 
     def hard_limit_tripped(self, obj, tripped, list_of_tripped):
         self.add_status("Hard limits tripped")
@@ -579,6 +888,7 @@ class HandlerClass:
         if index == TAB_FILE and self.w.btn_gcode_edit.isChecked():
             self.w.btn_gcode_edit.setChecked(False)
             self.w.btn_gcode_edit_clicked(False)
+        self.build_tab(index)
         self.w.main_tab_widget.setCurrentIndex(index)
 
     def mpg_scale_changed(self, btn):
@@ -589,7 +899,7 @@ class HandlerClass:
     # gcode frame
     def cmb_gcode_history_clicked(self):
         if self.w.cmb_gcode_history.currentIndex() == 0: return
-        filename = self.w.cmb_gcode_history.currentText()
+        filename = self.w.cmb_gcode_history.currentData()
         if filename == self.last_loaded_program:
             self.add_status("Selected program is already loaded")
         else:
@@ -616,6 +926,7 @@ class HandlerClass:
         elif btn == "R":
             ACTION.STEP()
         elif btn == "C":
+            self.job_aborted()
             ACTION.ABORT()
             self.w.pgm_control.set_tooltip('B', "PAUSE")
             self.w.pgm_control.set_true_color(self.stop_color)
@@ -632,18 +943,228 @@ class HandlerClass:
         if self.current_loaded_program is None:
             self.add_status("No program has been loaded")
             return
+        if not self.preflight_ok():
+            return
+        if self.start_line > 1 and not self.run_from_line_ok():
+            return
+        if self.start_line > 1 and self.preamble_confirmed:
+            # the program starts once the set up commands have run
+            self.start_preamble()
+            return
+        self.start_program()
+
+    def start_program(self, preamble_done=False):
+        if self.live_plot.added >= self.live_plot.capacity:
+            # a long trail from earlier, start the preview's plot again
+            self.w.gcodegraphics.clear_live_plotter()
+            self.live_plot.reset_added()
         self.w.pgm_control.set_true_color(self.run_color)
-        self.run_time = 0
+        self.runtime_shown = 0
         self.w.lbl_runtime.setText("00:00:00")
         if self.start_line <= 1:
             ACTION.RUN(0)
+        elif preamble_done:
+            ACTION.RUN(self.start_line)
         else:
             # instantiate run from line preset dialog
             info = '<b>Running From Line: {} <\b>'.format(self.start_line)
             mess = {'NAME':'RUNFROMLINE', 'TITLE':'Preset Dialog', 'ID':'_RUNFROMLINE', 'MESSAGE':info, 'LINE':self.start_line}
             ACTION.CALL_DIALOG(mess)
         self.add_status("Started program from line {}".format(self.start_line))
-        self.timer_on = True
+        self.runtimer.start(self.current_loaded_program)
+        if self.estimate is not None:
+            self.estimate_mark = (self.start_line * 100 // self.estimate['lines'], 0.0)
+        self.show_remaining()
+        self.spindle_monitor.start_job()
+        self.job = JobRecord(self.current_loaded_program, self.start_line, STATUS.get_current_tool())
+
+    def sample_spindle_load(self):
+        if self.max_spindle_power > 0:
+            load = self.spindle_monitor.power / self.max_spindle_power * 100
+        else:
+            load = 0.0
+        now = time.monotonic()
+        self.load_history.append(now, load, self.spindle_amps.get(), self.spindle_volts.get(),
+                                 self.spindle_fault.get(), self.modbus_errors.get())
+        if self.load_plot.isVisible():
+            self.load_plot.update()
+        if self.overload.check(now, load):
+            self.spindle_overload(load)
+
+    def spindle_overload(self, load):
+        self.add_status("Spindle overload - {:.0f}% for {:.0f} seconds".format(load, self.overload.duration))
+        if not self.overload_pause: return
+        if not STATUS.is_auto_running() or STATUS.is_auto_paused(): return
+        self.w.pgm_control.set_tooltip('B', "RESUME")
+        self.w.pgm_control.set_true_color(self.pause_color)
+        ACTION.PAUSE()
+        if self.w.chk_pause_spindle.isChecked():
+            self.pause_spindle()
+
+    def preflight_finished(self, filename, result):
+        if filename != self.current_loaded_program: return
+        self.preflight_pending = False
+        self.preflight_result = result
+        self.estimate = result.get('estimate')
+        self.estimate_feed = result['feed'][1] or 0.0
+        self.show_remaining()
+        self.add_status("Pre-flight: " + ", ".join(summary(result)))
+        problems = check_limits(result, self.axis_limits, self.work_offsets())
+        for problem in problems:
+            self.add_status("WARNING - " + problem)
+        if problems and STATUS.is_auto_running():
+            # started before the check finished
+            info = "<br>".join(problems)
+            mess = {'NAME':'MESSAGE', 'ICON':'WARNING', 'ID':'_preflight_running_', 'MESSAGE':'RUNNING PROGRAM EXCEEDS MACHINE LIMITS', 'MORE':info, 'TYPE':'OK'}
+            ACTION.CALL_DIALOG(mess)
+
+    def preflight_failed(self, filename, error):
+        if filename != self.current_loaded_program: return
+        self.preflight_pending = False
+        self.add_status("Pre-flight check failed - {}".format(error))
+
+    def run_from_line_ok(self):
+        # work out the state at the start line from the pre-flight checkpoints and confirm it
+        if self.preamble_confirmed: return True
+        result = self.preflight_result
+        # without a pre-flight result the preset dialog does the job
+        if result is None: return True
+        try:
+            parser = state_at(self.current_loaded_program, result, self.start_line, INFO.MACHINE_IS_METRIC)
+        except OSError as e:
+            self.add_status("Unable to read program for run from line - {}".format(e))
+            return False
+        if parser.ended:
+            self.add_status("Program ends before line {}".format(self.start_line))
+            return False
+        problem = unsupported(parser)
+        if problem is not None:
+            self.add_status("Can't run from line {}, {}".format(self.start_line, problem))
+            return False
+        top = result['extents'].get('Z', [None, None])[1]
+        self.run_preamble = preamble(parser, STATUS.get_current_tool(), top, self.axis_limits.get('Z', (None, None))[1])
+        info = self.run_preamble + ["", "These commands run in MDI before the program starts."]
+        if result['approximate']:
+            info.append("The program uses parameters or subroutines, check them carefully.")
+        mess = {'NAME':'MESSAGE', 'ICON':'QUESTION', 'ID':'_run_from_line_',
+                'MESSAGE':'RUN FROM LINE {}'.format(self.start_line), 'MORE':"<br>".join(info), 'TYPE':'OKCANCEL'}
+        ACTION.CALL_DIALOG(mess)
+        return False
+
+    def start_preamble(self):
+        self.preamble_confirmed = False
+        self.preamble_queue = list(self.run_preamble)
+        self.preamble_running = True
+        self.add_status("Setting up to run from line {}".format(self.start_line))
+        self.preamble_step()
+
+    def preamble_step(self):
+        # send the next set up command, the program once they have all run
+        if not self.preamble_queue:
+            self.preamble_running = False
+            ACTION.SET_AUTO_MODE()
+            self.start_program(True)
+            return
+        self.preamble_polls = 0
+        ACTION.CALL_MDI(self.preamble_queue.pop(0))
+
+    def preamble_poll(self, idle):
+        if not self.preamble_running: return
+        if not idle:
+            # a quick command can finish between status updates without an idle change
+            self.preamble_polls += 1
+            if self.preamble_polls < 3 or not STATUS.is_interp_idle(): return
+        self.preamble_step()
+
+    def error_reported(self, kind):
+        # (MSG, ...) comments come through as operator text and display, they don't stop anything
+        if kind in (linuxcnc.NML_ERROR, linuxcnc.OPERATOR_ERROR):
+            self.run_interrupted("error")
+
+    def run_interrupted(self, reason):
+        # the program or its run from line set up didn't get to the end
+        self.job_aborted()
+        self.cancel_preamble(reason)
+
+    def cancel_preamble(self, reason):
+        if not self.preamble_running: return
+        self.preamble_running = False
+        self.preamble_queue = []
+        self.add_status("Run from line cancelled - {}".format(reason))
+
+    def interp_idle(self):
+        self.stop_timer()
+        self.program_preview.pause(False)
+        self.preamble_poll(True)
+
+    def motion_limits(self):
+        # INI limits for the run time estimate, velocities in units per second
+        velocity = {}
+        acceleration = {}
+        for axis in INFO.AVAILABLE_AXES:
+            try:
+                velocity[axis] = float(INFO.get_error_safe_setting('AXIS_' + axis, 'MAX_VELOCITY', None))
+                acceleration[axis] = float(INFO.get_error_safe_setting('AXIS_' + axis, 'MAX_ACCELERATION', None))
+            except (TypeError, ValueError):
+                pass
+        try:
+            max_accel = float(INFO.get_error_safe_setting('TRAJ', 'MAX_LINEAR_ACCELERATION', None))
+        except (TypeError, ValueError):
+            max_accel = None
+        return MotionLimits(velocity, acceleration, INFO.MAX_TRAJ_VELOCITY / 60, max_accel)
+
+    def estimate_scales(self):
+        # time multipliers for the feed and rapid parts of the estimate from the override sliders
+        maxv = max(1.0, self.w.adj_maxv_ovr.value)
+        rapid = min(self.max_linear_velocity * self.w.adj_rapid_ovr.value / 100, maxv)
+        rapid_scale = self.max_linear_velocity / max(1.0, rapid)
+        feed_scale = 100 / max(1.0, self.w.adj_feed_ovr.value)
+        # max velocity is only applied to the fastest feed, which stands in for the rest
+        if self.estimate_feed > 0:
+            feed_scale = max(feed_scale, self.estimate_feed / maxv)
+        return feed_scale, rapid_scale
+
+    def show_remaining(self):
+        # whole program while idle, counting down while running
+        if self.estimate is None:
+            self.remaining_shown = -1
+            self.lbl_remaining.setText("--:--:--")
+            return
+        feed_scale, rapid_scale = self.estimate_scales()
+        if self.runtimer.is_active():
+            percent, since = self.estimate_mark
+            seconds = remaining(self.estimate, percent, feed_scale, rapid_scale)
+            # count down through the current percent but not past it
+            floor = remaining(self.estimate, percent + 1, feed_scale, rapid_scale) if percent < 100 else 0.0
+            seconds = max(floor, seconds - (self.runtimer.elapsed() - since))
+        else:
+            seconds = remaining(self.estimate, 0, feed_scale, rapid_scale)
+        seconds = int(seconds)
+        if seconds == self.remaining_shown: return
+        self.remaining_shown = seconds
+        self.lbl_remaining.setText(RunTimer.format(seconds))
+
+    def preflight_ok(self):
+        if self.preflight_pending:
+            # a huge program can take minutes to check, its limits are checked when the result arrives
+            self.add_status("WARNING - Pre-flight check still running, starting without the limit check")
+            return True
+        if self.preflight_result is None or self.preflight_confirmed: return True
+        # the offsets may have changed since the program was loaded
+        problems = check_limits(self.preflight_result, self.axis_limits, self.work_offsets())
+        if not problems: return True
+        info = "<br>".join(problems + ["", "Run the program anyway?"])
+        mess = {'NAME':'MESSAGE', 'ICON':'WARNING', 'ID':'_preflight_', 'MESSAGE':'PROGRAM EXCEEDS MACHINE LIMITS', 'MORE':info, 'TYPE':'OKCANCEL'}
+        ACTION.CALL_DIALOG(mess)
+        return False
+
+    def work_offsets(self):
+        # program to machine coordinates, rotation is not taken into account
+        stat = STATUS.stat
+        offsets = {}
+        for index, axis in enumerate('XYZA'):
+            offsets[axis] = stat.g5x_offset[index] + stat.g92_offset[index] + stat.tool_offset[index]
+        return offsets
 
     def pause_spindle(self):
         # set external offsets to lift spindle
@@ -659,15 +1180,49 @@ class HandlerClass:
     def btn_reload_file_clicked(self):
         if self.last_loaded_program:
             self.w.progressBar.reset()
+            if self.reload_unchanged(self.last_loaded_program): return
             self.add_status("Loaded program file {}".format(self.last_loaded_program))
             ACTION.OPEN_PROGRAM(self.last_loaded_program)
 
+    def reload_unchanged(self, filename):
+        # a file that hasn't changed isn't opened again, only its preview follows the current offsets
+        if filename != self.current_loaded_program or self.preflight_result is None: return False
+        # subroutines in other files may have been edited, only a fully read program is known to be unchanged
+        if self.preflight_result['approximate']: return False
+        entry = self.preflight.entry(filename)
+        try:
+            stat = os.stat(filename)
+            if entry is None or stat.st_size != entry[1]: return False
+            if stat.st_mtime != entry[0]:
+                if file_hash(filename) != entry[2]: return False
+                self.preflight.touch(filename, stat)
+        except OSError:
+            return False
+        offsets = self.work_offsets()
+        if offsets == self.loaded_offsets:
+            self.add_status("Program {} is unchanged, nothing to reload".format(filename))
+            return True
+        self.loaded_offsets = offsets
+        # a limit warning confirmed at the old offsets doesn't cover the new ones
+        self.preflight_confirmed = False
+        if self.overview_program == filename:
+            self.overview_view.set_offset(offsets['X'], offsets['Y'])
+            self.add_status("Program {} is unchanged, preview moved to the new offsets".format(filename))
+        else:
+            # the full preview has the offsets built into its plot, gcodegraphics has to interpret it again
+            ACTION.RELOAD_DISPLAY()
+            self.add_status("Program {} is unchanged, replotting the preview at the new offsets".format(filename))
+        for problem in check_limits(self.preflight_result, self.axis_limits, offsets):
+            self.add_status("WARNING - " + problem)
+        return True
+
     def chk_run_from_line_changed(self, state):
         self.w.gcodegraphics.set_inhibit_selection(not state)
         text = "ENABLED" if state else "DISABLED"
         self.w.lbl_start_line.setText(text)
         if not state:
             self.start_line = 1
+        self.preamble_confirmed = False
 
     def chk_pause_spindle_changed(self, state):
         text = 'ENABLED' if state else 'DISABLED'
@@ -797,13 +1352,16 @@ class HandlerClass:
     def adj_rapid_changed(self, value):
         rapid = (value / 100) * self.max_linear_velocity * self.factor
         self.w.lbl_max_rapid.setText("{:4.0f}".format(rapid))
+        self.show_remaining()
 
     def adj_maxv_changed(self, value):
         self.w.lbl_maxv.setText("{:4.0f}".format(value * self.factor))
+        self.show_remaining()
 
     def adj_feed_ovr_changed(self, value):
         frac = int(value * self.max_linear_velocity / 100)
         self.w.gauge_feedrate.set_threshold(frac)
+        self.show_remaining()
 
     def adj_spindle_ovr_changed(self, value):
         frac = int(value * self.max_spindle_rpm / 100)
@@ -814,14 +1372,65 @@ class HandlerClass:
         if not STATUS.is_on_and_idle():
             return
         if state:
+            if self.deferred_edit is not None:
+                # a paged program is only read into the editor when it's really edited
+                self.add_status("Loading {} for editing".format(self.deferred_edit))
+                self.old_gcode_load(self.w.gcode_editor.editor, None, self.deferred_edit)
+                self.deferred_edit = None
             self.w.filemanager.hide()
+            self.preview_pane.hide()
             self.w.gcode_editor.show()
             self.w.gcode_editor.editMode()
         else:
             self.w.filemanager.show()
+            self.preview_pane.show()
             self.w.gcode_editor.hide()
             self.w.gcode_editor.readOnlyMode()
 
+    def use_directory_model(self, fm):
+        # the file manager's QFileSystemModel stats every entry on the GUI thread
+        model = DirectoryModel(self.stat_cache)
+        model.setNameFilters(fm.model.nameFilters())
+        model.failed.connect(lambda path, error: self.add_status("Unable to list {} - {}".format(path, error)))
+        # FileManager follows the listed directory in its path box through its model
+        if hasattr(fm, 'folderChanged'):
+            try:
+                fm.model.rootPathChanged.disconnect(fm.folderChanged)
+            except TypeError:
+                pass
+            model.rootPathChanged.connect(fm.folderChanged)
+        fm.model = model
+        fm.list.setModel(model)
+        fm.table.setModel(model)
+        fm.table.selectionModel().currentChanged.connect(lambda index, previous: self.show_preview(model.filePath(index)))
+        model.directoryLoaded.connect(lambda path: self.prefetch_previews(model))
+        self.dir_models.append(model)
+
+    def show_preview(self, filename):
+        self.preview_image.clear()
+        if not filename.lower().endswith(PROGRAM_TYPES):
+            self.preview_file = None
+            self.preview_text.setText("")
+            return
+        self.preview_file = filename
+        self.preview_text.setText("Reading {}...".format(os.path.basename(filename)))
+        self.program_preview.request(filename)
+
+    def prefetch_previews(self, model):
+        # the rest of the listed programs, in the order they're shown
+        files = [model.filePath(model.index(row, 0)) for row in range(model.rowCount())]
+        self.program_preview.prefetch([fname for fname in files if fname.lower().endswith(PROGRAM_TYPES)])
+
+    def preview_ready(self, filename, preview):
+        if filename != self.preview_file: return
+        if preview['image'] is not None:
+            self.preview_image.setPixmap(QtGui.QPixmap.fromImage(preview['image']))
+        self.preview_text.setText("\n".join(preview['summary']))
+
+    def preview_failed(self, filename, error):
+        if filename != self.preview_file: return
+        self.preview_text.setText("No preview - {}".format(error))
+
     def btn_load_file_clicked(self):
         if self.w.btn_gcode_edit.isChecked(): return
         fname = self.w.filemanager.getCurrentSelected()
@@ -845,11 +1454,30 @@ class HandlerClass:
             destination = os.path.join(os.path.dirname(target[0]), os.path.basename(source[0]))
         else:
             destination = os.path.join(target[0], os.path.basename(source[0]))
-        try:
-            copyfile(source[0], destination)
-            self.add_status("Copied file from {} to {}".format(source[0], destination))
-        except Exception as e:
-            self.add_status("Unable to copy file. %s" %e)
+        self.file_copier.add(source[0], destination)
+        self.add_status("Queued copy of {} to {}".format(source[0], destination))
+
+    def btn_cancel_copy_clicked(self):
+        self.file_copier.cancel()
+
+    def copy_progress(self, source, destination, pc):
+        # the bar shows the program's progress while it runs
+        if STATUS.is_auto_running(): return
+        self.w.progressBar.setValue(pc)
+        self.w.progressBar.setFormat('COPY {}: {}%'.format(os.path.basename(source), pc))
+
+    def copy_finished(self, source, destination):
+        self.add_status("Copied file from {} to {}".format(source, destination))
+
+    def copy_failed(self, source, destination, error):
+        self.add_status("Unable to copy file. {}".format(error))
+
+    def copy_pending(self, count):
+        self.btn_cancel_copy.setEnabled(count > 0)
+        if count == 0 and not STATUS.is_auto_running():
+            self.progress = None
+            self.w.progressBar.reset()
+            self.w.progressBar.setFormat('PROGRESS')
 
     # tool tab
     def btn_load_tool_clicked(self):
@@ -872,14 +1500,42 @@ class HandlerClass:
         else:
             text = self.w.machinelog.toPlainText()
         filename = self.w.lbl_clock.text()
-        filename = 'status_' + filename.replace(' ','_') + '.txt'
+        filename = os.path.join(self.status_log.directory, 'status_' + filename.replace(' ','_') + '.txt')
         self.add_status("Saving log to {}".format(filename))
-        with open(filename, 'w') as f:
-            f.write(text)
+        try:
+            os.makedirs(self.status_log.directory, exist_ok=True)
+        except OSError as e:
+            self.add_status("Unable to save log - {}".format(e))
+            return
+        self.status_log.save_text(filename, text)
+
+    def btn_job_history_toggled(self, state):
+        if state:
+            self.update_job_history()
+            self.w.stackedWidget_log.setCurrentWidget(self.job_table)
+        else:
+            self.w.stackedWidget_log.setCurrentIndex(1 if self.w.btn_select_log.isChecked() else 0)
+
+    def update_job_history(self):
+        if not self.btn_job_history.isChecked(): return
+        try:
+            rows = self.job_history.program_stats()
+        except Exception as e:
+            self.add_status("Unable to read job history - {}".format(e))
+            return
+        self.job_table.setRowCount(len(rows))
+        for row, (program, runs, tmin, tmean, tmax, last) in enumerate(rows):
+            items = (os.path.basename(program), str(runs), RunTimer.format(tmin), RunTimer.format(tmean),
+                     RunTimer.format(tmax), time.strftime("%Y-%m-%d %H:%M", time.localtime(last)))
+            for col, text in enumerate(items):
+                item = QtWidgets.QTableWidgetItem(text)
+                if col == 0:
+                    item.setToolTip(program)
+                self.job_table.setItem(row, col, item)
 
     def btn_dimensions_clicked(self, state):
         self.w.gcodegraphics.show_extents_option = state
-        self.w.gcodegraphics.clear_live_plotter()
+        self.clear_live_plot()
         
     # camview tab
     def cam_zoom_changed(self, value):
@@ -946,16 +1602,90 @@ class HandlerClass:
             if 'A' in self.axis_list:
                 self.w.jog_az.set_highlight('A', bool(self.axis_select_a.get() is True))
 
+    def load_gcode_display(self, display, w, filename=None):
+        # patched GcodeDisplay.load_program, very large programs go to the pager instead
+        viewer = display is self.w.gcode_viewer.editor
+        try:
+            huge = filename is not None and os.path.getsize(filename) > self.pager_size
+        except OSError:
+            huge = False
+        if not huge:
+            if viewer:
+                self.show_pager(None)
+            else:
+                self.deferred_edit = None
+            self.old_gcode_load(display, w, filename)
+            return
+        display.clear()
+        if viewer:
+            self.show_pager(filename)
+        else:
+            self.deferred_edit = filename
+
+    def show_pager(self, filename):
+        self.paged_program = filename
+        if filename is None:
+            self.gcode_pager.close()
+            self.pager_view.hide()
+            self.w.gcode_viewer.show()
+            return
+        self.add_status("{} is {:.0f} MB, showing it paged".format(filename, os.path.getsize(filename) / (1 << 20)))
+        self.gcode_pager.open(filename)
+        self.w.gcode_viewer.hide()
+        self.pager_view.show()
+
+    def follow_paged_line(self, line):
+        if self.paged_program is None: return
+        count = self.gcode_pager.line_count()
+        if not count: return
+        self.pager_view.show_line(line)
+        if STATUS.is_auto_running():
+            self.show_percent_done(min(100, int(line * 100 / count)))
+
+    def load_graphics(self, graphics, g, fname):
+        # patched GCodeGraphics.load_program, very large programs get the overview instead
+        try:
+            huge = fname is not None and os.path.getsize(fname) > self.overview_size
+        except OSError:
+            huge = False
+        if not huge:
+            self.overview_program = None
+            self.overview.cancel()
+            self.overview_view.set_lod(None)
+            self.overview_view.hide()
+            graphics.show()
+            self.old_graphics_load(graphics, g, fname)
+            return
+        self.overview_program = fname
+        offsets = self.work_offsets()
+        self.overview_view.set_offset(offsets['X'], offsets['Y'])
+        self.add_status("{} is too large for the full preview, showing the toolpath overview".format(fname))
+        self.overview.build(fname)
+        graphics.hide()
+        self.overview_view.show()
+
+    def overview_started(self, fname, lod):
+        if fname != self.overview_program: return
+        self.overview_view.set_lod(lod)
+
+    def overview_progress(self, pc):
+        self.percent_loaded_changed(pc)
+        self.overview_view.refresh()
+
+    def overview_finished(self, fname, lod):
+        if fname != self.overview_program: return
+        self.overview_view.set_lod(lod)
+        self.percent_loaded_changed(-1)
+
     def load_code(self, fname):
         if fname is None: return
         if fname.endswith(".ngc") or fname.endswith(".py"):
-            self.w.cmb_gcode_history.addItem(fname)
-            self.w.cmb_gcode_history.setCurrentIndex(self.w.cmb_gcode_history.count() - 1)
             ACTION.OPEN_PROGRAM(fname)
             self.add_status("Loaded program file : {}".format(fname))
             self.w.main_tab_widget.setCurrentIndex(TAB_MAIN)
         elif fname.endswith(".html"):
             try:
+                self.build_tab(TAB_SETUP)
                 url = QtCore.QUrl("file:///" + fname)
                 self.web_view.load(url)
                 self.add_status("Loaded HTML file : {}".format(fname))
@@ -966,6 +1696,18 @@ class HandlerClass:
         else:
             self.add_status("Unknown or invalid filename")
 
+    def update_gcode_history(self, current):
+        # rebuild the combobox from the history, newest first
+        cmb = self.w.cmb_gcode_history
+        cmb.blockSignals(True)
+        cmb.clear()
+        cmb.addItem("No File Loaded")
+        for filename, meta in self.gcode_history.newest_first():
+            cmb.addItem(filename, filename)
+            cmb.setItemData(cmb.count() - 1, GcodeHistory.describe(meta), META_ROLE)
+        cmb.setCurrentIndex(1 if current in self.gcode_history else 0)
+        cmb.blockSignals(False)
+
     def touchoff(self, selector):
         if selector == 'touchplate':
             z_offset = self.w.lineEdit_touch_height.text()
@@ -975,13 +1717,16 @@ class HandlerClass:
         else:
             self.add_status("Unknown touchoff routine specified")
             return
+        if self.touchoff_busy:
+            self.add_status("Touchoff routine is already running")
+            return
         self.add_status("Touchoff to {} started".format(selector))
         max_probe = self.w.lineEdit_max_probe.text()
         search_vel = self.w.lineEdit_search_vel.text()
         probe_vel = self.w.lineEdit_probe_vel.text()
-        self.start_touchoff()
-        string_to_send = "probe_down$" + search_vel + "$" + probe_vel + "$" + max_probe + "$" + z_offset + "\n"
-        self.proc.writeData(bytes(string_to_send, 'utf-8'))
+        string_to_send = "probe_down$" + search_vel + "$" + probe_vel + "$" + max_probe + "$" + z_offset
+        if self.send_touchoff(string_to_send):
+            self.touchoff_busy = True
 
     def kb_jog(self, state, joint, direction, fast = False, linear = True):
         if not STATUS.is_man_mode() or not STATUS.machine_is_on():
@@ -996,13 +1741,30 @@ class HandlerClass:
         if state:
             if fast:
                 rate = rate * 2
+            self.log_key_latency()
             ACTION.JOG(joint, direction, rate, distance)
         else:
             ACTION.JOG(joint, 0, 0, 0)
 
+    def log_key_latency(self):
+        # time from the key event reaching the handler to the jog command
+        if self.key_event_time is None: return
+        self.key_latency.append(time.perf_counter() - self.key_event_time)
+        self.key_event_time = None
+        if len(self.key_latency) == self.key_latency.maxlen:
+            times = sorted(self.key_latency)
+            LOG.debug("Key to jog latency: median {:.3f} ms, max {:.3f} ms".format(
+                      times[len(times) // 2] * 1000, times[-1] * 1000))
+            self.key_latency.clear()
+
     def add_status(self, message):
-        self.w.statusbar.showMessage(message)
-        STATUS.emit('update-machine-log', message, 'TIME')
+        # repeats of the same message are only counted
+        for line in self.status_log.add(message):
+            self.show_status(line)
+
+    def show_status(self, line):
+        self.w.statusbar.showMessage(line)
+        STATUS.emit('update-machine-log', line, 'TIME')
 
     def enable_auto(self, state):
         if state:
@@ -1023,6 +1785,7 @@ class HandlerClass:
         self.w.gcodegraphics.highlight_graphics(line)
         if self.w.chk_run_from_line.isChecked():
             self.start_line = line
+            self.preamble_confirmed = False
             self.w.lbl_start_line.setText("{}".format(self.start_line))
 
     def use_keyboard(self):
@@ -1032,47 +1795,150 @@ class HandlerClass:
             self.add_status('Keyboard shortcuts are disabled')
             return False
 
+    def job_aborted(self):
+        if self.job is not None:
+            self.job.aborted = True
+
+    def update_diagnostics(self):
+        if not self.diagnostics_page.isVisible():
+            self.diagnostics_timer.stop()
+            return
+        rows = self.profiler.report()
+        # event loop lag goes first, it is what the user actually feels
+        rows.sort(key=lambda row: row[0] != LAG_NAME)
+        self.diagnostics_table.setRowCount(len(rows))
+        for row, data in enumerate(rows):
+            items = [data[0], str(data[1])] + ["{:.2f}".format(value) for value in data[2:]]
+            for column, text in enumerate(items):
+                self.diagnostics_table.setItem(row, column, QtWidgets.QTableWidgetItem(text))
+
+    def dump_diagnostics(self):
+        fname = os.path.join(PATH.CONFIGPATH, time.strftime("diagnostics_%Y%m%d_%H%M%S.json"))
+        try:
+            self.profiler.dump(fname)
+            self.add_status("Diagnostics saved to {}".format(fname))
+        except OSError as e:
+            self.add_status("Unable to save diagnostics - {}".format(e))
+
+    def live_position(self, position):
+        if not self.live_plot.add(position[0], position[1], position[2]): return
+        # gcodegraphics keeps its own plot, which can't be trimmed, only cleared. It's cleared when a run
+        # starts and, so it can't grow without end, in a run over ten times longer than the ring's history.
+        if self.live_plot.added >= self.live_plot.capacity * 10:
+            self.w.gcodegraphics.clear_live_plotter()
+            self.live_plot.reset_added()
+        if self.overview_view.isVisible():
+            self.overview_view.live_changed()
+
+    def clear_live_plot(self):
+        self.w.gcodegraphics.clear_live_plotter()
+        self.live_plot.clear()
+        self.overview_view.live_changed()
+
     def stop_timer(self):
         self.w.pgm_control.set_true_color(self.stop_color)
-        if self.timer_on:
-            self.timer_on = False
-            self.add_status("Run timer stopped at {}".format(self.w.lbl_runtime.text()))
+        totals = self.runtimer.stop()
+        if totals is None: return
+        self.w.lbl_runtime.setText(RunTimer.format(totals['running']))
+        self.add_status("Run timer stopped at {} (paused {}, feed hold {})".format(
+                        RunTimer.format(totals['running']), RunTimer.format(totals['paused']),
+                        RunTimer.format(totals['feedhold'])))
+        self.runtime_store.add_run(self.runtimer.program, totals)
+        self.show_remaining()
+        spindle = self.spindle_monitor.stop_job()
+        if spindle is not None:
+            self.add_status("Spindle power peak {:.0f} W, average {:.0f} W".format(*spindle))
+        if self.job is not None:
+            self.job_history.record(self.job, totals)
+            self.job = None
 
     def start_touchoff(self):
-        if self.proc is not None:
-            self.add_status("Touchoff routine is already running")
-            return
+        if self.proc is not None: return
         self.proc = QtCore.QProcess()
         self.proc.setReadChannel(QtCore.QProcess.StandardOutput)
         self.proc.started.connect(self.touchoff_started)
         self.proc.readyReadStandardOutput.connect(self.read_stdout)
         self.proc.readyReadStandardError.connect(self.read_stderror)
         self.proc.finished.connect(self.touchoff_finished)
+        self.proc.errorOccurred.connect(self.touchoff_error)
+        self.touchoff_buffer = b''
+        self.touchoff_ping_pending = False
         self.proc.start('python3 {}'.format(SUBPROGRAM))
 
+    def stop_touchoff(self):
+        self.touchoff_shutdown = True
+        self.touchoff_health.stop()
+        if self.proc is None: return
+        self.proc.writeData(b"quit\n")
+        if not self.proc.waitForFinished(1000):
+            self.proc.kill()
+            self.proc.waitForFinished(1000)
+
+    def send_touchoff(self, request):
+        if self.proc is None or self.proc.state() != QtCore.QProcess.Running:
+            self.add_status("Touchoff service is not running")
+            return False
+        self.proc.writeData(bytes(request + "\n", 'utf-8'))
+        return True
+
+    def check_touchoff(self):
+        # a ping left unanswered since the last check means the service is hung
+        if self.proc is None or self.touchoff_busy: return
+        if self.touchoff_ping_pending:
+            LOG.warning("Touchoff service did not answer health check - restarting")
+            self.proc.kill()
+            return
+        self.touchoff_ping_pending = self.send_touchoff("ping")
+
     def read_stdout(self):
         qba = self.proc.readAllStandardOutput()
-        line = qba.data()
-        self.parse_line(line)
+        self.touchoff_buffer += qba.data()
+        # replies are line based but may arrive split across reads
+        while b'\n' in self.touchoff_buffer:
+            line, self.touchoff_buffer = self.touchoff_buffer.split(b'\n', 1)
+            self.parse_line(line)
 
     def read_stderror(self):
         qba = self.proc.readAllStandardError()
         line = qba.data()
-        self.parse_line(line)
+        LOG.debug("Touchoff service: {}".format(line.decode("utf-8").rstrip()))
 
     def parse_line(self, line):
-        line = line.decode("utf-8")
-        if "COMPLETE" in line:
+        line = line.decode("utf-8").rstrip()
+        if line == "PONG":
+            self.touchoff_ping_pending = False
+            self.touchoff_restarts = 0
+        elif "COMPLETE" in line:
+            self.touchoff_busy = False
             self.add_status("Touchoff routine returned success")
         elif "ERROR" in line:
+            self.touchoff_busy = False
             self.add_status(line)
 
     def touchoff_started(self):
-        LOG.info("TouchOff subprogram started with PID {}\n".format(self.proc.processId()))
+        LOG.info("TouchOff service started with PID {}".format(self.proc.processId()))
+
+    def touchoff_error(self, error):
+        # a process that never started will not emit finished
+        if error == QtCore.QProcess.FailedToStart:
+            self.touchoff_finished(-1, QtCore.QProcess.CrashExit)
 
     def touchoff_finished(self, exitCode, exitStatus):
-        LOG.info("Touchoff Process finished - exitCode {} exitStatus {}".format(exitCode, exitStatus))
+        LOG.info("Touchoff service finished - exitCode {} exitStatus {}".format(exitCode, exitStatus))
+        self.proc.deleteLater()
         self.proc = None
+        if self.touchoff_busy:
+            self.touchoff_busy = False
+            self.add_status("Touchoff service stopped before the routine finished")
+        if self.touchoff_shutdown: return
+        # restart with an increasing delay so a broken install doesn't spin
+        if self.touchoff_restarts >= self.touchoff_max_restarts:
+            LOG.error("Touchoff service restarted {} times - giving up".format(self.touchoff_restarts))
+            self.add_status("Touchoff service failed - touchoff is unavailable")
+            return
+        delay = 500 * 2 ** self.touchoff_restarts
+        self.touchoff_restarts += 1
+        QtCore.QTimer.singleShot(delay, self.start_touchoff)
 
     #####################
     # KEY BINDING CALLS #
@@ -1088,6 +1954,7 @@ class HandlerClass:
 
     def on_keycall_ABORT(self,event,state,shift,cntrl):
         if state:
+            self.job_aborted()
             ACTION.ABORT()
 
     def on_keycall_HOME(self,event,state,shift,cntrl):
@@ -1135,6 +2002,19 @@ class HandlerClass:
             mess = {'NAME':'CALCULATOR', 'TITLE':'Calculator', 'ID':'_calculator_'}
             ACTION.CALL_DIALOG(mess)
 
+    def on_keycall_F10(self,event,state,shift,cntrl):
+        if not state or self.profiler is None: return
+        if self.w.stackedWidget_log.currentWidget() is self.diagnostics_page:
+            self.w.stackedWidget_log.setCurrentIndex(1 if self.w.btn_select_log.isChecked() else 0)
+        else:
+            self.btn_job_history.setChecked(False)
+            # allowed in AUTO too, stalls during a run are what this is for
+            self.w.main_tab_widget.setCurrentIndex(TAB_STATUS)
+            self.w.btn_status.setChecked(True)
+            self.w.stackedWidget_log.setCurrentWidget(self.diagnostics_page)
+            self.update_diagnostics()
+            self.diagnostics_timer.start(1000)
+
     def on_keycall_F12(self,event,state,shift,cntrl):
         if state:
             self.styleeditor.load_dialog()
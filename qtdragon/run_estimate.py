@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# Run time estimate
+#
+# Replays a program's moves against the velocity and acceleration limits from
+# the INI. Every move gets a trapezoidal velocity profile. The speed through a
+# corner depends on how sharply the path turns, which is roughly what the
+# trajectory planner does when it blends moves. Feed, rapid and dwell time are
+# added up per percent of the program's lines. That lets the remaining time
+# follow percent_done and the overrides while the program runs.
+
+import math
+
+PERCENT = 101
+
+def move_time(length, velocity, acceleration, entry=0.0, exit=0.0):
+    # trapezoidal profile, triangular when the move is too short to reach full speed
+    if velocity <= 0: return 0.0
+    if acceleration <= 0: return length / velocity
+    accel_distance = (velocity ** 2 - entry ** 2) / (2 * acceleration)
+    decel_distance = (velocity ** 2 - exit ** 2) / (2 * acceleration)
+    if accel_distance + decel_distance <= length:
+        return ((2 * velocity - entry - exit) / acceleration
+                + (length - accel_distance - decel_distance) / velocity)
+    peak = math.sqrt((2 * acceleration * length + entry ** 2 + exit ** 2) / 2)
+    peak = max(peak, entry, exit)
+    return (2 * peak - entry - exit) / acceleration
+
+class MotionLimits():
+    # velocities in units per second, accelerations in units per second squared
+    def __init__(self, velocity, acceleration, max_velocity, max_acceleration=None):
+        self.velocity = dict(velocity)
+        self.acceleration = dict(acceleration)
+        self.max_velocity = max_velocity
+        if max_acceleration is None:
+            max_acceleration = max(self.acceleration.values(), default=0.0)
+        self.max_acceleration = max_acceleration
+
+    def signature(self):
+        # anything that changes the estimate, stored with cached results
+        return [sorted(self.velocity.items()), sorted(self.acceleration.items()),
+                self.max_velocity, self.max_acceleration]
+
+    def along(self, direction):
+        # (velocity, acceleration) for a move along a unit direction
+        velocity = self.max_velocity
+        acceleration = self.max_acceleration
+        for axis, component in direction.items():
+            component = abs(component)
+            if component < 1e-9: continue
+            if axis in self.velocity:
+                velocity = min(velocity, self.velocity[axis] / component)
+            if axis in self.acceleration:
+                acceleration = min(acceleration, self.acceleration[axis] / component)
+        return velocity, acceleration
+
+class RunEstimate():
+    def __init__(self, limits, total_lines):
+        self.limits = limits
+        self.total_lines = max(1, total_lines)
+        self.feed = [0.0] * PERCENT
+        self.rapid = [0.0] * PERCENT
+        self.fixed = [0.0] * PERCENT
+        # the last move waits for the next one to know its exit speed
+        self.pending = None
+
+    def bucket(self, line):
+        return min(PERCENT - 1, line * 100 // self.total_lines)
+
+    def move(self, line, length, start_dir, end_dir, rate=None, radius=None):
+        # rate in units per minute, None for a rapid
+        if length < 1e-9: return
+        velocity, acceleration = self.limits.along(start_dir)
+        if end_dir is not start_dir:
+            end_velocity, end_acceleration = self.limits.along(end_dir)
+            velocity = min(velocity, end_velocity)
+            acceleration = min(acceleration, end_acceleration)
+        if rate is not None:
+            velocity = min(velocity, rate / 60)
+        if radius:
+            # keep the centripetal acceleration within the limit
+            velocity = min(velocity, math.sqrt(acceleration * radius))
+        entry = 0.0
+        if self.pending is not None:
+            last = self.pending
+            turn = sum(last['end_dir'].get(axis, 0.0) * component for axis, component in start_dir.items())
+            entry = min(last['velocity'], velocity) * max(0.0, turn)
+            self.finish(entry)
+        self.pending = {'line': line, 'rapid': rate is None, 'length': length, 'velocity': velocity,
+                        'acceleration': acceleration, 'entry': entry, 'end_dir': end_dir}
+
+    def stop(self):
+        # motion comes to a halt, e.g. a dwell, a tool change or a jump in position
+        if self.pending is not None:
+            self.finish(0.0)
+
+    def dwell(self, line, seconds):
+        self.stop()
+        self.fixed[self.bucket(line)] += seconds
+
+    def finish(self, exit):
+        move = self.pending
+        self.pending = None
+        acceleration = move['acceleration']
+        exit = min(exit, math.sqrt(move['entry'] ** 2 + 2 * acceleration * move['length']))
+        seconds = move_time(move['length'], move['velocity'], acceleration, move['entry'], exit)
+        series = self.rapid if move['rapid'] else self.feed
+        series[self.bucket(move['line'])] += seconds
+
+    def result(self):
+        self.stop()
+        estimate = {'lines': self.total_lines, 'totals': []}
+        for name, series in (('feed', self.feed), ('rapid', self.rapid), ('fixed', self.fixed)):
+            # time spent before each percent
+            cumulative = []
+            running = 0.0
+            for seconds in series:
+                cumulative.append(round(running, 2))
+                running += seconds
+            estimate[name] = cumulative
+            estimate['totals'].append(round(running, 2))
+        return estimate
+
+def remaining(estimate, percent=0, feed_scale=1.0, rapid_scale=1.0):
+    # seconds left from the start of a percent, the scales multiply feed and rapid time
+    percent = min(PERCENT - 1, max(0, percent))
+    feed, rapid, fixed = estimate['totals']
+    return ((feed - estimate['feed'][percent]) * feed_scale
+            + (rapid - estimate['rapid'][percent]) * rapid_scale
+            + fixed - estimate['fixed'][percent])
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# Run from line
+#
+# The pre-flight check saves the parser state at regular line intervals with
+# the byte offset of the following line. To start part way into a program, the
+# file is only parsed from the nearest saved state up to the chosen line,
+# however long it is. The modal state at that point becomes the MDI commands
+# that must run before the program starts at that line.
+
+from gcode_preflight import GcodeParser
+
+def state_at(filename, result, line, machine_metric=True):
+    # parser state after the lines before the given one
+    target = line - 1
+    parser = GcodeParser(machine_metric)
+    checkpoints = result.get('checkpoints') or []
+    offset = 0
+    # checkpoints are evenly spaced, no search needed
+    index = min(len(checkpoints), target // result.get('checkpoint_lines', 1)) - 1
+    if index >= 0:
+        lines, offset, snapshot = checkpoints[index]
+        parser.restore(snapshot, lines)
+    with open(filename, 'rb') as f:
+        f.seek(offset)
+        while parser.lines < target:
+            text = f.readline()
+            if not text: break
+            parser.parse_line(text.decode('utf-8', 'replace'))
+    return parser
+
+def unsupported(parser):
+    # why the state at the line can't be set up in MDI, None if it can
+    state = parser.state
+    if state['cutter_comp'] != 40:
+        return "cutter compensation G{:g} is active, it needs its entry move".format(state['cutter_comp'])
+    if state['length_offset'] == 43.1:
+        return "a dynamic tool length offset (G43.1) is active"
+    return None
+
+def number(value):
+    return "{:.4f}".format(value).rstrip('0').rstrip('.')
+
+def preamble(parser, tool=0, top=None, z_max=None):
+    # MDI commands that set up the program's state, top is the highest Z of the program
+    # and z_max the machine's upper Z limit, both in machine units
+    state = parser.state
+    # machine to program units
+    scale = 1 / parser.factor()
+    commands = ["G{} G{} G{} {}".format(21 if state['metric'] else 20, state['plane'],
+                                        '90.1' if state['arc_absolute'] else '91.1', state['coord'])]
+    if state['tool'] and state['tool'] != tool:
+        commands.append("T{} M6".format(state['tool']))
+    # the moves below must run with the program's tool length offset
+    if state['length_offset'] == 43:
+        commands.append("G43 H{}".format(state['length_tool']))
+    elif state['length_offset'] == 49:
+        commands.append("G49")
+    if state['spindle'] in (3, 4) and state['speed'] > 0:
+        commands.append("S{} M{}".format(number(state['speed']), state['spindle']))
+    if state['coolant'] in (7, 8):
+        commands.append("M{}".format(state['coolant']))
+    # clear the work, go over the start point and down to it
+    position = parser.position
+    known = parser.known
+    if known['Z'] and top is not None:
+        commands.append("G90 G0 Z{}".format(number(max(top, position['Z']) * scale)))
+    else:
+        # the program's clearance height isn't known, never cross the work at the current height
+        commands.append("G53 G0 Z{}".format(number(z_max * scale) if z_max is not None else 0))
+    words = ["{}{}".format(axis, number(position[axis] * (scale if axis != 'A' else 1.0)))
+             for axis in 'XYA' if known[axis]]
+    if words:
+        commands.append("G90 G0 " + " ".join(words))
+    feed = state['feed'] * scale if state['feed_mode'] != 93 else state['feed']
+    if known['Z']:
+        z = number(position['Z'] * scale)
+        if state['feed_mode'] == 94 and feed > 0:
+            commands.append("G90 G94 G1 Z{} F{}".format(z, number(feed)))
+        else:
+            commands.append("G90 G0 Z{}".format(z))
+    modal = "G{} G{}".format(90 if state['absolute'] else 91, state['feed_mode'])
+    if state['motion'] in (0, 1):
+        modal += " G{}".format(int(state['motion']))
+    if feed > 0:
+        modal += " F{}".format(number(feed))
+    commands.append(modal)
+    return commands
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# Program run time accounting
+#
+# Time is measured with a monotonic clock and split into running, paused and
+# feed hold intervals, so a slow or stalled UI can't make the totals drift.
+
+import os
+import json
+import time
+
+STOPPED = 'stopped'
+RUNNING = 'running'
+PAUSED = 'paused'
+FEEDHOLD = 'feedhold'
+
+class RunTimer():
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.program = None
+        self.state = STOPPED
+        self.since = None
+        self.totals = {RUNNING: 0.0, PAUSED: 0.0, FEEDHOLD: 0.0}
+        self.pauses = 0
+
+    def is_active(self):
+        return self.state != STOPPED
+
+    def start(self, program):
+        self.program = program
+        self.totals = {RUNNING: 0.0, PAUSED: 0.0, FEEDHOLD: 0.0}
+        self.pauses = 0
+        self.state = RUNNING
+        self.since = self.clock()
+
+    def update(self, paused, feedhold):
+        if self.state == STOPPED: return
+        if paused:
+            state = PAUSED
+        elif feedhold:
+            state = FEEDHOLD
+        else:
+            state = RUNNING
+        if state == self.state: return
+        if state == PAUSED:
+            self.pauses += 1
+        self.close_interval()
+        self.state = state
+
+    def stop(self):
+        # returns the totals for the run that just finished
+        if self.state == STOPPED: return None
+        self.close_interval()
+        self.state = STOPPED
+        self.since = None
+        return dict(self.totals, pauses=self.pauses)
+
+    def close_interval(self):
+        now = self.clock()
+        self.totals[self.state] += now - self.since
+        self.since = now
+
+    def elapsed(self, state=RUNNING):
+        total = self.totals[state]
+        if self.state == state:
+            total += self.clock() - self.since
+        return total
+
+    @staticmethod
+    def format(seconds):
+        hours, remainder = divmod(int(seconds), 3600)
+        minutes, seconds = divmod(remainder, 60)
+        return "{:02d}:{:02d}:{:02d}".format(hours, minutes, seconds)
+
+class RunTimeStore():
+    # per program totals, kept in a small json file in the config directory
+    def __init__(self, filename):
+        self.filename = filename
+        self.jobs = {}
+        try:
+            with open(filename) as f:
+                self.jobs = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def add_run(self, program, totals):
+        job = self.jobs.setdefault(program, {'runs': 0, RUNNING: 0.0, PAUSED: 0.0, FEEDHOLD: 0.0})
+        job['runs'] += 1
+        for key in (RUNNING, PAUSED, FEEDHOLD):
+            job[key] += totals[key]
+        job['last'] = totals
+        self.save()
+
+    def save(self):
+        tmp = self.filename + '.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(self.jobs, f, indent=1)
+            os.replace(tmp, self.filename)
+        except OSError as e:
+            print("Unable to save run times - {}".format(e))
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# Spindle load history
+#
+# LoadHistory keeps the last samples of the spindle pins in fixed size arrays
+# used as ring buffers, so a long job doesn't grow memory. LoadPlot draws the
+# history as a sparkline and OverloadRule decides when a sustained load is
+# high enough to act on.
+
+from array import array
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+class LoadHistory():
+    def __init__(self, capacity=600):
+        self.capacity = max(2, capacity)
+        self.times = array('d', bytes(8 * self.capacity))
+        self.load = array('f', bytes(4 * self.capacity))
+        self.amps = array('f', bytes(4 * self.capacity))
+        self.volts = array('f', bytes(4 * self.capacity))
+        self.fault = array('L', bytes(array('L').itemsize * self.capacity))
+        self.errors = array('L', bytes(array('L').itemsize * self.capacity))
+        # next slot to write
+        self.head = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, t, load, amps, volts, fault, errors):
+        i = self.head
+        self.times[i] = t
+        self.load[i] = load
+        self.amps[i] = amps
+        self.volts[i] = volts
+        self.fault[i] = fault
+        self.errors[i] = errors
+        self.head = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def series(self, name):
+        # oldest first
+        data = getattr(self, name)
+        start = (self.head - self.count) % self.capacity
+        if start + self.count <= self.capacity:
+            return data[start:start + self.count]
+        return data[start:] + data[:self.head]
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
+
+class OverloadRule():
+    def __init__(self, threshold, duration):
+        # load in percent, 0 disables the rule
+        self.threshold = threshold
+        self.duration = duration
+        self.since = None
+        self.tripped = False
+
+    def check(self, t, load):
+        # True once per overload, when the load has stayed above the threshold long enough
+        if self.threshold <= 0: return False
+        if load < self.threshold:
+            self.since = None
+            self.tripped = False
+            return False
+        if self.since is None:
+            self.since = t
+        if self.tripped or t - self.since < self.duration:
+            return False
+        self.tripped = True
+        return True
+
+class LoadPlot(QtWidgets.QWidget):
+    def __init__(self, history, threshold=0, parent=None):
+        super(LoadPlot, self).__init__(parent)
+        self.history = history
+        self.threshold = threshold
+        self.line_color = QtGui.QColor(0, 200, 255)
+        self.limit_color = QtGui.QColor(255, 160, 0)
+        self.fault_color = QtGui.QColor(255, 0, 0)
+        self.setMinimumHeight(60)
+        self.setToolTip("Spindle load history")
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        rect = QtCore.QRectF(self.rect()).adjusted(2, 2, -2, -2)
+        painter.setPen(QtGui.QPen(self.palette().color(QtGui.QPalette.Mid), 1))
+        painter.drawRect(rect)
+        count = len(self.history)
+        scale_x = rect.width() / (self.history.capacity - 1)
+        scale_y = rect.height() / 100
+        if self.threshold > 0:
+            y = rect.bottom() - self.threshold * scale_y
+            painter.setPen(QtGui.QPen(self.limit_color, 1, QtCore.Qt.DashLine))
+            painter.drawLine(QtCore.QPointF(rect.left(), y), QtCore.QPointF(rect.right(), y))
+        if count < 2: return
+        # newest sample on the right edge
+        x0 = rect.right() - (count - 1) * scale_x
+        load = self.history.series('load')
+        fault = self.history.series('fault')
+        painter.setPen(QtGui.QPen(self.fault_color, 1))
+        for i in range(count):
+            if fault[i]:
+                x = x0 + i * scale_x
+                painter.drawLine(QtCore.QPointF(x, rect.top()), QtCore.QPointF(x, rect.bottom()))
+        points = [QtCore.QPointF(x0 + i * scale_x, rect.bottom() - min(100.0, value) * scale_y)
+                  for i, value in enumerate(load)]
+        painter.setPen(QtGui.QPen(self.line_color, 1.5))
+        painter.drawPolyline(QtGui.QPolygonF(points))
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# Spindle power from the VFD's current and voltage pins
+#
+# The VFD updates spindle_amps and spindle_volts one after the other, so pin
+# changes are only collected here and the power is worked out once per event
+# loop turn from the latest pair. The result is smoothed and sent on at a
+# bounded rate. Peak and time weighted average power are kept per job.
+
+import time
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+class SpindlePower(QObject):
+    # watts, percent of the maximum power
+    power_changed = pyqtSignal(float, int)
+
+    def __init__(self, amps_pin, volts_pin, max_power, power_factor=0.9, smoothing=0.3, rate=10):
+        super(SpindlePower, self).__init__()
+        self.amps_pin = amps_pin
+        self.volts_pin = volts_pin
+        self.max_power = max_power
+        self.power_factor = power_factor
+        # weight of a new reading, 1 means no smoothing
+        self.smoothing = min(1.0, max(0.01, smoothing))
+        self.min_interval = 1.0 / rate if rate > 0 else 0.0
+        self.power = 0.0
+        self.percent = -1
+        self.last_update = 0.0
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.update)
+        self.job_active = False
+        self.peak = 0.0
+        self.energy = 0.0
+        self.job_time = 0.0
+        amps_pin.value_changed.connect(self.pin_changed)
+        volts_pin.value_changed.connect(self.pin_changed)
+
+    def pin_changed(self, value):
+        if self.timer.isActive(): return
+        wait = self.last_update + self.min_interval - time.monotonic()
+        self.timer.start(max(0, int(wait * 1000)))
+
+    def update(self):
+        now = time.monotonic()
+        # this calculation assumes the voltage is line to neutral
+        # and that the current reported by the VFD is total current for all 3 phases
+        power = float(self.volts_pin.get()) * float(self.amps_pin.get()) * self.power_factor
+        if self.job_active and self.last_update:
+            # the previous value held until now
+            elapsed = now - self.last_update
+            self.energy += self.power * elapsed
+            self.job_time += elapsed
+        self.power += self.smoothing * (power - self.power)
+        self.last_update = now
+        if self.job_active:
+            self.peak = max(self.peak, self.power)
+        if self.max_power > 0:
+            percent = min(100, max(0, int(self.power / self.max_power * 100)))
+        else:
+            percent = 0
+        if percent != self.percent:
+            self.percent = percent
+            self.power_changed.emit(self.power, percent)
+        # keep going until the smoothed value has caught up, even if the pins don't change
+        if abs(power - self.power) >= 1.0:
+            self.timer.start(max(20, int(self.min_interval * 1000)))
+
+    def start_job(self):
+        self.job_active = True
+        self.peak = self.power
+        self.energy = 0.0
+        self.job_time = 0.0
+        self.last_update = time.monotonic()
+
+    def stop_job(self):
+        # (peak, average) watts over the job, None if no job was running
+        if not self.job_active: return None
+        self.job_active = False
+        elapsed = time.monotonic() - self.last_update
+        self.energy += self.power * elapsed
+        self.job_time += elapsed
+        average = self.energy / self.job_time if self.job_time > 0 else self.power
+        return self.peak, average
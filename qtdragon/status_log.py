@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# Status message log
+#
+# Folds repeats of the same message into a count, reported once a different
+# message arrives or the repeats stop, and appends every message as a JSON
+# line to a log file in the config directory. File writes happen in a worker
+# thread and the file is rotated by size, so a multi-day run neither grows
+# memory nor blocks the GUI on disk access. Messages after shutdown are
+# written straight away.
+
+import os
+import json
+import time
+import queue
+import threading
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+class StatusLog(QObject):
+    saved = pyqtSignal(str)
+    failed = pyqtSignal(str, str)
+    # the repeat count line, when the repeats stopped without another message
+    repeated = pyqtSignal(str)
+
+    def __init__(self, directory, repeat_window=10.0, max_bytes=1 << 20, backups=5):
+        super(StatusLog, self).__init__()
+        self.directory = directory
+        self.filename = os.path.join(directory, 'status.jsonl')
+        self.repeat_window = repeat_window
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.last_message = None
+        self.last_time = 0.0
+        self.repeats = 0
+        self.repeat_timer = QTimer()
+        self.repeat_timer.setSingleShot(True)
+        self.repeat_timer.setInterval(int(repeat_window * 1000))
+        self.repeat_timer.timeout.connect(self.repeats_stopped)
+        self.closed = False
+        self.write_lock = threading.Lock()
+        self.jobs = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def add(self, message):
+        # returns the lines to show, empty while a message is repeating
+        now = time.time()
+        if message == self.last_message and now - self.last_time < self.repeat_window:
+            self.repeats += 1
+            self.last_time = now
+            self.repeat_timer.start()
+            return []
+        lines = self.flush_repeats(now)
+        self.last_message = message
+        self.last_time = now
+        self.record(now, message, 0)
+        lines.append(message)
+        return lines
+
+    def flush_repeats(self, now):
+        self.repeat_timer.stop()
+        if not self.repeats: return []
+        summary = "Last message repeated {} times".format(self.repeats)
+        self.record(now, self.last_message, self.repeats)
+        self.repeats = 0
+        return [summary]
+
+    def repeats_stopped(self):
+        for line in self.flush_repeats(time.time()):
+            self.repeated.emit(line)
+        # the same message again starts a new count
+        self.last_message = None
+
+    def record(self, now, message, repeated):
+        entry = {'time': now, 'message': message}
+        if repeated:
+            entry['repeated'] = repeated
+        if self.closed:
+            self.write_entries([entry])
+        else:
+            self.jobs.put(('log', entry))
+
+    def save_text(self, filename, text):
+        if self.closed:
+            self.save(filename, text)
+        else:
+            self.jobs.put(('save', (filename, text)))
+
+    def shutdown(self):
+        self.flush_repeats(time.time())
+        self.jobs.put(('stop', None))
+        self.thread.join(2)
+        self.closed = True
+
+    def run(self):
+        next_job = None
+        while True:
+            job = next_job or self.jobs.get()
+            next_job = None
+            kind, data = job
+            if kind == 'stop': break
+            if kind == 'log':
+                # write everything that is already queued in one go
+                entries = [data]
+                while next_job is None:
+                    try:
+                        job = self.jobs.get_nowait()
+                    except queue.Empty:
+                        break
+                    if job[0] == 'log':
+                        entries.append(job[1])
+                    else:
+                        next_job = job
+                self.write_entries(entries)
+            elif kind == 'save':
+                self.save(*data)
+
+    def save(self, filename, text):
+        try:
+            with open(filename, 'w') as f:
+                f.write(text)
+            self.saved.emit(filename)
+        except OSError as e:
+            self.failed.emit(filename, str(e))
+
+    def write_entries(self, entries):
+        # the worker may still be writing when shutdown gives up waiting for it
+        with self.write_lock:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(self.filename, 'a') as f:
+                    for entry in entries:
+                        f.write(json.dumps(entry) + '\n')
+                    size = f.tell()
+                if size >= self.max_bytes:
+                    self.rotate()
+            except OSError:
+                # the log file is a convenience, never let it take the screen down
+                pass
+
+    def rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            older = "{}.{}".format(self.filename, i)
+            if os.path.exists(older):
+                os.replace(older, "{}.{}".format(self.filename, i + 1))
+        os.replace(self.filename, self.filename + '.1')
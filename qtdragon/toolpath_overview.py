@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+# Toolpath overview for very large programs
+#
+# Shown in place of gcodegraphics when a program is too big for the full
+# preview. The XY path is kept at a few levels of detail. Each level snaps
+# points to a grid four times finer than the one before and drops points that
+# stay in the same cell. Every level is split into tiles, so a view only
+# draws the tiles it can see, at the level whose cells are about a pixel.
+#
+# The levels are built by a worker thread that the view can draw while it is
+# still running. They are saved in the config directory by file hash, so
+# loading an unchanged file again only reads the cache.
+#
+# The live tool path is drawn over it from a LivePlot ring buffer, so its cost
+# stays the same however long the job runs.
+
+import os
+import json
+import math
+import queue
+import threading
+from array import array
+from collections import OrderedDict
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from gcode_preflight import GcodeParser, file_hash
+
+LEVELS = 4
+LEVEL_STEP = 4
+BASE_CELLS = 256
+TILES = 16
+CACHE_VERSION = 2
+
+class ToolpathLod():
+    def __init__(self, span):
+        # span is the size of the work area, it sets the grid sizes
+        self.span = span
+        self.cells = [span / (BASE_CELLS * LEVEL_STEP ** level) for level in range(LEVELS)]
+        self.tile_size = span / TILES
+        # per level, (tile x, tile y) -> x1, y1, x2, y2 of each segment
+        self.tiles = [{} for level in range(LEVELS)]
+        # last point kept on each level as (x, y, cell)
+        self.last = [None] * LEVELS
+        self.extents = None
+
+    def add(self, x, y, feed):
+        if self.extents is None:
+            self.extents = [x, y, x, y]
+        else:
+            extents = self.extents
+            if x < extents[0]: extents[0] = x
+            elif x > extents[2]: extents[2] = x
+            if y < extents[1]: extents[1] = y
+            elif y > extents[3]: extents[3] = y
+        for level in range(LEVELS):
+            size = self.cells[level]
+            cell = (int(x // size), int(y // size))
+            last = self.last[level]
+            if feed and last is not None:
+                if cell == last[2]: continue
+                self.segment(level, last[0], last[1], x, y)
+            self.last[level] = (x, y, cell)
+
+    def segment(self, level, x1, y1, x2, y2):
+        tiles = self.tiles[level]
+        for key in self.crossed(x1, y1, x2, y2):
+            data = tiles.get(key)
+            if data is None:
+                data = tiles[key] = array('f')
+            data.extend((x1, y1, x2, y2))
+
+    def crossed(self, x1, y1, x2, y2):
+        # every tile the segment passes through, walking the grid from one end to the other
+        size = self.tile_size
+        tx, ty = int(x1 // size), int(y1 // size)
+        ex, ey = int(x2 // size), int(y2 // size)
+        keys = [(tx, ty)]
+        if (tx, ty) == (ex, ey): return keys
+        dx, dy = x2 - x1, y2 - y1
+        step_x = 1 if dx > 0 else -1
+        step_y = 1 if dy > 0 else -1
+        # how far along the segment (0 to 1) the next tile edge in x and in y is
+        next_x = ((tx + (step_x > 0)) * size - x1) / dx if dx else math.inf
+        next_y = ((ty + (step_y > 0)) * size - y1) / dy if dy else math.inf
+        delta_x = size / abs(dx) if dx else math.inf
+        delta_y = size / abs(dy) if dy else math.inf
+        for i in range(abs(ex - tx) + abs(ey - ty)):
+            if next_x < next_y:
+                tx += step_x
+                next_x += delta_x
+            else:
+                ty += step_y
+                next_y += delta_y
+            keys.append((tx, ty))
+        return keys
+
+    def level_for(self, units_per_pixel):
+        # the coarsest level that still shows pixel sized detail
+        for level in range(LEVELS):
+            if self.cells[level] <= units_per_pixel:
+                return level
+        return LEVELS - 1
+
+    def visible(self, level, rect):
+        tiles = self.tiles[level]
+        size = self.tile_size
+        left, right = int(rect.left() // size), int(rect.right() // size)
+        top, bottom = int(rect.top() // size), int(rect.bottom() // size)
+        if (right - left + 1) * (bottom - top + 1) > len(tiles):
+            # zoomed well out, fewer tiles than grid squares
+            return [key for key in list(tiles) if left <= key[0] <= right and top <= key[1] <= bottom]
+        return [(tx, ty) for tx in range(left, right + 1) for ty in range(top, bottom + 1) if (tx, ty) in tiles]
+
+    def save(self, filename):
+        entries = []
+        for level, tiles in enumerate(self.tiles):
+            for (tx, ty), data in list(tiles.items()):
+                entries.append([level, tx, ty, len(data)])
+        header = {'version': CACHE_VERSION, 'span': self.span, 'extents': self.extents, 'tiles': entries}
+        temp = filename + '.tmp'
+        with open(temp, 'wb') as f:
+            f.write(json.dumps(header).encode() + b'\n')
+            for level, tx, ty, count in entries:
+                f.write(self.tiles[level][(tx, ty)].tobytes())
+        os.replace(temp, filename)
+
+    @classmethod
+    def load(cls, filename, span):
+        # None if there is no usable cache
+        try:
+            with open(filename, 'rb') as f:
+                header = json.loads(f.readline())
+                if header.get('version') != CACHE_VERSION or header.get('span') != span: return None
+                lod = cls(span)
+                lod.extents = header['extents']
+                for level, tx, ty, count in header['tiles']:
+                    data = array('f')
+                    data.frombytes(f.read(count * data.itemsize))
+                    lod.tiles[level][(tx, ty)] = data
+            return lod
+        except (OSError, ValueError, KeyError, EOFError):
+            return None
+
+class ToolpathOverview(QObject):
+    # filename, ToolpathLod being built
+    started = pyqtSignal(str, object)
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(str, object)
+    failed = pyqtSignal(str, str)
+
+    def __init__(self, cache_dir, span, machine_metric=True, cache_files=20):
+        super(ToolpathOverview, self).__init__()
+        self.cache_dir = cache_dir
+        self.span = span
+        self.machine_metric = machine_metric
+        self.cache_files = cache_files
+        self.jobs = queue.Queue()
+        self.generation = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def build(self, filename):
+        self.generation += 1
+        self.jobs.put((filename, self.generation))
+
+    def cancel(self):
+        self.generation += 1
+
+    def shutdown(self):
+        self.generation += 1
+        self.jobs.put(None)
+        self.thread.join(2)
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None: break
+            filename, generation = job
+            if generation != self.generation: continue
+            try:
+                self.process(filename, generation)
+            except Exception as e:
+                self.failed.emit(filename, str(e))
+
+    def process(self, filename, generation):
+        cache_file = os.path.join(self.cache_dir, file_hash(filename) + '.lod')
+        lod = ToolpathLod.load(cache_file, self.span)
+        if lod is not None:
+            # touch it so the cache keeps recently used files
+            os.utime(cache_file)
+            self.finished.emit(filename, lod)
+            return
+        lod = ToolpathLod(self.span)
+        self.started.emit(filename, lod)
+        parser = GcodeParser(self.machine_metric, path=lambda point, feed: lod.add(point['X'], point['Y'], feed))
+        size = max(1, os.path.getsize(filename))
+        done = 0
+        percent = 0
+        with open(filename, 'rb') as f:
+            for line in f:
+                parser.parse_line(line.decode('utf-8', 'replace'))
+                done += len(line)
+                if parser.lines % 20000 == 0:
+                    if generation != self.generation: return
+                    if done * 100 // size != percent:
+                        percent = done * 100 // size
+                        self.progress.emit(percent)
+        self.finished.emit(filename, lod)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            lod.save(cache_file)
+            self.prune()
+        except OSError:
+            pass
+
+    def prune(self):
+        files = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir) if name.endswith('.lod')]
+        files.sort(key=os.path.getmtime, reverse=True)
+        for name in files[self.cache_files:]:
+            os.remove(name)
+
+class OverviewWidget(QtWidgets.QWidget):
+    def __init__(self, parent=None):
+        super(OverviewWidget, self).__init__(parent)
+        self.lod = None
+        self.center = QtCore.QPointF(0, 0)
+        # pixels per machine unit
+        self.scale = 1.0
+        # work offset, the path is drawn where it will run on the machine
+        self.offset = QtCore.QPointF(0, 0)
+        self.moved = False
+        self.drag = None
+        # painter paths of recently drawn tiles
+        self.paths = OrderedDict()
+        self.max_paths = 256
+        self.path_color = QtGui.QColor(255, 255, 255)
+        self.live_plot = None
+        # polygon of the live plot, rebuilt when it has changed
+        self.live_polygon = None
+        self.live_color = QtGui.QColor(255, 64, 64)
+        self.background = QtGui.QColor(0, 0, 0)
+        self.setMinimumSize(100, 100)
+        self.setToolTip("Toolpath overview - wheel to zoom, drag to pan, double click to fit")
+
+    def set_lod(self, lod):
+        self.lod = lod
+        self.moved = False
+        self.refresh()
+
+    def refresh(self):
+        # the levels changed, e.g. while they are being built
+        self.paths.clear()
+        if not self.moved:
+            self.fit()
+        self.update()
+
+    def set_offset(self, x, y):
+        # moving the view with the offset keeps what the operator was looking at in place
+        offset = QtCore.QPointF(x, y)
+        self.center += offset - self.offset
+        self.offset = offset
+        self.update()
+
+    def set_live_plot(self, plot):
+        self.live_plot = plot
+        self.live_changed()
+
+    def live_changed(self):
+        self.live_polygon = None
+        self.update()
+
+    def live_path(self):
+        if self.live_polygon is None:
+            plot = self.live_plot
+            self.live_polygon = QtGui.QPolygonF(list(map(QtCore.QPointF, plot.series('x'), plot.series('y'))))
+        return self.live_polygon
+
+    def fit(self):
+        if self.lod is None or self.lod.extents is None: return
+        x1, y1, x2, y2 = self.lod.extents
+        self.center = QtCore.QPointF((x1 + x2) / 2, (y1 + y2) / 2) + self.offset
+        width = max(x2 - x1, 1e-3)
+        height = max(y2 - y1, 1e-3)
+        self.scale = 0.9 * min(self.width() / width, self.height() / height)
+
+    def to_world(self, point):
+        return QtCore.QPointF(self.center.x() + (point.x() - self.width() / 2) / self.scale,
+                              self.center.y() - (point.y() - self.height() / 2) / self.scale)
+
+    def tile_path(self, level, key):
+        path = self.paths.get((level, key))
+        if path is not None:
+            self.paths.move_to_end((level, key))
+            return path
+        path = QtGui.QPainterPath()
+        data = self.lod.tiles[level][key]
+        for i in range(0, len(data) - 3, 4):
+            path.moveTo(data[i], data[i + 1])
+            path.lineTo(data[i + 2], data[i + 3])
+        self.paths[(level, key)] = path
+        if len(self.paths) > self.max_paths:
+            self.paths.popitem(last=False)
+        return path
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        painter.fillRect(self.rect(), self.background)
+        if self.lod is None: return
+        corner1 = self.to_world(QtCore.QPointF(0, 0))
+        corner2 = self.to_world(QtCore.QPointF(self.width(), self.height()))
+        rect = QtCore.QRectF(corner1, corner2).normalized().translated(-self.offset)
+        level = self.lod.level_for(1 / self.scale)
+        painter.translate(self.width() / 2, self.height() / 2)
+        painter.scale(self.scale, -self.scale)
+        painter.translate(-self.center)
+        painter.translate(self.offset)
+        pen = QtGui.QPen(self.path_color, 0)
+        pen.setCosmetic(True)
+        painter.setPen(pen)
+        for key in self.lod.visible(level, rect):
+            painter.drawPath(self.tile_path(level, key))
+        if self.live_plot is not None and len(self.live_plot) > 1:
+            # positions are in machine coordinates
+            painter.translate(-self.offset)
+            pen.setColor(self.live_color)
+            painter.setPen(pen)
+            painter.drawPolyline(self.live_path())
+
+    def wheelEvent(self, event):
+        # zoom about the point under the mouse
+        before = self.to_world(event.pos())
+        self.scale *= 1.25 if event.angleDelta().y() > 0 else 0.8
+        after = self.to_world(event.pos())
+        self.center += before - after
+        self.moved = True
+        self.update()
+
+    def mousePressEvent(self, event):
+        self.drag = event.pos()
+
+    def mouseMoveEvent(self, event):
+        if self.drag is None: return
+        delta = event.pos() - self.drag
+        self.drag = event.pos()
+        self.center -= QtCore.QPointF(delta.x() / self.scale, -delta.y() / self.scale)
+        self.moved = True
+        self.update()
+
+    def mouseReleaseEvent(self, event):
+        self.drag = None
+
+    def mouseDoubleClickEvent(self, event):
+        self.moved = False
+        self.fit()
+        self.update()
+
+    def resizeEvent(self, event):
+        if not self.moved:
+            self.fit()
@@ -9,6 +9,12 @@ from qtvcp.core import Status, Action
 STATUS = Status()
 ACTION = Action()
 
+# This program runs as a long lived service started by the handler.
+# Requests are read one per line from stdin and every request gets exactly one
+# reply line on stdout:
+#   probe_down$search_vel$probe_vel$max_travel$z_offset  ->  COMPLETE | ERROR <reason>
+#   ping                                                 ->  PONG
+#   quit                                                 ->  BYE (then exit)
 class TouchOffSubprog(QObject):
     def __init__(self):
         QObject.__init__(self)
@@ -24,25 +30,34 @@ class TouchOffSubprog(QObject):
                 line = sys.stdin.readline()
             except KeyboardInterrupt:
                 break
-            if line:
-                cmd = line
-                line = None
-                try:
-                    error = self.process_command(cmd)
-                    # error = 1 means success, error = None means ignore, anything else is an error
-                    if error is not None:
-                        if error != 1:
-                            sys.stdout.write("ERROR Probe routine returned with error\n")
-                        else:
-                            sys.stdout.write("COMPLETE\n")
-                        sys.stdout.flush()
-                except Exception as e:
-                    sys.stdout.write("ERROR Command Error: {}\n".format(e))
-                    sys.stdout.flush()
+            # EOF means the handler has gone away
+            if not line: break
+            cmd = line.rstrip()
+            if not cmd: continue
+            if cmd == "ping":
+                self.reply("PONG")
+                continue
+            if cmd == "quit":
+                self.reply("BYE")
                 break
+            try:
+                error = self.process_command(cmd)
+                # error = 1 means success, error = None means machine not ready, anything else is an error
+                if error is None:
+                    self.reply("ERROR Machine must be on and idle")
+                elif error != 1:
+                    self.reply("ERROR Probe routine returned with error")
+                else:
+                    self.reply("COMPLETE")
+            except Exception as e:
+                self.reply("ERROR Command Error: {}".format(e))
+
+    def reply(self, text):
+        sys.stdout.write(text + "\n")
+        sys.stdout.flush()
 
     def process_command(self, cmd):
-        cmd = cmd.rstrip().split('$')
+        cmd = cmd.split('$')
         if not STATUS.is_on_and_idle(): return None
         if cmd[0] != "probe_down": return 0
         self.search_vel = float(cmd[1])
@@ -61,15 +76,15 @@ class TouchOffSubprog(QObject):
         command = "G38.2 Z-{} F{}".format(self.max_travel, self.search_vel)
         if ACTION.CALL_MDI_WAIT(command, 10) == -1:
             ACTION.CALL_MDI("G90")
-            return
+            return 0
         if ACTION.CALL_MDI_WAIT("G1 Z4.0") == -1:
             ACTION.CALL_MDI("G90")
-            return
+            return 0
         ACTION.CALL_MDI("G4 P0.5")
         command = "G38.2 Z-4.4 F{}".format(self.probe_vel)
         if ACTION.CALL_MDI_WAIT(command, 10) == -1:
             ACTION.CALL_MDI("G90")
-            return
+            return 0
         command = "G10 L20 P0 Z{}".format(self.z_offset)
         ACTION.CALL_MDI_WAIT(command)
         command = "G1 Z10 F{}".format(self.search_vel)
@@ -82,4 +97,3 @@ class TouchOffSubprog(QObject):
 ####################################
 if __name__ == "__main__":
     w = TouchOffSubprog()
-
@@ -0,0 +1,33 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'qtdragon'))
+
+from gcode_preflight import GcodeParser
+from run_from_line import preamble
+
+def parse(lines):
+    parser = GcodeParser(True)
+    for line in lines:
+        parser.parse_line(line)
+    return parser
+
+def xy_move(commands):
+    return next(i for i, command in enumerate(commands) if command.startswith("G90 G0 X"))
+
+def test_retracts_to_top_when_z_known():
+    commands = preamble(parse(["G21 G90", "G0 Z5", "G0 X10 Y20", "G1 Z-1 F100"]), top=5.0)
+    move = xy_move(commands)
+    assert commands[move - 1] == "G90 G0 Z5"
+    assert "G90 G94 G1 Z-1 F100" in commands[move:]
+
+def test_retracts_in_machine_coordinates_when_z_unknown():
+    commands = preamble(parse(["G21 G90", "G0 X10 Y20"]), top=5.0, z_max=0.0)
+    move = xy_move(commands)
+    assert commands[move - 1] == "G53 G0 Z0"
+    assert not any(command.startswith("G90 G0 Z") for command in commands)
+
+def test_retracts_to_machine_limit_when_top_unknown():
+    commands = preamble(parse(["G20 G90", "G0 Z0.2", "G0 X1 Y2"]), top=None, z_max=25.4)
+    move = xy_move(commands)
+    assert commands[move - 1] == "G53 G0 Z1"